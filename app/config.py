@@ -12,6 +12,14 @@ def env(key: str, default: Optional[str] = None, required: bool = False) -> str:
     return value
 
 
+def env_int(key: str, default: int) -> int:
+    raw = env(key, default=str(default), required=False)
+    try:
+        return int(raw)
+    except ValueError as e:
+        raise RuntimeError(f"{key} must be an integer") from e
+
+
 @dataclass(frozen=True)
 class Settings:
     APP_ENV: str
@@ -22,6 +30,38 @@ class Settings:
     S3_ENDPOINT: str
     S3_ACCESS_KEY_ID: str
     S3_SECRET_ACCESS_KEY: str
+    RENDER_WORKERS: int
+    RENDER_CHUNK_PAGES: int
+    OVERLAY_CACHE_ENTRIES: int
+    OVERLAY_IMAGE_DPI: int
+    OVERLAY_JPEG_QUALITY: int
+    RENDER_SHEET_FORM: bool
+    RENDER_BACKEND: str
+    OUTPUT_PROFILE: str
+    BACKGROUND_CACHE_ENTRIES: int
+    BACKGROUND_CACHE_MB: int
+    BACKGROUND_IMAGE_DPI: int
+    BACKGROUND_JPEG_QUALITY: int
+    SVG_PREFLIGHT: bool
+    SVG_PREFLIGHT_DIGITS: int
+    RENDER_BATCH_CONCURRENCY: int
+    RENDER_BATCH_MAX_JOBS: int
+    JOB_WORKERS: int
+    JOB_QUEUE_SIZE: int
+    JOB_QUEUE_BACKEND: str
+    JOB_STATE_DIR: str
+    RENDER_OUTPUT_MODE: str
+    S3_PART_SIZE_MB: int
+    S3_UPLOAD_CONCURRENCY: int
+    OBJECT_STORE_BACKEND: str
+    OBJECT_STORE_ROOT: str
+    S3_MAX_CONNECTIONS: int
+    S3_TCP_KEEPALIVE: bool
+    SVG_CACHE_TTL_S: int
+    TMP_CACHE_MAX_MB: int
+    TMP_CACHE_MAX_ENTRIES: int
+    FONT_INDEX_PATH: str
+    CUSTOM_FONT_CACHE_ENTRIES: int
 
 
 def load_settings() -> Settings:
@@ -34,13 +74,67 @@ def load_settings() -> Settings:
 
     internal_api_key = env("INTERNAL_API_KEY", required=True)
 
+    object_store_backend = env("OBJECT_STORE_BACKEND", default="s3", required=False).strip().lower()
+    if object_store_backend not in {"s3", "filesystem", "memory"}:
+        raise RuntimeError("OBJECT_STORE_BACKEND must be 's3', 'filesystem' or 'memory'")
+    # S3 credentials are only needed when objects actually live in S3.
+    s3_required = object_store_backend == "s3"
+
+    job_queue_backend = env("JOB_QUEUE_BACKEND", default="memory", required=False).strip().lower()
+    if job_queue_backend not in {"memory", "file"}:
+        raise RuntimeError("JOB_QUEUE_BACKEND must be 'memory' or 'file'")
+
+    render_output_mode = env("RENDER_OUTPUT_MODE", default="file", required=False).strip().lower()
+    if render_output_mode not in {"file", "stream"}:
+        raise RuntimeError("RENDER_OUTPUT_MODE must be 'file' or 'stream'")
+
+    render_backend = env("RENDER_BACKEND", default="canvas", required=False).strip().lower()
+    if render_backend not in {"canvas", "direct"}:
+        raise RuntimeError("RENDER_BACKEND must be 'canvas' or 'direct'")
+
+    output_profile = env("OUTPUT_PROFILE", default="balanced", required=False).strip().lower()
+    if output_profile not in {"fast", "balanced", "small"}:
+        raise RuntimeError("OUTPUT_PROFILE must be 'fast', 'balanced' or 'small'")
+
     return Settings(
         APP_ENV=app_env,
         SERVICE_PORT=service_port,
         INTERNAL_API_KEY=internal_api_key,
-        S3_BUCKET=env("S3_BUCKET", required=True),
-        S3_REGION=env("S3_REGION", required=True),
+        S3_BUCKET=env("S3_BUCKET", required=s3_required),
+        S3_REGION=env("S3_REGION", required=s3_required),
         S3_ENDPOINT=env("S3_ENDPOINT", default="", required=False),
-        S3_ACCESS_KEY_ID=env("S3_ACCESS_KEY_ID", required=True),
-        S3_SECRET_ACCESS_KEY=env("S3_SECRET_ACCESS_KEY", required=True),
+        S3_ACCESS_KEY_ID=env("S3_ACCESS_KEY_ID", required=s3_required),
+        S3_SECRET_ACCESS_KEY=env("S3_SECRET_ACCESS_KEY", required=s3_required),
+        RENDER_WORKERS=max(1, env_int("RENDER_WORKERS", 1)),
+        RENDER_CHUNK_PAGES=max(1, env_int("RENDER_CHUNK_PAGES", 250)),
+        OVERLAY_CACHE_ENTRIES=max(1, env_int("OVERLAY_CACHE_ENTRIES", 64)),
+        OVERLAY_IMAGE_DPI=max(0, env_int("OVERLAY_IMAGE_DPI", 300)),
+        OVERLAY_JPEG_QUALITY=min(95, max(1, env_int("OVERLAY_JPEG_QUALITY", 90))),
+        RENDER_SHEET_FORM=env_int("RENDER_SHEET_FORM", 1) != 0,
+        RENDER_BACKEND=render_backend,
+        OUTPUT_PROFILE=output_profile,
+        BACKGROUND_CACHE_ENTRIES=max(1, env_int("BACKGROUND_CACHE_ENTRIES", 16)),
+        BACKGROUND_CACHE_MB=max(0, env_int("BACKGROUND_CACHE_MB", 256)),
+        BACKGROUND_IMAGE_DPI=max(0, env_int("BACKGROUND_IMAGE_DPI", 0)),
+        BACKGROUND_JPEG_QUALITY=min(95, max(1, env_int("BACKGROUND_JPEG_QUALITY", 85))),
+        SVG_PREFLIGHT=env_int("SVG_PREFLIGHT", 0) != 0,
+        SVG_PREFLIGHT_DIGITS=min(12, max(0, env_int("SVG_PREFLIGHT_DIGITS", 5))),
+        RENDER_BATCH_CONCURRENCY=max(1, env_int("RENDER_BATCH_CONCURRENCY", 4)),
+        RENDER_BATCH_MAX_JOBS=max(1, env_int("RENDER_BATCH_MAX_JOBS", 100)),
+        JOB_WORKERS=max(1, env_int("JOB_WORKERS", 1)),
+        JOB_QUEUE_SIZE=max(1, env_int("JOB_QUEUE_SIZE", 64)),
+        JOB_QUEUE_BACKEND=job_queue_backend,
+        JOB_STATE_DIR=env("JOB_STATE_DIR", default="tmp/jobs", required=False),
+        RENDER_OUTPUT_MODE=render_output_mode,
+        S3_PART_SIZE_MB=max(5, env_int("S3_PART_SIZE_MB", 8)),
+        S3_UPLOAD_CONCURRENCY=max(1, env_int("S3_UPLOAD_CONCURRENCY", 4)),
+        OBJECT_STORE_BACKEND=object_store_backend,
+        OBJECT_STORE_ROOT=env("OBJECT_STORE_ROOT", default="tmp/objects", required=False),
+        S3_MAX_CONNECTIONS=max(1, env_int("S3_MAX_CONNECTIONS", 32)),
+        S3_TCP_KEEPALIVE=env_int("S3_TCP_KEEPALIVE", 1) != 0,
+        SVG_CACHE_TTL_S=max(0, env_int("SVG_CACHE_TTL_S", 300)),
+        TMP_CACHE_MAX_MB=max(0, env_int("TMP_CACHE_MAX_MB", 2048)),
+        TMP_CACHE_MAX_ENTRIES=max(0, env_int("TMP_CACHE_MAX_ENTRIES", 20000)),
+        FONT_INDEX_PATH=env("FONT_INDEX_PATH", default="tmp/fonts/index.json", required=False),
+        CUSTOM_FONT_CACHE_ENTRIES=max(1, env_int("CUSTOM_FONT_CACHE_ENTRIES", 32)),
     )
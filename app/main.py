@@ -1,13 +1,22 @@
 import logging
 import os
+from contextlib import asynccontextmanager
+from typing import Any, Callable
 
 from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 
 from app.config import load_settings
-from app.schemas import RenderRequest, RenderResponse
-from app.services.font_registry import get_font_registry
-from app.services.render import render_job
+from app.schemas import BatchRenderRequest, BatchRenderResponse, JobResponse, RenderRequest, RenderResponse
+from app.services.disk_cache import disk_cache_stats, get_disk_cache
+from app.services.normalize import svg_source_cache_stats
+from app.services.font_registry import get_font_registry, refresh_font_registry
+from app.services.jobs import JobManager, JobQueueFull
+from app.services.layout import plan_volumes, validate_layout
+from app.services.output_profile import get_output_profile
+from app.services.pdf_writer import render_cache_stats
+from app.services.render import METRICS, render_batch, render_job, resolve_render_mode
 
 load_dotenv()
 
@@ -18,7 +27,36 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 settings = load_settings()
 
-app = FastAPI(title="print-engine")
+
+def _run_job(request: dict[str, Any], progress: Callable[[int, int], None]) -> dict[str, Any]:
+    return render_job(settings=settings, progress=progress, **request)
+
+
+# Built by lifespan, in the serving process only: with the file backend, start()
+# resumes pending jobs, which importing this module must not do.
+job_manager: JobManager | None = None
+
+
+def _jobs() -> JobManager:
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="JOB_MANAGER_NOT_STARTED")
+    return job_manager
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global job_manager
+    # Index system fonts up front; only files changed since the last run are parsed.
+    refresh_font_registry(settings)
+    job_manager = JobManager(settings=settings, runner=_run_job)
+    job_manager.start()
+    try:
+        yield
+    finally:
+        job_manager.close()
+
+
+app = FastAPI(title="print-engine", lifespan=lifespan)
 
 
 @app.get("/health")
@@ -37,7 +75,7 @@ def fonts_endpoint(x_internal_key: str = Header(default="", alias="x-internal-ke
     if x_internal_key != settings.INTERNAL_API_KEY:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    fonts = get_font_registry()
+    fonts = get_font_registry(settings)
     return [
         {
             "family": str(f.get("family") or ""),
@@ -48,8 +86,80 @@ def fonts_endpoint(x_internal_key: str = Header(default="", alias="x-internal-ke
     ]
 
 
+@app.post("/fonts/refresh")
+def fonts_refresh_endpoint(x_internal_key: str = Header(default="", alias="x-internal-key")) -> dict:
+    if x_internal_key != settings.INTERNAL_API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    return refresh_font_registry(settings)
+
+
+@app.get("/cache/stats")
+def cache_stats_endpoint(x_internal_key: str = Header(default="", alias="x-internal-key")) -> dict:
+    if x_internal_key != settings.INTERNAL_API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    # Open the template cache so it is listed before the first render.
+    get_disk_cache("tmp/templates", settings)
+    return {"disk": disk_cache_stats(), "jobs": _jobs().stats()}
+
+
+METRICS.gauge("cache_hit_ratio", "Hits over lookups of each cache since start.")
+METRICS.gauge("cache_entries", "Entries held by each cache.")
+METRICS.gauge("job_queue", "Asynchronous jobs by state (queued, running).")
+
+
+def _hit_ratio(hits: int, lookups: int) -> float:
+    return round(hits / lookups, 4) if lookups else 0.0
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint() -> str:
+    # Prometheus text format. Unauthenticated like /health: no job or customer data.
+    caches: dict[str, tuple[float, int]] = {}
+    source = svg_source_cache_stats()
+    caches["svg_source"] = (float(source["hit_rate"]), int(source["entries"]))
+    for name, stats in render_cache_stats(settings).items():
+        hits = int(stats["hits"]) + int(stats.get("disk_hits", 0))
+        caches[name] = (_hit_ratio(hits, hits + int(stats["misses"])), int(stats["entries"]))
+    for root, stats in disk_cache_stats().items():
+        caches[f"disk:{root}"] = (_hit_ratio(int(stats["hits"]), int(stats["hits"]) + int(stats["misses"])), int(stats["entries"]))
+    for name, (ratio, entries) in caches.items():
+        METRICS.set("cache_hit_ratio", ratio, labels={"cache": name})
+        METRICS.set("cache_entries", entries, labels={"cache": name})
+
+    jobs = _jobs().stats()
+    METRICS.set("job_queue", jobs["queued"], labels={"state": "queued"})
+    METRICS.set("job_queue", int(jobs["jobs"].get("RUNNING", 0)), labels={"state": "running"})
+    return METRICS.render()
+
+
+def _render_kwargs(payload: RenderRequest) -> dict[str, Any]:
+    return {
+        "job_id": payload.job_id,
+        "svg_s3_key": payload.svg_s3_key,
+        "object_mm": payload.object_mm.model_dump() if payload.object_mm is not None else {},
+        "series": payload.series.model_dump(),
+        "custom_fonts": [f.model_dump() for f in (payload.custom_fonts or [])] if payload.custom_fonts is not None else None,
+        "overlays": [o.model_dump() for o in (payload.overlays or [])] if payload.overlays is not None else None,
+        "render_mode": payload.render_mode,
+        "imposition": payload.imposition.model_dump() if payload.imposition is not None else None,
+        "max_pages_per_file": payload.max_pages_per_file,
+        "output_profile": payload.output_profile,
+    }
+
+
+def _profile_requested(x_render_profile: str) -> bool:
+    # Opt-in per request, only alongside a valid x-internal-key.
+    return x_render_profile.strip().lower() in {"1", "true", "yes"}
+
+
 @app.post("/render", response_model=RenderResponse)
-def render_endpoint(payload: RenderRequest, x_internal_key: str = Header(default="", alias="x-internal-key")) -> RenderResponse:
+def render_endpoint(
+    payload: RenderRequest,
+    x_internal_key: str = Header(default="", alias="x-internal-key"),
+    x_render_profile: str = Header(default="", alias="x-render-profile"),
+) -> RenderResponse:
     if x_internal_key != settings.INTERNAL_API_KEY:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
@@ -66,16 +176,7 @@ def render_endpoint(payload: RenderRequest, x_internal_key: str = Header(default
         )
 
     try:
-        result = render_job(
-            settings=settings,
-            job_id=payload.job_id,
-            svg_s3_key=payload.svg_s3_key,
-            object_mm=payload.object_mm.model_dump() if payload.object_mm is not None else {},
-            series=payload.series.model_dump(),
-            custom_fonts=[f.model_dump() for f in (payload.custom_fonts or [])] if payload.custom_fonts is not None else None,
-            overlays=[o.model_dump() for o in (payload.overlays or [])] if payload.overlays is not None else None,
-            render_mode=payload.render_mode,
-        )
+        result = render_job(settings=settings, profile=_profile_requested(x_render_profile), **_render_kwargs(payload))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -83,6 +184,78 @@ def render_endpoint(payload: RenderRequest, x_internal_key: str = Header(default
     return RenderResponse(**result)
 
 
+@app.post("/render/batch", response_model=BatchRenderResponse)
+def render_batch_endpoint(
+    payload: BatchRenderRequest, x_internal_key: str = Header(default="", alias="x-internal-key")
+) -> BatchRenderResponse:
+    if x_internal_key != settings.INTERNAL_API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        result = render_batch(settings=settings, jobs=[_render_kwargs(job) for job in payload.jobs])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info("/render/batch", extra={"jobs": len(payload.jobs), "status": result.get("status")})
+    return BatchRenderResponse(**result)
+
+
 @app.post("/generate", response_model=RenderResponse)
-def generate_endpoint(payload: RenderRequest, x_internal_key: str = Header(default="", alias="x-internal-key")) -> RenderResponse:
-    return render_endpoint(payload=payload, x_internal_key=x_internal_key)
+def generate_endpoint(
+    payload: RenderRequest,
+    x_internal_key: str = Header(default="", alias="x-internal-key"),
+    x_render_profile: str = Header(default="", alias="x-render-profile"),
+) -> RenderResponse:
+    return render_endpoint(payload=payload, x_internal_key=x_internal_key, x_render_profile=x_render_profile)
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+def submit_job_endpoint(
+    payload: RenderRequest,
+    x_internal_key: str = Header(default="", alias="x-internal-key"),
+    x_render_profile: str = Header(default="", alias="x-render-profile"),
+) -> JobResponse:
+    if x_internal_key != settings.INTERNAL_API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    request = _render_kwargs(payload)
+    if _profile_requested(x_render_profile):
+        request["profile"] = True
+    # Reject invalid placement now rather than as a failed job later.
+    try:
+        validate_layout(
+            object_mm=request["object_mm"],
+            series=request["series"],
+            render_mode=resolve_render_mode(payload.render_mode),
+            imposition=request["imposition"],
+        )
+        if request["max_pages_per_file"] is not None:
+            plan_volumes(
+                object_mm=request["object_mm"],
+                series=request["series"],
+                render_mode=resolve_render_mode(payload.render_mode),
+                max_pages=request["max_pages_per_file"],
+                imposition=request["imposition"],
+            )
+        if request["output_profile"] is not None:
+            get_output_profile(request["output_profile"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        job = _jobs().submit(payload.job_id, request)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return JobResponse(**job)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job_endpoint(job_id: str, x_internal_key: str = Header(default="", alias="x-internal-key")) -> JobResponse:
+    if x_internal_key != settings.INTERNAL_API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    job = _jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="JOB_NOT_FOUND")
+    return JobResponse(**job)
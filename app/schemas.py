@@ -66,6 +66,21 @@ class OverlaySvgConfig(BaseModel):
 OverlayConfig = OverlayImageConfig | OverlaySvgConfig
 
 
+class ImpositionConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    sheet: str = "A4"
+    sheet_w_mm: float | None = None
+    sheet_h_mm: float | None = None
+    landscape: bool = False
+    rows: int | None = None
+    cols: int | None = None
+    gutter_mm: float | None = None
+    margin_mm: float = 0.0
+    auto_rotate: bool = False
+    auto_fit: bool = False
+
+
 class RenderRequest(BaseModel):
     job_id: str
     svg_s3_key: str
@@ -74,6 +89,12 @@ class RenderRequest(BaseModel):
     custom_fonts: list[CustomFont] | None = None
     overlays: list[OverlayConfig] | None = None
     render_mode: str | None = None
+    imposition: ImpositionConfig | None = None
+    # Split the output into documents/final/{job_id}/part-NNNN.pdf files of at most
+    # this many pages, with a manifest.json.
+    max_pages_per_file: int | None = None
+    # fast | balanced | small; defaults to OUTPUT_PROFILE.
+    output_profile: str | None = None
 
 
 class RenderResponse(BaseModel):
@@ -81,4 +102,40 @@ class RenderResponse(BaseModel):
     pdf_s3_key: str
     pages: int
     template_id: str
+    manifest_s3_key: str | None = None
+    engine_metrics: dict[str, Any] | None = None
+
+
+class BatchRenderRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    jobs: list[RenderRequest]
+
+
+class BatchRenderResult(BaseModel):
+    job_id: str
+    status: str
+    result: RenderResponse | None = None
+    error: str | None = None
+
+
+class BatchRenderResponse(BaseModel):
+    status: str
+    results: list[BatchRenderResult]
+    engine_metrics: dict[str, Any] | None = None
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    pages_done: int = 0
+    pages_total: int = 0
+    pdf_s3_key: str | None = None
+    manifest_s3_key: str | None = None
+    pages: int | None = None
+    template_id: str | None = None
     engine_metrics: dict[str, Any] | None = None
+    error: str | None = None
+    created_at: float | None = None
+    started_at: float | None = None
+    finished_at: float | None = None
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import io
+import math
+import os
+import threading
+import zlib
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any
+
+from pdfrw import PdfArray, PdfDict, PdfName, PdfReader, PdfWriter
+from PIL import Image
+
+from app.config import Settings
+from app.services.disk_cache import get_disk_cache
+from app.services.raster import is_photographic
+from app.utils.lru import LruCache
+from app.utils.units import mm_to_pt
+
+# Bump when the resampling or encoding changes, so stale artifacts are not reused.
+BACKGROUND_IMAGES_VERSION = "img_v2"
+
+# Image dictionaries we know how to decode: 8-bit RGB or gray, raw Flate or JPEG.
+_COMPONENTS = {"/DeviceRGB": ("RGB", 3), "/DeviceGray": ("L", 1)}
+
+
+@dataclass(frozen=True)
+class BackgroundImages:
+    # The background PDF to render with, and what was done to get it.
+    pdf_path: str
+    images: int = 0
+    resampled: int = 0
+    source_bytes: int = 0
+    bytes: int = 0
+    cached: bool = False
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "images": int(self.images),
+            "resampled": int(self.resampled),
+            "source_bytes": int(self.source_bytes),
+            "bytes": int(self.bytes),
+            "cached": bool(self.cached),
+        }
+
+
+# (converted PDF, pixel bound) -> result, so PDFs with nothing to resample are only
+# parsed once per process.
+_RESULTS: LruCache[BackgroundImages] = LruCache(max_entries=256)
+_LOCK = threading.Lock()
+
+
+def _max_px(object_mm: dict[str, Any], dpi: int) -> int:
+    # The whole SVG page is stretched onto object_mm, so no image in it is printed
+    # larger than the object. Images may be turned inside the SVG, and the object by
+    # rotation_deg, so either image axis can lie along the object's longer side:
+    # that side bounds both.
+    long_pt = mm_to_pt(max(float(object_mm.get("w")), float(object_mm.get("h"))))
+    return max(1, math.ceil(long_pt / 72.0 * dpi))
+
+
+def _images(reader: PdfReader) -> list[PdfDict]:
+    out: list[PdfDict] = []
+    seen: set[int] = set()
+    stack: list[Any] = [reader.Root]
+    while stack:
+        obj = stack.pop()
+        if not isinstance(obj, (PdfDict, PdfArray)) or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, PdfDict):
+            if obj.Subtype == PdfName.Image:
+                out.append(obj)
+            stack.extend(v for k, v in obj.iteritems() if k != PdfName.Parent)
+        else:
+            stack.extend(obj)
+    return out
+
+
+def _decode(image: PdfDict) -> Image.Image | None:
+    # None for anything outside the plain cases (predictors, masks, decode arrays, ...).
+    if image.ImageMask or image.Decode is not None or image.DecodeParms is not None:
+        return None
+    if str(image.BitsPerComponent) != "8" or str(image.ColorSpace) not in _COMPONENTS:
+        return None
+    mode, components = _COMPONENTS[str(image.ColorSpace)]
+    width, height = int(image.Width), int(image.Height)
+    filters = image.Filter if isinstance(image.Filter, PdfArray) else [image.Filter]
+    if len(filters) != 1:
+        return None
+    filter_ = str(filters[0])
+    raw = image.stream.encode("latin-1")
+    try:
+        if filter_ == "/DCTDecode":
+            img = Image.open(io.BytesIO(raw))
+            img.load()
+            return img if img.mode == mode and img.size == (width, height) else None
+        if filter_ == "/FlateDecode":
+            data = zlib.decompress(raw)
+            if len(data) < width * height * components:
+                return None
+            return Image.frombytes(mode, (width, height), data[: width * height * components])
+    except Exception:
+        return None
+    return None
+
+
+def _resample(image: PdfDict, max_px: int, jpeg_quality: int) -> bool:
+    width, height = int(image.Width), int(image.Height)
+    if max(width, height) <= max_px:
+        return False
+    # Aspect kept, so the image is drawn exactly as before.
+    scale = max_px / max(width, height)
+    want = (max(1, round(width * scale)), max(1, round(height * scale)))
+    img = _decode(image)
+    if img is None:
+        return False
+    img = img.resize(want, Image.Resampling.LANCZOS)
+    # Soft masks (alpha) and graphics stay lossless.
+    if img.mode == "RGB" and is_photographic(img):
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=int(jpeg_quality), optimize=True)
+        data, filter_ = out.getvalue(), PdfName.DCTDecode
+    else:
+        data, filter_ = zlib.compress(img.tobytes(), 9), PdfName.FlateDecode
+    image.Width, image.Height = want
+    image.Filter = filter_
+    image.stream = data.decode("latin-1")
+    return True
+
+
+def optimize_background_pdf(
+    *,
+    settings: Settings,
+    pdf_path: str,
+    object_mm: dict[str, Any],
+    cache_dir: str = "tmp/templates",
+) -> BackgroundImages:
+    """Background PDF with its embedded images downsampled for the placed object size.
+
+    The converted SVG-PDF is left untouched; the optimised copy is cached next to it
+    as {converted name}_{BACKGROUND_IMAGES_VERSION}_{n}px.pdf, where n is the longest
+    image side allowed at BACKGROUND_IMAGE_DPI. PDFs whose images are all within the bound
+    (or not decodable here) are used as they are.
+    """
+    dpi = int(getattr(settings, "BACKGROUND_IMAGE_DPI", 0) or 0)
+    if dpi <= 0 or not object_mm.get("w") or not object_mm.get("h"):
+        return BackgroundImages(pdf_path=pdf_path)
+    max_px = _max_px(object_mm, dpi)
+    key = (Path(pdf_path).name, max_px)
+
+    known = _RESULTS.get(key)
+    if known is not None and not known.resampled:
+        return replace(known, pdf_path=pdf_path, cached=True)
+
+    cache = get_disk_cache(cache_dir, settings)
+    name = f"{Path(pdf_path).stem}_{BACKGROUND_IMAGES_VERSION}_{max_px}px.pdf"
+    cached = cache.lookup(name)
+    if cached is not None:
+        if known is not None:
+            return replace(known, pdf_path=str(cached), cached=True)
+        return BackgroundImages(pdf_path=str(cached), cached=True)
+
+    with _LOCK:
+        reader = PdfReader(pdf_path)
+        images = _images(reader)
+        source_bytes = sum(len(i.stream or "") for i in images)
+        resampled = sum(
+            1 for image in images if _resample(image, max_px, int(getattr(settings, "BACKGROUND_JPEG_QUALITY", 85)))
+        )
+        if not resampled:
+            result = BackgroundImages(pdf_path=pdf_path, images=len(images), source_bytes=source_bytes, bytes=source_bytes)
+            _RESULTS.put(key, result)
+            return result
+
+        out_path = cache.path(name)
+        tmp = out_path.with_name(f".{out_path.name}.{os.getpid()}.{threading.get_ident()}")
+        PdfWriter(str(tmp), trailer=reader, compress=True).write()
+        os.replace(tmp, out_path)
+        cache.commit(name)
+
+    result = BackgroundImages(
+        pdf_path=str(out_path),
+        images=len(images),
+        resampled=resampled,
+        source_bytes=source_bytes,
+        bytes=sum(len(i.stream or "") for i in images),
+    )
+    _RESULTS.put(key, result)
+    return result
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from app.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Access times are pushed to the file mtime at most this often, so other processes
+# sharing the directory see recent use without a write per lookup.
+_TOUCH_INTERVAL_S = 60.0
+_UNTRACKED = {"index.json"}
+
+
+class DiskCache:
+    """Budgeted cache directory with sharded layout and LRU eviction.
+
+    Files live at <root>/<subdir>/<name[:2]>/<name>. Lookups and writes are tracked
+    in access order; when the entry or byte budget is exceeded the least recently
+    used files are deleted. File mtimes double as access times, so the order
+    survives restarts and a file another process just used is never evicted.
+    """
+
+    def __init__(self, root: str, *, max_bytes: int, max_entries: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entries = max(0, int(max_entries))
+        # relative path -> (size, last access as wall-clock time)
+        self._entries: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        found: list[tuple[float, str, int]] = []
+        if self.root.exists():
+            for dirpath, _dirnames, filenames in os.walk(self.root):
+                for fn in filenames:
+                    if fn.startswith(".") or fn in _UNTRACKED:
+                        continue
+                    full = Path(dirpath) / fn
+                    try:
+                        st = full.stat()
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, full.relative_to(self.root).as_posix(), int(st.st_size)))
+        found.sort()
+        for mtime, rel, size in found:
+            self._entries[rel] = (size, mtime)
+            self._bytes += size
+
+    def _rel(self, name: str, subdir: str) -> str:
+        shard = name[:2] if len(name) > 2 else "_"
+        return "/".join(p for p in (subdir, shard, name) if p)
+
+    def path(self, name: str, subdir: str = "") -> Path:
+        """Where `name` lives; the shard directory is created."""
+        p = self.root / self._rel(name, subdir)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        return p
+
+    def lookup(self, name: str, subdir: str = "") -> Path | None:
+        """Existing file for `name`, marked as used; None (a miss) if absent."""
+        rel = self._rel(name, subdir)
+        p = self.root / rel
+        if not p.exists():
+            # Files from the flat pre-shard layout are moved into place on first use.
+            legacy = self.root / subdir / name
+            if legacy.is_file():
+                p.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.replace(legacy, p)
+                except OSError:
+                    pass
+                with self._lock:
+                    old = self._entries.pop(Path(subdir, name).as_posix(), None)
+                    if old is not None:
+                        self._bytes -= old[0]
+        if not p.exists():
+            with self._lock:
+                self.misses += 1
+                old = self._entries.pop(rel, None)
+                if old is not None:
+                    self._bytes -= old[0]
+            return None
+        self._touch(rel, p, hit=True)
+        return p
+
+    def _touch(self, rel: str, p: Path, *, hit: bool) -> None:
+        now = time.time()
+        with self._lock:
+            if hit:
+                self.hits += 1
+            entry = self._entries.get(rel)
+            if entry is None:
+                try:
+                    size = int(p.stat().st_size)
+                except OSError:
+                    return
+                self._bytes += size
+                self._entries[rel] = (size, now)
+                last = 0.0
+            else:
+                size, last = entry
+                self._entries[rel] = (size, now)
+                self._entries.move_to_end(rel)
+        if now - last >= _TOUCH_INTERVAL_S:
+            try:
+                os.utime(p)
+            except OSError:
+                pass
+
+    def commit(self, name: str, subdir: str = "") -> Path:
+        """Record a file just written at path(name) and enforce the budgets."""
+        rel = self._rel(name, subdir)
+        p = self.root / rel
+        try:
+            size = int(p.stat().st_size)
+        except OSError:
+            return p
+        with self._lock:
+            old = self._entries.pop(rel, None)
+            if old is not None:
+                self._bytes -= old[0]
+            self._entries[rel] = (size, time.time())
+            self._bytes += size
+        self.enforce(keep=rel)
+        return p
+
+    def discard(self, name: str, subdir: str = "") -> None:
+        rel = self._rel(name, subdir)
+        with self._lock:
+            old = self._entries.pop(rel, None)
+            if old is not None:
+                self._bytes -= old[0]
+        try:
+            (self.root / rel).unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    def _over_budget(self) -> bool:
+        return bool(
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        )
+
+    def enforce(self, keep: str | None = None) -> None:
+        with self._lock:
+            checked = 0
+            while self._over_budget() and checked < len(self._entries):
+                rel, (size, seen) = next(iter(self._entries.items()))
+                checked += 1
+                p = self.root / rel
+                try:
+                    mtime = p.stat().st_mtime
+                except FileNotFoundError:
+                    self._entries.pop(rel)
+                    self._bytes -= size
+                    continue
+                except OSError:
+                    mtime = seen
+                if rel == keep or mtime > seen + 1.0:
+                    # Just written here, or used by another process since we last saw it.
+                    self._entries[rel] = (size, max(seen, mtime))
+                    self._entries.move_to_end(rel)
+                    continue
+                try:
+                    p.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    logger.warning("DISK_CACHE_EVICT_FAILED", extra={"path": str(p)})
+                    self._entries.move_to_end(rel)
+                    continue
+                self._entries.pop(rel)
+                self._bytes -= size
+                self.evictions += 1
+                self.evicted_bytes += size
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "root": str(self.root),
+                "entries": len(self._entries),
+                "bytes": int(self._bytes),
+                "max_entries": int(self.max_entries),
+                "max_bytes": int(self.max_bytes),
+                "hits": int(self.hits),
+                "misses": int(self.misses),
+                "evictions": int(self.evictions),
+                "evicted_bytes": int(self.evicted_bytes),
+            }
+
+
+_CACHES: dict[str, DiskCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_disk_cache(cache_dir: str, settings: Settings) -> DiskCache:
+    """Process-wide DiskCache for `cache_dir`, budgeted by TMP_CACHE_MAX_MB/ENTRIES."""
+    key = str(Path(cache_dir).resolve())
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = DiskCache(
+                cache_dir,
+                max_bytes=int(settings.TMP_CACHE_MAX_MB) * 1024 * 1024,
+                max_entries=int(settings.TMP_CACHE_MAX_ENTRIES),
+            )
+            _CACHES[key] = cache
+        return cache
+
+
+def disk_cache_stats() -> dict[str, Any]:
+    with _CACHES_LOCK:
+        caches = list(_CACHES.values())
+    return {str(c.root): c.stats() for c in caches}
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import json
+import logging
 import os
 import sys
-from functools import lru_cache
+import threading
+import time
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Optional
 
 from fontTools.ttLib import TTFont as FTFont
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont as RLTTFont
 
+from app.config import Settings
+
+logger = logging.getLogger(__name__)
 
 _PDF_CORE_FONTS: list[str] = [
     "Courier",
@@ -49,35 +56,33 @@ def _system_font_dirs() -> list[Path]:
     ]
 
 
-def _iter_font_files() -> list[Path]:
-    out: list[Path] = []
+def _iter_font_files() -> list[tuple[Path, os.stat_result]]:
+    out: list[tuple[Path, os.stat_result]] = []
     seen: set[str] = set()
     for d in _system_font_dirs():
         try:
             if not d.exists() or not d.is_dir():
                 continue
-            for p in d.rglob("*"):
-                if not p.is_file():
-                    continue
-                ext = p.suffix.lower()
-                if ext not in {".ttf", ".otf"}:
-                    continue
-                key = str(p).lower()
-                if key in seen:
-                    continue
-                seen.add(key)
-                out.append(p)
+            for dirpath, _dirnames, filenames in os.walk(d):
+                for fn in filenames:
+                    if os.path.splitext(fn)[1].lower() not in {".ttf", ".otf"}:
+                        continue
+                    p = Path(dirpath) / fn
+                    key = str(p).lower()
+                    if key in seen:
+                        continue
+                    try:
+                        st = p.stat()
+                    except OSError:
+                        continue
+                    seen.add(key)
+                    out.append((p, st))
         except Exception:
             continue
     return out
 
 
-def _font_family_from_file(path: Path) -> Optional[str]:
-    try:
-        font = FTFont(str(path), recalcBBoxes=False, recalcTimestamp=False)
-    except Exception:
-        return None
-
+def _font_family_from_file(font: FTFont) -> Optional[str]:
     try:
         name_table = font["name"]
     except Exception:
@@ -103,9 +108,8 @@ def _font_family_from_file(path: Path) -> Optional[str]:
     return best
 
 
-def _font_embeddable(path: Path) -> bool:
+def _font_embeddable(font: FTFont) -> bool:
     try:
-        font = FTFont(str(path), recalcBBoxes=False, recalcTimestamp=False)
         os2 = font.get("OS/2")
         fs_type = int(getattr(os2, "fsType", 0) or 0) if os2 is not None else 0
         restricted = bool(fs_type & 0x0002)
@@ -114,49 +118,191 @@ def _font_embeddable(path: Path) -> bool:
         return True
 
 
-@lru_cache(maxsize=1)
-def get_font_registry() -> list[dict[str, Any]]:
-    out: list[dict[str, Any]] = []
-    seen: set[str] = set()
+def _read_font_file(path: Path) -> tuple[Optional[str], bool]:
+    # One parse per file: the family name and the embedding permission both come
+    # from the same TTFont (tables are loaded lazily).
+    try:
+        font = FTFont(str(path), recalcBBoxes=False, recalcTimestamp=False, lazy=True)
+    except Exception:
+        return None, True
+    try:
+        return _font_family_from_file(font), _font_embeddable(font)
+    finally:
+        font.close()
 
-    for name in _PDF_CORE_FONTS:
-        key = name.lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append({"family": name, "source": "pdf-core", "path": None, "embeddable": False})
 
-    for p in _iter_font_files():
-        family = _font_family_from_file(p)
-        if not family:
-            continue
-        key = family.lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append({"family": family, "source": "system", "path": str(p), "embeddable": bool(_font_embeddable(p))})
+_FONT_INDEX_VERSION = 1
 
-    out.sort(key=lambda x: str(x.get("family") or "").lower())
-    return out
 
+@dataclass(frozen=True)
+class _FontFileEntry:
+    mtime_ns: int
+    size: int
+    family: Optional[str]
+    embeddable: bool
 
-def resolve_font_family(requested_family: str) -> tuple[str, str, bool]:
+
+class _FontIndex:
+    """System font files -> (family, embeddable), persisted as one JSON file.
+
+    Entries are keyed by path and reused while the file's mtime and size are
+    unchanged, so a refresh only walks the font dirs and parses new or modified
+    files. Families resolve through a dict built on each refresh.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.RLock()
+        self._files: dict[str, _FontFileEntry] = {}
+        self._registry: list[dict[str, Any]] = []
+        self._by_family: dict[str, dict[str, Any]] = {}
+        self._by_file_name: dict[str, str] = {}
+        self._loaded = False
+        self.last_refresh: dict[str, Any] = {}
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            if int(raw.get("version") or 0) == _FONT_INDEX_VERSION:
+                self._files = {str(k): _FontFileEntry(**v) for k, v in (raw.get("files") or {}).items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError):
+            logger.warning("FONT_INDEX_UNREADABLE", extra={"path": str(path)})
+
+    def refresh(self) -> dict[str, Any]:
+        with self._lock:
+            t0 = time.perf_counter()
+            files: dict[str, _FontFileEntry] = {}
+            parsed = 0
+            for p, st in _iter_font_files():
+                key = str(p)
+                entry = self._files.get(key)
+                if entry is None or entry.mtime_ns != int(st.st_mtime_ns) or entry.size != int(st.st_size):
+                    family, embeddable = _read_font_file(p)
+                    entry = _FontFileEntry(
+                        mtime_ns=int(st.st_mtime_ns), size=int(st.st_size), family=family, embeddable=bool(embeddable)
+                    )
+                    parsed += 1
+                files[key] = entry
+
+            removed = len(set(self._files) - set(files))
+            changed = bool(parsed or removed or not self._path.exists())
+            self._files = files
+            self._rebuild()
+            self._loaded = True
+            if changed:
+                self._save()
+
+            self.last_refresh = {
+                "files": len(files),
+                "parsed": int(parsed),
+                "reused": int(len(files) - parsed),
+                "removed": int(removed),
+                "families": len(self._registry),
+                "seconds": round(float(time.perf_counter() - t0), 4),
+            }
+            logger.info("FONT_INDEX_REFRESHED", extra=dict(self.last_refresh))
+            return dict(self.last_refresh)
+
+    def _rebuild(self) -> None:
+        out: list[dict[str, Any]] = []
+        by_family: dict[str, dict[str, Any]] = {}
+
+        for name in _PDF_CORE_FONTS:
+            key = name.lower()
+            if key in by_family:
+                continue
+            f = {"family": name, "source": "pdf-core", "path": None, "embeddable": False}
+            by_family[key] = f
+            out.append(f)
+
+        # Files are in walk order, so the first file of a family wins.
+        for path, entry in self._files.items():
+            if not entry.family:
+                continue
+            key = entry.family.lower()
+            if key in by_family:
+                continue
+            f = {"family": entry.family, "source": "system", "path": path, "embeddable": bool(entry.embeddable)}
+            by_family[key] = f
+            out.append(f)
+
+        by_file_name: dict[str, str] = {}
+        for path in self._files:
+            by_file_name.setdefault(Path(path).name.lower(), path)
+
+        out.sort(key=lambda x: str(x.get("family") or "").lower())
+        self._registry = out
+        self._by_family = by_family
+        self._by_file_name = by_file_name
+
+    def _save(self) -> None:
+        data = json.dumps({"version": _FONT_INDEX_VERSION, "files": {k: asdict(v) for k, v in self._files.items()}})
+        tmp = self._path.with_name(f".{self._path.name}.{os.getpid()}.{threading.get_ident()}")
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, self._path)
+        except OSError:
+            logger.exception("FONT_INDEX_WRITE_FAILED", extra={"path": str(self._path)})
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self.refresh()
+
+    def registry(self) -> list[dict[str, Any]]:
+        self._ensure_loaded()
+        return self._registry
+
+    def lookup(self, family: str) -> Optional[dict[str, Any]]:
+        self._ensure_loaded()
+        return self._by_family.get(family.lower())
+
+    def find_file(self, file_name: str) -> Optional[str]:
+        self._ensure_loaded()
+        return self._by_file_name.get(file_name.lower())
+
+
+_FONT_INDEXES: dict[str, _FontIndex] = {}
+_FONT_INDEXES_LOCK = threading.Lock()
+
+
+def _font_index(settings: Settings) -> _FontIndex:
+    path = str(Path(settings.FONT_INDEX_PATH).resolve())
+    with _FONT_INDEXES_LOCK:
+        index = _FONT_INDEXES.get(path)
+        if index is None:
+            index = _FontIndex(Path(path))
+            _FONT_INDEXES[path] = index
+        return index
+
+
+def get_font_registry(settings: Settings) -> list[dict[str, Any]]:
+    return _font_index(settings).registry()
+
+
+def refresh_font_registry(settings: Settings) -> dict[str, Any]:
+    """Rescan the system font dirs; only new or modified files are parsed."""
+    return _font_index(settings).refresh()
+
+
+def find_font_file(file_name: str, settings: Settings) -> Optional[str]:
+    """Path of an indexed system font file by its file name (first in walk order)."""
+    return _font_index(settings).find_file(file_name)
+
+
+def resolve_font_family(requested_family: str, settings: Settings) -> tuple[str, str, bool]:
     requested = str(requested_family or "").strip()
     if not requested:
         return "Helvetica", "pdf-core", False
 
-    registry = get_font_registry()
-
     registered = set([str(n) for n in pdfmetrics.getRegisteredFontNames()])
     if requested in registered or requested in _PDF_CORE_FONTS:
         return requested, ("pdf-core" if requested in _PDF_CORE_FONTS else "registered"), (requested not in _PDF_CORE_FONTS)
 
-    hit: Optional[dict[str, Any]] = None
-    for f in registry:
-        if str(f.get("family") or "").lower() == requested.lower():
-            hit = f
-            break
-
+    hit = _font_index(settings).lookup(requested)
     if not hit:
         return "Helvetica", "pdf-core", False
 
@@ -165,8 +311,11 @@ def resolve_font_family(requested_family: str) -> tuple[str, str, bool]:
     if not path or not embeddable:
         return "Helvetica", str(hit.get("source") or "unknown"), False
 
+    family = str(hit.get("family"))
+    if family in registered:
+        return family, str(hit.get("source")), True
     try:
-        pdfmetrics.registerFont(RLTTFont(str(hit.get("family")), path))
-        return str(hit.get("family")), str(hit.get("source")), True
+        pdfmetrics.registerFont(RLTTFont(family, path))
+        return family, str(hit.get("source")), True
     except Exception:
         return "Helvetica", str(hit.get("source") or "system"), False
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from app.utils.units import mm_to_pt
+
+# Portrait (w, h) in mm.
+SHEET_SIZES_MM: dict[str, tuple[float, float]] = {
+    "A4": (210.0, 297.0),
+    "A3": (297.0, 420.0),
+    "SRA3": (320.0, 450.0),
+}
+
+# Rounding slack so an object that fits exactly in mm is not rejected in pt.
+_FIT_EPSILON_PT = 1e-6
+
+
+@dataclass(frozen=True, slots=True)
+class Imposition:
+    sheet: str
+    sheet_w_pt: float
+    sheet_h_pt: float
+    landscape: bool
+    rows: int
+    cols: int
+    rotated: bool  # objects turned 90° counterclockwise in their cells
+    cell_w_pt: float
+    cell_h_pt: float
+    gutter_pt: float
+    margin_pt: float
+
+    @property
+    def per_sheet(self) -> int:
+        return self.rows * self.cols
+
+    @property
+    def grid_w_pt(self) -> float:
+        return self.cols * self.cell_w_pt + (self.cols - 1) * self.gutter_pt
+
+    @property
+    def grid_h_pt(self) -> float:
+        return self.rows * self.cell_h_pt + (self.rows - 1) * self.gutter_pt
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "sheet": self.sheet,
+            "landscape": bool(self.landscape),
+            "sheet_pt": {"w": float(self.sheet_w_pt), "h": float(self.sheet_h_pt)},
+            "rows": int(self.rows),
+            "cols": int(self.cols),
+            "per_sheet": int(self.per_sheet),
+            "rotated": bool(self.rotated),
+            "gutter_pt": float(self.gutter_pt),
+            "margin_pt": float(self.margin_pt),
+        }
+
+
+def _positive_int(raw: Any, field: str) -> int | None:
+    if raw is None:
+        return None
+    try:
+        n = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"imposition.{field} must be an integer")
+    if n <= 0:
+        raise ValueError(f"imposition.{field} must be > 0")
+    return n
+
+
+def _non_negative_mm(raw: Any, field: str, default: float) -> float:
+    if raw is None:
+        return default
+    try:
+        v = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"imposition.{field} must be a number")
+    if v < 0:
+        raise ValueError(f"imposition.{field} must be >= 0")
+    return v
+
+
+def _sheet_size_pt(cfg: Dict[str, Any]) -> tuple[str, float, float]:
+    sheet = str(cfg.get("sheet") or "A4").strip().upper()
+    if sheet == "CUSTOM":
+        w_mm = cfg.get("sheet_w_mm")
+        h_mm = cfg.get("sheet_h_mm")
+        if w_mm is None or h_mm is None or float(w_mm) <= 0 or float(h_mm) <= 0:
+            raise ValueError("imposition.sheet_w_mm and imposition.sheet_h_mm must be > 0 for a custom sheet")
+        return "custom", mm_to_pt(float(w_mm)), mm_to_pt(float(h_mm))
+    if sheet not in SHEET_SIZES_MM:
+        raise ValueError(f"imposition.sheet must be one of {', '.join(SHEET_SIZES_MM)} or custom")
+    w_mm, h_mm = SHEET_SIZES_MM[sheet]
+    return sheet, mm_to_pt(w_mm), mm_to_pt(h_mm)
+
+
+def _fit(avail_pt: float, cell_pt: float, gutter_pt: float) -> int:
+    if avail_pt + _FIT_EPSILON_PT < cell_pt:
+        return 0
+    return int(math.floor((avail_pt - cell_pt + _FIT_EPSILON_PT) / (cell_pt + gutter_pt))) + 1
+
+
+def _grid_room_pt(area_pt: float, offset_pt: float, align: str) -> float:
+    # Room left for the grid once it is aligned in the area and offset: both of its
+    # edges must stay inside the margins. An offset pushing an edge-aligned grid
+    # past its own edge leaves no room at all.
+    if align == "center":
+        return area_pt - 2 * abs(offset_pt)
+    if align == "right":
+        return area_pt + offset_pt if offset_pt <= 0 else 0.0
+    return area_pt - offset_pt if offset_pt >= 0 else 0.0
+
+
+def plan_imposition(
+    cfg: Dict[str, Any],
+    *,
+    object_w_pt: float,
+    object_h_pt: float,
+    default_gutter_mm: float,
+    offset_x_pt: float = 0.0,
+    offset_y_pt: float = 0.0,
+    align_x: str = "center",
+) -> Imposition:
+    """Grid of objects on a sheet.
+
+    rows/cols default to as many as fit in the sheet less its margins, with the grid
+    aligned left, center or right (align_x), top-aligned, and shifted by the grid
+    offset (exact_mm x_mm/y_mm); a grid crossing a margin there does not fit.
+    auto_rotate also tries the object turned 90°; auto_fit ignores rows/cols and
+    picks the sheet orientation and rotation with the most objects per sheet (ties
+    keep the unrotated, requested orientation).
+    """
+    sheet, base_w_pt, base_h_pt = _sheet_size_pt(cfg)
+    landscape = bool(cfg.get("landscape"))
+    rows_req = _positive_int(cfg.get("rows"), "rows")
+    cols_req = _positive_int(cfg.get("cols"), "cols")
+    gutter_pt = mm_to_pt(_non_negative_mm(cfg.get("gutter_mm"), "gutter_mm", default_gutter_mm))
+    margin_pt = mm_to_pt(_non_negative_mm(cfg.get("margin_mm"), "margin_mm", 0.0))
+    auto_rotate = bool(cfg.get("auto_rotate"))
+    auto_fit = bool(cfg.get("auto_fit"))
+
+    orientations = [landscape, not landscape] if auto_fit else [landscape]
+    rotations = [False, True] if auto_rotate else [False]
+
+    best: Imposition | None = None
+    for is_landscape in orientations:
+        sheet_w_pt, sheet_h_pt = (base_h_pt, base_w_pt) if is_landscape else (base_w_pt, base_h_pt)
+        avail_w = _grid_room_pt(sheet_w_pt - 2 * margin_pt, offset_x_pt, align_x)
+        avail_h = _grid_room_pt(sheet_h_pt - 2 * margin_pt, offset_y_pt, "left")
+        for rotated in rotations:
+            cell_w, cell_h = (object_h_pt, object_w_pt) if rotated else (object_w_pt, object_h_pt)
+            max_cols = _fit(avail_w, cell_w, gutter_pt)
+            max_rows = _fit(avail_h, cell_h, gutter_pt)
+            cols = max_cols if auto_fit or cols_req is None else cols_req
+            rows = max_rows if auto_fit or rows_req is None else rows_req
+            if rows <= 0 or cols <= 0 or rows > max_rows or cols > max_cols:
+                continue
+            candidate = Imposition(
+                sheet=sheet,
+                sheet_w_pt=sheet_w_pt,
+                sheet_h_pt=sheet_h_pt,
+                landscape=is_landscape,
+                rows=rows,
+                cols=cols,
+                rotated=rotated,
+                cell_w_pt=cell_w,
+                cell_h_pt=cell_h,
+                gutter_pt=gutter_pt,
+                margin_pt=margin_pt,
+            )
+            if best is None or candidate.per_sheet > best.per_sheet:
+                best = candidate
+
+    if best is None:
+        raise ValueError("IMPOSITION_DOES_NOT_FIT")
+    return best
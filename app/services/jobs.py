@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, Optional
+
+from app.config import Settings
+from app.utils.hash import sha256_hex
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one process per JOB_STATE_DIR is assumed.
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+_ACTIVE = {JOB_QUEUED, JOB_RUNNING}
+
+# Finished jobs kept for GET /jobs/{id}; older ones are forgotten, and with the
+# file backend their state files are removed.
+_MAX_FINISHED_JOBS = 1000
+# Progress is written to the state file at most this often while a job runs.
+_PERSIST_INTERVAL_S = 1.0
+
+# runner(request, progress) -> render_job result; progress(pages_done, pages_total).
+JobRunner = Callable[[dict[str, Any], Callable[[int, int], None]], dict[str, Any]]
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class JobRecord:
+    job_id: str
+    request: dict[str, Any]
+    status: str = JOB_QUEUED
+    pages_done: int = 0
+    pages_total: int = 0
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def view(self) -> dict[str, Any]:
+        result = self.result or {}
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "pages_done": int(self.pages_done),
+            "pages_total": int(self.pages_total),
+            "pdf_s3_key": result.get("pdf_s3_key"),
+            "manifest_s3_key": result.get("manifest_s3_key"),
+            "pages": result.get("pages"),
+            "template_id": result.get("template_id"),
+            "engine_metrics": result.get("engine_metrics"),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Bounded render queue drained by local worker threads.
+
+    With the "file" backend every job is mirrored to JOB_STATE_DIR, so status
+    survives a restart and jobs that were queued or running are picked up again,
+    by start(), in the one process holding the directory's lock file.
+    """
+
+    def __init__(self, *, settings: Settings, runner: JobRunner) -> None:
+        self._runner = runner
+        self._worker_count = max(1, int(settings.JOB_WORKERS))
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max(1, int(settings.JOB_QUEUE_SIZE)))
+        self._jobs: dict[str, JobRecord] = {}
+        self._finished: deque[str] = deque()
+        self._persisted_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._state_dir: Path | None = None
+        self._dir_lock: IO[str] | None = None
+        if settings.JOB_QUEUE_BACKEND == "file":
+            self._state_dir = Path(settings.JOB_STATE_DIR)
+            self._state_dir.mkdir(parents=True, exist_ok=True)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            if self._state_dir is not None and self._claim_state_dir():
+                self._recover()
+            for i in range(self._worker_count):
+                t = threading.Thread(target=self._work, name=f"render-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def close(self) -> None:
+        """Release the state dir lock; pending jobs are resumed by its next holder."""
+        with self._lock:
+            if self._dir_lock is not None:
+                self._dir_lock.close()
+                self._dir_lock = None
+
+    def submit(self, job_id: str, request: dict[str, Any]) -> dict[str, Any]:
+        with self._lock:
+            existing = self._jobs.get(job_id)
+            if existing is not None and existing.status in _ACTIVE:
+                # Re-posting a job that is still pending returns the same handle.
+                return existing.view()
+
+            record = JobRecord(job_id=job_id, request=dict(request), created_at=time.time())
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                raise JobQueueFull("JOB_QUEUE_FULL")
+            self._jobs[job_id] = record
+            self._persist(record)
+            view = record.view()
+
+        logger.info("JOB_QUEUED", extra={"job_id": job_id, "queued": self._queue.qsize()})
+        return view
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is not None:
+                return record.view()
+        record = self._load(self._state_path(job_id)) if self._state_dir is not None else None
+        return record.view() if record is not None and record.job_id == job_id else None
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            by_status: dict[str, int] = {}
+            for record in self._jobs.values():
+                by_status[record.status] = by_status.get(record.status, 0) + 1
+        return {
+            "workers": self._worker_count,
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "jobs": by_status,
+        }
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception:
+                logger.exception("JOB_WORKER_ERROR", extra={"job_id": job_id})
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id: str) -> None:
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None or record.status != JOB_QUEUED:
+                return
+            record.status = JOB_RUNNING
+            record.started_at = time.time()
+            self._persist(record)
+            request = dict(record.request)
+
+        def progress(pages_done: int, pages_total: int) -> None:
+            with self._lock:
+                record.pages_done = int(pages_done)
+                record.pages_total = int(pages_total)
+                if time.monotonic() - self._persisted_at.get(record.job_id, 0.0) >= _PERSIST_INTERVAL_S:
+                    self._persist(record)
+
+        t0 = time.perf_counter()
+        result: dict[str, Any] | None = None
+        error: str | None = None
+        try:
+            result = self._runner(request, progress)
+        except ValueError as e:
+            error = str(e)
+        except Exception as e:
+            logger.exception("JOB_FAILED", extra={"job_id": job_id})
+            error = f"{type(e).__name__}: {e}"
+
+        with self._lock:
+            record.finished_at = time.time()
+            if error is None and result is not None:
+                record.status = JOB_DONE
+                record.result = result
+                record.pages_done = record.pages_total = int(result.get("pages") or record.pages_total)
+            else:
+                record.status = JOB_FAILED
+                record.error = error
+            self._persist(record)
+            self._retire(record)
+
+        logger.info(
+            "JOB_FINISHED",
+            extra={"job_id": job_id, "status": record.status, "seconds": round(time.perf_counter() - t0, 3), "error": error},
+        )
+
+    def _retire(self, record: JobRecord) -> None:
+        # Caller holds the lock.
+        self._finished.append(record.job_id)
+        self._persisted_at.pop(record.job_id, None)
+        while len(self._finished) > _MAX_FINISHED_JOBS:
+            old_id = self._finished.popleft()
+            old = self._jobs.get(old_id)
+            # A job id posted again is kept until its latest run is the oldest.
+            if old is None or old.status in _ACTIVE or old_id in self._finished:
+                continue
+            del self._jobs[old_id]
+            if self._state_dir is not None:
+                try:
+                    self._state_path(old_id).unlink(missing_ok=True)
+                except OSError:
+                    logger.warning("JOB_STATE_DELETE_FAILED", extra={"job_id": old_id})
+
+    def _state_path(self, job_id: str) -> Path:
+        # Job ids come from callers; hash them so they are always safe file names.
+        assert self._state_dir is not None
+        return self._state_dir / f"{sha256_hex(job_id.encode('utf-8'))[:32]}.json"
+
+    def _persist(self, record: JobRecord) -> None:
+        # Caller holds the lock.
+        if self._state_dir is None:
+            return
+        path = self._state_path(record.job_id)
+        tmp = path.with_suffix(".json.tmp")
+        try:
+            tmp.write_text(json.dumps(asdict(record), default=str), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            logger.exception("JOB_STATE_WRITE_FAILED", extra={"job_id": record.job_id})
+        self._persisted_at[record.job_id] = time.monotonic()
+
+    def _load(self, path: Path) -> JobRecord | None:
+        try:
+            return JobRecord(**json.loads(path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError):
+            logger.warning("JOB_STATE_UNREADABLE", extra={"path": str(path)})
+            return None
+
+    def _claim_state_dir(self) -> bool:
+        # Only the process holding JOB_STATE_DIR/.lock (for as long as it runs) resumes
+        # pending jobs, so several uvicorn workers do not each queue them again. The
+        # others still run the jobs posted to them and read any job's state file.
+        assert self._state_dir is not None
+        if fcntl is None:
+            return True
+        f = open(self._state_dir / ".lock", "a+", encoding="utf-8")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            logger.info("JOB_STATE_DIR_LOCKED", extra={"dir": str(self._state_dir), "pid": os.getpid()})
+            return False
+        self._dir_lock = f
+        return True
+
+    def _recover(self) -> None:
+        assert self._state_dir is not None
+        records = [r for r in (self._load(p) for p in self._state_dir.glob("*.json")) if r is not None]
+        records.sort(key=lambda r: r.created_at)
+
+        requeued = 0
+        for record in records:
+            if record.status in _ACTIVE:
+                # A job that was running when the process stopped starts over.
+                record.status = JOB_QUEUED
+                record.pages_done = 0
+                record.started_at = None
+                try:
+                    self._queue.put_nowait(record.job_id)
+                    requeued += 1
+                except queue.Full:
+                    record.status = JOB_FAILED
+                    record.error = "JOB_QUEUE_FULL"
+                    record.finished_at = time.time()
+                self._persist(record)
+            self._jobs[record.job_id] = record
+            if record.status not in _ACTIVE:
+                self._retire(record)
+
+        if records:
+            logger.info("JOB_STATE_RECOVERED", extra={"jobs": len(records), "requeued": requeued})
@@ -0,0 +1,646 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from reportlab.lib import colors
+
+from app.services.imposition import Imposition, plan_imposition
+from app.utils.units import mm_to_pt
+
+A4_WIDTH_MM = 210.0
+A4_HEIGHT_MM = 297.0
+OBJECTS_PER_PAGE = 4
+
+BASELINE_CORRECTION_MM = 0.0
+
+# Serials drawn as vector outlines instead of text; placement follows exact_mm.
+OUTLINED_RENDER_MODES = {"deterministic_outlined"}
+
+# PDF affine matrix (a, b, c, d, e, f) as used by the `cm` operator.
+Matrix = tuple[float, float, float, float, float, float]
+
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def translate(tx: float, ty: float) -> Matrix:
+    return (1.0, 0.0, 0.0, 1.0, float(tx), float(ty))
+
+
+def rotate(deg: float) -> Matrix:
+    # Same construction as reportlab's Canvas.rotate.
+    theta = math.radians(float(deg))
+    c = math.cos(theta)
+    s = math.sin(theta)
+    return (c, s, -s, c, 0.0, 0.0)
+
+
+def scale(sx: float, sy: float) -> Matrix:
+    return (float(sx), 0.0, 0.0, float(sy), 0.0, 0.0)
+
+
+def concat(*ms: Matrix) -> Matrix:
+    # Compose matrices in canvas call order: concat(a, b) == canvas.transform(*a); canvas.transform(*b).
+    a0, b0, c0, d0, e0, f0 = IDENTITY
+    for a, b, c, d, e, f in ms:
+        a0, b0, c0, d0, e0, f0 = (
+            a * a0 + b * c0,
+            a * b0 + b * d0,
+            c * a0 + d * c0,
+            c * b0 + d * d0,
+            e * a0 + f * c0 + e0,
+            e * b0 + f * d0 + f0,
+        )
+    return (a0, b0, c0, d0, e0, f0)
+
+
+@dataclass(frozen=True, slots=True)
+class SlotPlan:
+    index: int
+    slot_rect_pt: tuple[float, float, float, float]
+    clip_rect_pt: tuple[float, float, float, float]
+    object_origin_pt: tuple[float, float]
+    series_origin_pt: tuple[float, float]
+    series_matrix: Matrix
+    # Object space (bottom-left origin, unrotated) -> page.
+    object_matrix: Matrix
+
+
+@dataclass(frozen=True, slots=True)
+class SeriesStyle:
+    prefix: str
+    base: int
+    width: int
+    count: int
+    anchor_space: str
+    x_mm: float
+    y_mm: float
+    font_size_mm: float
+    font_size_pt: float
+    per_letter_sizes_pt: tuple[float, ...] | None
+    letter_spacing_pt: float
+    rotation_deg: float
+    fill_color: Any
+
+    def value(self, i: int) -> str:
+        return f"{self.prefix}{str(self.base + i).zfill(self.width)}"
+
+
+@dataclass(frozen=True, slots=True)
+class SlotGeometry:
+    mode: str
+    page_w_pt: float
+    page_h_pt: float
+    slot_w_pt: float
+    slot_h_pt: float
+    object_w_pt: float
+    object_h_pt: float
+    object_rotation_deg: float
+    slots: tuple[SlotPlan, ...]
+    imposition: Imposition | None = None
+
+    @property
+    def objects_per_page(self) -> int:
+        return len(self.slots)
+
+
+@dataclass(frozen=True, slots=True)
+class Volume:
+    # One output file of a job split by pages; ranges are half-open, pages 0-based.
+    part: int
+    page_start: int
+    page_stop: int
+    serial_start: int
+    serial_stop: int
+    first_serial: str
+    last_serial: str
+
+
+@dataclass(frozen=True, slots=True)
+class LayoutPlan:
+    geometry: SlotGeometry
+    series: SeriesStyle
+    svg_w_pt: float
+    svg_h_pt: float
+    scale_x: float
+    scale_y: float
+    background_matrices: tuple[Matrix, ...]
+    overlay_matrices: tuple[tuple[Matrix | None, ...], ...]
+    total_pages: int
+    debug: bool
+
+    @property
+    def slots(self) -> tuple[SlotPlan, ...]:
+        return self.geometry.slots
+
+
+def is_outlined_mode(render_mode: str) -> bool:
+    return str(render_mode or "").strip() in OUTLINED_RENDER_MODES
+
+
+def placement_mode(render_mode: str) -> str:
+    mode = str(render_mode or "").strip() or "legacy"
+    return "exact_mm" if mode in OUTLINED_RENDER_MODES else mode
+
+
+def debug_series_enabled() -> bool:
+    return os.getenv("PRINT_ENGINE_DEBUG_SERIES") == "1"
+
+
+def _parse_series_start(start: str) -> tuple[str, int, int]:
+    # NOTE: Spaces inside series prefix are valid and must be preserved
+    series_start = str(start)
+    match = re.search(r"(\d+)$", series_start)
+    if not match:
+        raise ValueError("Series must end with a numeric part")
+    number_part = match.group(1)
+    prefix_part = series_start[: match.start()]
+    return prefix_part, int(number_part), len(number_part)
+
+
+def _object_size_pt(object_mm: Dict[str, Any]) -> tuple[float, float]:
+    # Slot is the primary layout unit. User input defines an internal object box inside the slot.
+    # object_mm.w/h define the physical print size of the object.
+    w_mm = object_mm.get("w")
+    h_mm = object_mm.get("h")
+
+    if w_mm is None or h_mm is None:
+        raise ValueError("object_mm.w and object_mm.h are required")
+
+    w_pt = mm_to_pt(float(w_mm))
+    h_pt = mm_to_pt(float(h_mm))
+    if w_pt <= 0 or h_pt <= 0:
+        raise ValueError("object_mm.w and object_mm.h must be > 0")
+    return w_pt, h_pt
+
+
+def _series_fill_color(raw: Any):
+    series_color_raw = str(raw or "#000000").strip()
+    try:
+        return colors.HexColor(series_color_raw) if series_color_raw.startswith("#") else colors.toColor(series_color_raw)
+    except Exception:
+        return colors.black
+
+
+def compile_series_style(series_cfg: Dict[str, Any]) -> SeriesStyle:
+    count = int(series_cfg.get("count"))
+    if count <= 0:
+        raise ValueError("series.count must be > 0")
+
+    font_size_mm = float(series_cfg.get("font_size_mm"))
+    if font_size_mm <= 0:
+        raise ValueError("series.font_size_mm must be > 0")
+
+    per_letter_sizes_mm_raw = series_cfg.get("per_letter_font_size_mm")
+    per_letter_sizes_pt: tuple[float, ...] | None = None
+    if per_letter_sizes_mm_raw is not None:
+        if not isinstance(per_letter_sizes_mm_raw, list):
+            raise ValueError("series.per_letter_font_size_mm must be a list of numbers")
+        sizes: list[float] = []
+        for v in per_letter_sizes_mm_raw:
+            try:
+                n = float(v)
+            except (TypeError, ValueError):
+                continue
+            if n > 0:
+                sizes.append(mm_to_pt(n))
+        per_letter_sizes_pt = tuple(sizes) or None
+
+    anchor_space = str(series_cfg.get("anchor_space") or "").strip().lower()
+    x_mm_series = series_cfg.get("x_mm")
+    y_mm_series = series_cfg.get("y_mm")
+    if anchor_space != "object_mm" or x_mm_series is None or y_mm_series is None:
+        raise ValueError("series placement invalid: requires anchor_space=object_mm and x_mm/y_mm")
+
+    prefix, base, width = _parse_series_start(series_cfg.get("start"))
+
+    return SeriesStyle(
+        prefix=prefix,
+        base=base,
+        width=width,
+        count=count,
+        anchor_space=anchor_space,
+        x_mm=float(x_mm_series),
+        y_mm=float(y_mm_series),
+        font_size_mm=font_size_mm,
+        font_size_pt=mm_to_pt(font_size_mm),
+        per_letter_sizes_pt=per_letter_sizes_pt,
+        letter_spacing_pt=mm_to_pt(float(series_cfg.get("letter_spacing_mm") or 0.0)),
+        rotation_deg=float(series_cfg.get("rotation_deg") or 0.0),
+        fill_color=_series_fill_color(series_cfg.get("color")),
+    )
+
+
+def _cut_margin_mm(object_box_cfg: Dict[str, Any]) -> float:
+    cut_margin_mm_raw = object_box_cfg.get("cut_margin_mm")
+    try:
+        cut_margin_mm = float(cut_margin_mm_raw) if cut_margin_mm_raw is not None else 0.0
+    except (TypeError, ValueError):
+        cut_margin_mm = 0.0
+    if cut_margin_mm < 0:
+        cut_margin_mm = 0.0
+    return cut_margin_mm
+
+
+def _exact_mm_object_x_pt(object_box_cfg: Dict[str, Any], *, page_w_pt: float, slot_x_pt: float, slot_w_pt: float, object_w_pt: float) -> float:
+    x_mm = object_box_cfg.get("x_mm")
+    if x_mm is None:
+        x_mm = object_box_cfg.get("x")
+    x_offset_pt = mm_to_pt(float(x_mm)) if x_mm is not None else 0.0
+
+    alignment = str((object_box_cfg.get("alignment") or "center")).strip().lower()
+
+    # x_mm = 0 is absolute, alignment must not interfere
+    # Keep non-zero behavior identical.
+    if x_mm is not None and float(x_mm) == 0.0:
+        page_left_pt = 0.0
+        if alignment == "right":
+            return (page_left_pt + float(page_w_pt)) - float(object_w_pt)
+        return page_left_pt
+
+    if alignment == "left":
+        base_x = slot_x_pt
+    elif alignment == "right":
+        base_x = slot_x_pt + slot_w_pt - object_w_pt
+    else:
+        base_x = slot_x_pt + (slot_w_pt - object_w_pt) / 2
+    return base_x + x_offset_pt
+
+
+def _object_rotation_deg(object_box_cfg: Dict[str, Any]) -> float:
+    rotation_deg_raw = object_box_cfg.get("rotation_deg")
+    try:
+        return float(rotation_deg_raw) if rotation_deg_raw is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _compile_imposed_geometry(
+    object_box_cfg: Dict[str, Any], series: SeriesStyle, mode: str, imposition_cfg: Dict[str, Any]
+) -> SlotGeometry:
+    # Grid of object-sized cells on the sheet, cut_margin_mm apart unless a gutter is given.
+    # exact_mm: alignment and x_mm place the grid horizontally inside the sheet margins
+    # (x_mm = 0 is flush, as for a single column), y_mm offsets it from the top margin.
+    # legacy: the grid is centered on the sheet.
+    object_w_pt, object_h_pt = _object_size_pt(object_box_cfg)
+    offset_x_pt = offset_y_pt = 0.0
+    align_x = "center"
+    if mode == "exact_mm":
+        x_mm = object_box_cfg.get("x_mm")
+        if x_mm is None:
+            x_mm = object_box_cfg.get("x")
+        y_mm = object_box_cfg.get("y_mm")
+        if y_mm is None:
+            y_mm = object_box_cfg.get("y")
+        offset_x_pt = mm_to_pt(float(x_mm)) if x_mm is not None else 0.0
+        offset_y_pt = mm_to_pt(float(y_mm)) if y_mm is not None else 0.0
+        # Mirrors _exact_mm_object_x_pt, so the planner fits the grid where it lands.
+        align_x = str((object_box_cfg.get("alignment") or "center")).strip().lower()
+        if offset_x_pt == 0.0:
+            align_x = "right" if align_x == "right" else "left"
+
+    imp = plan_imposition(
+        imposition_cfg,
+        object_w_pt=object_w_pt,
+        object_h_pt=object_h_pt,
+        default_gutter_mm=_cut_margin_mm(object_box_cfg),
+        offset_x_pt=offset_x_pt,
+        offset_y_pt=offset_y_pt,
+        align_x=align_x,
+    )
+    page_w_pt, page_h_pt = imp.sheet_w_pt, imp.sheet_h_pt
+    area_x_pt, area_w_pt = imp.margin_pt, page_w_pt - 2 * imp.margin_pt
+
+    if mode == "exact_mm":
+        grid_x_pt = _exact_mm_object_x_pt(
+            object_box_cfg, page_w_pt=area_w_pt, slot_x_pt=0.0, slot_w_pt=area_w_pt, object_w_pt=imp.grid_w_pt
+        ) + area_x_pt
+        grid_top_pt = imp.margin_pt + offset_y_pt
+        rotation_deg = _object_rotation_deg(object_box_cfg)
+    else:
+        grid_x_pt = (page_w_pt - imp.grid_w_pt) / 2
+        grid_top_pt = (page_h_pt - imp.grid_h_pt) / 2
+        rotation_deg = 0.0
+
+    slots: list[SlotPlan] = []
+    for row in range(imp.rows):
+        for col in range(imp.cols):
+            cell_x_pt = grid_x_pt + col * (imp.cell_w_pt + imp.gutter_pt)
+            cell_y_pt = page_h_pt - (grid_top_pt + row * (imp.cell_h_pt + imp.gutter_pt)) - imp.cell_h_pt
+            if imp.rotated:
+                # Turned 90° counterclockwise: object bottom-left lands on the cell's bottom-right.
+                object_matrix = concat(translate(cell_x_pt + imp.cell_w_pt, cell_y_pt), rotate(90.0))
+            else:
+                object_matrix = translate(cell_x_pt, cell_y_pt)
+
+            series_matrix = concat(
+                object_matrix,
+                translate(mm_to_pt(series.x_mm), float(object_h_pt) - mm_to_pt(series.y_mm + float(BASELINE_CORRECTION_MM))),
+            )
+            if series.rotation_deg != 0.0:
+                series_matrix = concat(series_matrix, rotate(series.rotation_deg))
+
+            cell = (cell_x_pt, cell_y_pt, imp.cell_w_pt, imp.cell_h_pt)
+            slots.append(
+                SlotPlan(
+                    index=len(slots),
+                    slot_rect_pt=cell,
+                    clip_rect_pt=cell,
+                    object_origin_pt=(object_matrix[4], object_matrix[5]),
+                    series_origin_pt=(series_matrix[4], series_matrix[5]),
+                    series_matrix=series_matrix,
+                    object_matrix=object_matrix,
+                )
+            )
+
+    return SlotGeometry(
+        mode=mode,
+        page_w_pt=page_w_pt,
+        page_h_pt=page_h_pt,
+        slot_w_pt=imp.cell_w_pt,
+        slot_h_pt=imp.cell_h_pt,
+        object_w_pt=object_w_pt,
+        object_h_pt=object_h_pt,
+        object_rotation_deg=rotation_deg,
+        slots=tuple(slots),
+        imposition=imp,
+    )
+
+
+def compile_slot_geometry(
+    object_mm: Dict[str, Any],
+    series: SeriesStyle,
+    render_mode: str,
+    imposition: Dict[str, Any] | None = None,
+) -> SlotGeometry:
+    mode = placement_mode(render_mode)
+    object_box_cfg = object_mm or {}
+    if imposition is not None:
+        return _compile_imposed_geometry(object_box_cfg, series, mode, imposition)
+
+    # A4 is the absolute authority.
+    page_w_pt, page_h_pt = mm_to_pt(A4_WIDTH_MM), mm_to_pt(A4_HEIGHT_MM)
+    slot_w_pt = page_w_pt
+
+    cut_margin_mm = _cut_margin_mm(object_box_cfg)
+    cut_margin_pt = mm_to_pt(cut_margin_mm)
+
+    if mode == "exact_mm":
+        slot_h_pt = (page_h_pt - ((OBJECTS_PER_PAGE - 1) * cut_margin_pt)) / OBJECTS_PER_PAGE
+    else:
+        slot_h_pt = page_h_pt / OBJECTS_PER_PAGE
+    slot_h_mm = slot_h_pt / mm_to_pt(1.0)
+
+    # Object physical size is defined ONLY by object_mm.w/h.
+    object_w_pt, object_h_pt = _object_size_pt(object_box_cfg)
+    if mode != "exact_mm":
+        if object_w_pt > slot_w_pt or object_h_pt > slot_h_pt:
+            raise ValueError("Object size exceeds slot size")
+
+    rotation_deg = 0.0
+    if mode == "exact_mm":
+        rotation_deg = _object_rotation_deg(object_box_cfg)
+
+    y_mm = object_box_cfg.get("y_mm")
+    if y_mm is None:
+        y_mm = object_box_cfg.get("y")
+    y_offset_pt = mm_to_pt(float(y_mm)) if y_mm is not None else 0.0
+
+    slots: list[SlotPlan] = []
+    for slot_index in range(OBJECTS_PER_PAGE):
+        if mode == "exact_mm":
+            # Slot origin in user mm (measured from page top-left)
+            slot_x_mm = 0.0
+            slot_y_mm = float(slot_index) * float(slot_h_mm + cut_margin_mm)
+
+            # Slot origin in reportlab pt (bottom-left)
+            slot_x_pt = mm_to_pt(slot_x_mm)
+            slot_y_top_pt = mm_to_pt(slot_y_mm)
+            slot_y_pt = page_h_pt - slot_y_top_pt - slot_h_pt
+
+            object_x_pt = _exact_mm_object_x_pt(
+                object_box_cfg,
+                page_w_pt=page_w_pt,
+                slot_x_pt=slot_x_pt,
+                slot_w_pt=slot_w_pt,
+                object_w_pt=object_w_pt,
+            )
+            object_y_pt = (page_h_pt - slot_y_top_pt) - object_h_pt - y_offset_pt
+            clip_rect = (slot_x_pt, slot_y_pt, slot_w_pt, slot_h_pt)
+        else:
+            # Legacy: slot origin in reportlab pt (bottom-left), object centered inside slot.
+            slot_x_pt = 0.0
+            slot_y_pt = page_h_pt - ((slot_index + 1) * slot_h_pt)
+            object_x_pt = slot_x_pt + (slot_w_pt - object_w_pt) / 2
+            object_y_pt = slot_y_pt + (slot_h_pt - object_h_pt) / 2
+            clip_rect = (object_x_pt, object_y_pt, object_w_pt, object_h_pt)
+
+        # MM-perfect placement in object coordinates (top-left origin from editor).
+        # pdf_x_pt = object_x_pt + mm_to_pt(x_mm)
+        # pdf_y_pt = object_y_pt + mm_to_pt(object_h_mm - y_mm)
+        pdf_x_pt = float(object_x_pt) + mm_to_pt(series.x_mm)
+        pdf_y_pt = float(object_y_pt) + (float(object_h_pt) - mm_to_pt(series.y_mm + float(BASELINE_CORRECTION_MM)))
+
+        # Series is a clean overlay: no clip, no scale, baseline anchored.
+        series_matrix = translate(pdf_x_pt, pdf_y_pt)
+        if series.rotation_deg != 0.0:
+            series_matrix = concat(series_matrix, rotate(series.rotation_deg))
+
+        slots.append(
+            SlotPlan(
+                index=slot_index,
+                slot_rect_pt=(slot_x_pt, slot_y_pt, slot_w_pt, slot_h_pt),
+                clip_rect_pt=clip_rect,
+                object_origin_pt=(float(object_x_pt), float(object_y_pt)),
+                series_origin_pt=(pdf_x_pt, pdf_y_pt),
+                series_matrix=series_matrix,
+                object_matrix=translate(object_x_pt, object_y_pt),
+            )
+        )
+
+    return SlotGeometry(
+        mode=mode,
+        page_w_pt=page_w_pt,
+        page_h_pt=page_h_pt,
+        slot_w_pt=slot_w_pt,
+        slot_h_pt=slot_h_pt,
+        object_w_pt=object_w_pt,
+        object_h_pt=object_h_pt,
+        object_rotation_deg=rotation_deg,
+        slots=tuple(slots),
+    )
+
+
+def is_svg_key_overlay(overlay: Dict[str, Any]) -> bool:
+    overlay_type = str(overlay.get("type") or "").strip().lower()
+    svg_s3_key = str(overlay.get("svg_s3_key") or "").strip()
+    return overlay_type == "svg" and bool(svg_s3_key)
+
+
+def overlay_local_matrix(
+    overlay: Dict[str, Any],
+    *,
+    object_h_pt: float,
+    intrinsic_size_pt: tuple[float, float] | None,
+) -> Matrix | None:
+    # Matrix from the overlay's drawing box to object space (object bottom-left origin).
+    # Returns None for overlays that draw nothing.
+    if is_svg_key_overlay(overlay):
+        scale_factor = float(overlay.get("scale"))
+        if scale_factor <= 0 or intrinsic_size_pt is None:
+            return None
+        ov_w_pt, ov_h_pt = intrinsic_size_pt
+        rot = float(overlay.get("rotation_deg") or 0.0)
+
+        # Anchor is the *untransformed* intrinsic box top-left in object_mm space (same as editor).
+        # To draw the PDF form (bottom-left origin), we convert that to bottom-left.
+        x_pt = mm_to_pt(float(overlay.get("x_mm")))
+        y_top_pt = float(object_h_pt) - mm_to_pt(float(overlay.get("y_mm")))
+        y_bottom_pt = float(y_top_pt) - float(ov_h_pt)
+
+        cx = float(ov_w_pt) / 2.0
+        cy = float(ov_h_pt) / 2.0
+
+        # Match the frontend CSS transform model:
+        # - element layout box is intrinsic size at (x_mm, y_mm)
+        # - then rotate+scale about center
+        ms = [translate(x_pt, y_bottom_pt), translate(cx, cy)]
+        if rot:
+            ms.append(rotate(rot))
+        ms.extend([scale(scale_factor, scale_factor), translate(-cx, -cy)])
+        return concat(*ms)
+
+    if not str(overlay.get("data_url") or "").strip():
+        return None
+
+    # Overlays are ABSOLUTE in object_mm space (top-left origin), and must not inherit
+    # any SVG/background scaling. We only offset by the object's page position.
+    h_pt = mm_to_pt(float(overlay.get("h_mm")))
+    x_pt = mm_to_pt(float(overlay.get("x_mm")))
+    y_bottom_pt = float(object_h_pt) - mm_to_pt(float(overlay.get("y_mm"))) - float(h_pt)
+    rot = float(overlay.get("rotation_deg") or 0.0)
+
+    # Rotate around top-left to match preview transformOrigin: 'top left'
+    ms = [translate(x_pt, y_bottom_pt + h_pt)]
+    if rot:
+        ms.append(rotate(rot))
+    ms.append(translate(0.0, -h_pt))
+    return concat(*ms)
+
+
+def validate_layout(
+    *, object_mm: Dict[str, Any], series: Dict[str, Any], render_mode: str, imposition: Dict[str, Any] | None = None
+) -> None:
+    # Config-only checks: runs before any S3 fetch or SVG conversion.
+    compile_slot_geometry(object_mm, compile_series_style(series), render_mode, imposition)
+
+
+def total_pages(*, object_mm: Dict[str, Any], series: Dict[str, Any], render_mode: str, imposition: Dict[str, Any] | None = None) -> int:
+    style = compile_series_style(series)
+    per_page = compile_slot_geometry(object_mm, style, render_mode, imposition).objects_per_page
+    return (style.count + (per_page - 1)) // per_page
+
+
+def plan_volumes(
+    *,
+    object_mm: Dict[str, Any],
+    series: Dict[str, Any],
+    render_mode: str,
+    max_pages: int,
+    imposition: Dict[str, Any] | None = None,
+) -> list[Volume]:
+    if int(max_pages) <= 0:
+        raise ValueError("max_pages_per_file must be > 0")
+    style = compile_series_style(series)
+    per_page = compile_slot_geometry(object_mm, style, render_mode, imposition).objects_per_page
+    pages = (style.count + (per_page - 1)) // per_page
+    volumes: list[Volume] = []
+    for page_start in range(0, pages, int(max_pages)):
+        page_stop = min(page_start + int(max_pages), pages)
+        serial_start = page_start * per_page
+        serial_stop = min(page_stop * per_page, style.count)
+        volumes.append(
+            Volume(
+                part=len(volumes) + 1,
+                page_start=page_start,
+                page_stop=page_stop,
+                serial_start=serial_start,
+                serial_stop=serial_stop,
+                first_serial=style.value(serial_start),
+                last_serial=style.value(serial_stop - 1),
+            )
+        )
+    return volumes
+
+
+def compile_layout_plan(
+    *,
+    object_mm: Dict[str, Any],
+    series: Dict[str, Any],
+    render_mode: str,
+    svg_w_pt: float,
+    svg_h_pt: float,
+    overlays: list[Dict[str, Any]] | None = None,
+    overlay_sizes_pt: list[tuple[float, float] | None] | None = None,
+    imposition: Dict[str, Any] | None = None,
+) -> LayoutPlan:
+    style = compile_series_style(series)
+    geometry = compile_slot_geometry(object_mm, style, render_mode, imposition)
+
+    if svg_w_pt <= 0 or svg_h_pt <= 0:
+        raise ValueError("SVG-PDF MediaBox must be > 0")
+
+    # Print engine rule:
+    # User-provided mm dimensions are authoritative.
+    # SVG content may stretch or distort to guarantee physical size accuracy.
+    scale_x = geometry.object_w_pt / svg_w_pt
+    scale_y = geometry.object_h_pt / svg_h_pt
+
+    background_matrices: list[Matrix] = []
+    for slot in geometry.slots:
+        object_x_pt, object_y_pt = slot.object_origin_pt
+        if geometry.imposition is not None:
+            m = concat(
+                slot.object_matrix,
+                translate(geometry.object_w_pt / 2.0, geometry.object_h_pt / 2.0),
+                rotate(geometry.object_rotation_deg),
+                scale(scale_x, scale_y),
+                translate(-svg_w_pt / 2.0, -svg_h_pt / 2.0),
+            )
+        elif geometry.mode == "exact_mm":
+            m = concat(
+                translate(object_x_pt + (geometry.object_w_pt / 2.0), object_y_pt + (geometry.object_h_pt / 2.0)),
+                rotate(geometry.object_rotation_deg),
+                scale(scale_x, scale_y),
+                translate(-svg_w_pt / 2.0, -svg_h_pt / 2.0),
+            )
+        else:
+            m = concat(translate(object_x_pt, object_y_pt), scale(scale_x, scale_y))
+        background_matrices.append(m)
+
+    overlays = list(overlays or [])
+    sizes = list(overlay_sizes_pt or [None] * len(overlays))
+    local_matrices = [
+        overlay_local_matrix(ov, object_h_pt=geometry.object_h_pt, intrinsic_size_pt=size)
+        for ov, size in zip(overlays, sizes)
+    ]
+    overlay_matrices = tuple(
+        tuple(None if lm is None else concat(slot.object_matrix, lm) for lm in local_matrices)
+        for slot in geometry.slots
+    )
+
+    return LayoutPlan(
+        geometry=geometry,
+        series=style,
+        svg_w_pt=float(svg_w_pt),
+        svg_h_pt=float(svg_h_pt),
+        scale_x=float(scale_x),
+        scale_y=float(scale_y),
+        background_matrices=tuple(background_matrices),
+        overlay_matrices=overlay_matrices,
+        total_pages=(style.count + (geometry.objects_per_page - 1)) // geometry.objects_per_page,
+        debug=debug_series_enabled(),
+    )
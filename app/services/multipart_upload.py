@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects non-final parts below 5 MiB.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class MultipartUpload:
+    """Write-only file object that streams bytes to an S3 multipart upload.
+
+    Parts are uploaded by a small thread pool while the caller keeps writing. At most
+    `concurrency` parts are buffered or in flight, so memory stays near
+    concurrency * part_size whatever the object size. Only create/upload_part/
+    complete/abort are used, so any S3-compatible endpoint (or a local stand-in
+    client) works.
+    """
+
+    def __init__(
+        self,
+        *,
+        client: Any,
+        bucket: str,
+        key: str,
+        part_size: int,
+        concurrency: int,
+        content_type: str = "application/pdf",
+    ) -> None:
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = max(MIN_PART_SIZE, int(part_size))
+        self._concurrency = max(1, int(concurrency))
+        self._buf = bytearray()
+        self._futures: list[Future] = []
+        self._slots = threading.BoundedSemaphore(self._concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix="s3-part")
+        self._part_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._closed = False
+        self.bytes_written = 0
+
+        resp = client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)
+        self._upload_id = str(resp["UploadId"])
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        if self._closed:
+            raise ValueError("MULTIPART_UPLOAD_CLOSED")
+        self._buf += data
+        self.bytes_written += len(data)
+        while len(self._buf) >= self._part_size:
+            part = bytes(self._buf[: self._part_size])
+            del self._buf[: self._part_size]
+            self._submit(part)
+        return len(data)
+
+    def _raise_failed(self) -> None:
+        # Surface a failed part on the next write instead of after rendering finishes.
+        for f in self._futures:
+            if f.done() and f.exception() is not None:
+                raise f.exception()
+
+    def _submit(self, body: bytes) -> None:
+        self._raise_failed()
+        self._slots.acquire()
+        try:
+            self._futures.append(self._pool.submit(self._upload_part, len(self._futures) + 1, body))
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _upload_part(self, part_number: int, body: bytes) -> dict[str, Any]:
+        try:
+            t0 = time.perf_counter()
+            resp = self._client.upload_part(
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=body,
+            )
+            with self._stats_lock:
+                self._part_seconds += time.perf_counter() - t0
+            return {"PartNumber": part_number, "ETag": resp["ETag"]}
+        finally:
+            self._slots.release()
+
+    def complete(self) -> dict[str, Any]:
+        """Upload the tail, wait for all parts and finish the object; returns upload metrics."""
+        if self._closed:
+            raise ValueError("MULTIPART_UPLOAD_CLOSED")
+        t_wait = time.perf_counter()
+        if self._buf or not self._futures:
+            self._submit(bytes(self._buf))
+            self._buf.clear()
+        parts = [f.result() for f in self._futures]
+        self._client.complete_multipart_upload(
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+        self._closed = True
+        self._pool.shutdown(wait=True)
+        now = time.perf_counter()
+        return {
+            "mode": "multipart_stream",
+            "parts": len(parts),
+            "bytes": int(self.bytes_written),
+            "part_size": int(self._part_size),
+            "concurrency": int(self._concurrency),
+            "part_seconds": round(float(self._part_seconds), 4),
+            "wait_seconds": round(float(now - t_wait), 4),
+            "seconds": round(float(now - self._t0), 4),
+        }
+
+    def abort(self) -> None:
+        """Drop queued parts and abort the upload so S3 discards what was sent."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        try:
+            self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+        except Exception:
+            logger.exception("MULTIPART_ABORT_FAILED", extra={"key": self._key, "upload_id": self._upload_id})
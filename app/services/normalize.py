@@ -1,40 +1,232 @@
 from __future__ import annotations
 
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
+from typing import Any
 
-import boto3
 import cairosvg
 
 from app.config import Settings
+from app.services.disk_cache import DiskCache, get_disk_cache
+from app.services.object_store import get_object_store
+from app.services.svg_preflight import SVG_PREFLIGHT_VERSION, preflight_svg
 from app.utils.hash import sha256_hex
+from app.utils.metrics import StageTimer
 
 SVG_TO_PDF_VERSION = "orig_v1"
 
+logger = logging.getLogger(__name__)
 
-def _s3_client(settings: Settings):
-    session = boto3.session.Session(
-        aws_access_key_id=settings.S3_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
-        region_name=settings.S3_REGION or None,
-    )
 
-    # For S3-compatible endpoints, boto3 expects endpoint_url.
-    endpoint_url = settings.S3_ENDPOINT or None
-    return session.client("s3", endpoint_url=endpoint_url)
+def download_s3_object_bytes(settings: Settings, key: str) -> bytes:
+    return get_object_store(settings).get_bytes(key)
 
 
-def download_s3_object_bytes(settings: Settings, key: str) -> bytes:
-    client = _s3_client(settings)
-    obj = client.get_object(Bucket=settings.S3_BUCKET, Key=key)
-    body = obj["Body"]
-    return body.read()
+@dataclass(frozen=True)
+class _SourceEntry:
+    etag: str
+    svg_hash: str
+    checked_at: float
 
 
-def _read_svg_bytes(settings: Settings, svg_s3_key: str) -> bytes:
-    p = Path(svg_s3_key)
-    if p.exists() and p.is_file():
-        return p.read_bytes()
-    return download_s3_object_bytes(settings, svg_s3_key)
+# Source keys remembered by the index; the least recently used are forgotten first
+# (a forgotten key only costs one unconditional download).
+_SOURCE_INDEX_MAX_ENTRIES = 4096
+# A revalidation only moves checked_at: it is saved with the next change, or after
+# this long. Losing it on restart costs one conditional GET.
+_SOURCE_INDEX_SAVE_INTERVAL_S = 60.0
+
+
+class _SourceIndex:
+    """Store key -> (ETag, content hash) for source SVGs, persisted as one JSON file.
+
+    Lets a render skip the download when the object is known unchanged: within the
+    TTL without asking the store at all, after it with a conditional GET. Holds at
+    most _SOURCE_INDEX_MAX_ENTRIES keys, in LRU order (also the order on disk).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        # Serializes file writes, which happen outside _lock.
+        self._write_lock = threading.Lock()
+        self._entries: "OrderedDict[str, _SourceEntry]" = OrderedDict()
+        self._version = 0
+        self._saved_version = 0
+        self._saved_at = 0.0
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            self._entries = OrderedDict((str(k), _SourceEntry(**v)) for k, v in raw.items())
+            self._evict()
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError):
+            logger.warning("SVG_SOURCE_INDEX_UNREADABLE", extra={"path": str(path)})
+
+    def get(self, key: str) -> _SourceEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: _SourceEntry, *, durable: bool = True) -> None:
+        # durable=False: only checked_at changed; saving can wait (see the interval above).
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+            self._version += 1
+            if not durable and time.monotonic() - self._saved_at < _SOURCE_INDEX_SAVE_INTERVAL_S:
+                return
+            version = self._version
+            snapshot = {k: asdict(v) for k, v in self._entries.items()}
+            self._saved_at = time.monotonic()
+        self._save(version, snapshot)
+
+    def _evict(self) -> None:
+        # Caller holds the lock (or is the constructor).
+        while len(self._entries) > _SOURCE_INDEX_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _save(self, version: int, snapshot: dict[str, Any]) -> None:
+        with self._write_lock:
+            if version <= self._saved_version:
+                # A newer snapshot is already on disk.
+                return
+            tmp = self._path.with_name(f".{self._path.name}.{os.getpid()}.{threading.get_ident()}")
+            try:
+                _ensure_dir(self._path.parent)
+                tmp.write_text(json.dumps(snapshot), encoding="utf-8")
+                os.replace(tmp, self._path)
+                self._saved_version = version
+            except OSError:
+                logger.exception("SVG_SOURCE_INDEX_WRITE_FAILED", extra={"path": str(self._path)})
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.fresh_hits + self.revalidated + self.misses
+            return {
+                "entries": len(self._entries),
+                "fresh_hits": int(self.fresh_hits),
+                "revalidated": int(self.revalidated),
+                "misses": int(self.misses),
+                "evictions": int(self.evictions),
+                "hit_rate": round((self.fresh_hits + self.revalidated) / lookups, 4) if lookups else 0.0,
+            }
+
+
+_SOURCE_INDEXES: dict[str, _SourceIndex] = {}
+_SOURCE_INDEXES_LOCK = threading.Lock()
+
+
+def _source_dir(cache_dir: str) -> Path:
+    return Path(cache_dir) / "sources"
+
+
+def _source_index(cache_dir: str) -> _SourceIndex:
+    path = _source_dir(cache_dir) / "index.json"
+    with _SOURCE_INDEXES_LOCK:
+        index = _SOURCE_INDEXES.get(str(path))
+        if index is None:
+            index = _SourceIndex(path)
+            _SOURCE_INDEXES[str(path)] = index
+        return index
+
+
+def svg_source_cache_stats(cache_dir: str = "tmp/templates") -> dict[str, Any]:
+    return _source_index(cache_dir).stats()
+
+
+def _read_cached_source(cache: DiskCache, svg_hash: str) -> bytes | None:
+    path = cache.lookup(f"{svg_hash}.svg", "sources")
+    if path is None:
+        return None
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    return data if sha256_hex(data) == svg_hash else None
+
+
+def _fetch_svg_source(settings: Settings, svg_s3_key: str, cache_dir: str, use_index: bool = True) -> tuple[str, bytes | None]:
+    # Returns (svg_hash, bytes); bytes is None when the content is known from the index
+    # and the caller may not need it at all (converted PDF already cached).
+    store = get_object_store(settings)
+    index = _source_index(cache_dir)
+    index_key = f"{store.backend}:{settings.S3_BUCKET}:{svg_s3_key}"
+    entry = index.get(index_key) if use_index else None
+    now = time.time()
+
+    if entry is not None and now - entry.checked_at < settings.SVG_CACHE_TTL_S:
+        index.count("fresh_hits")
+        return entry.svg_hash, None
+
+    data, etag = store.get_if_changed(svg_s3_key, entry.etag if entry is not None else None)
+    if data is None and entry is not None:
+        index.put(index_key, replace(entry, checked_at=now), durable=False)
+        index.count("revalidated")
+        return entry.svg_hash, None
+
+    index.count("misses")
+    svg_bytes = bytes(data or b"")
+    svg_hash = sha256_hex(svg_bytes)
+    cache = get_disk_cache(cache_dir, settings)
+    source_name = f"{svg_hash}.svg"
+    if cache.lookup(source_name, "sources") is None:
+        source_path = cache.path(source_name, "sources")
+        tmp = source_path.with_name(f".{source_path.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp.write_bytes(svg_bytes)
+        os.replace(tmp, source_path)
+        cache.commit(source_name, "sources")
+    if etag:
+        index.put(index_key, _SourceEntry(etag=etag, svg_hash=svg_hash, checked_at=now))
+    return svg_hash, svg_bytes
+
+
+def _conversion_name(settings: Settings, svg_hash: str) -> str:
+    # Preflighted conversions are keyed by the preflight version and rounding digits too.
+    if not getattr(settings, "SVG_PREFLIGHT", False):
+        return f"{svg_hash}_{SVG_TO_PDF_VERSION}"
+    digits = int(getattr(settings, "SVG_PREFLIGHT_DIGITS", 0) or 0)
+    return f"{svg_hash}_{SVG_TO_PDF_VERSION}_{SVG_PREFLIGHT_VERSION}d{digits}"
+
+
+def svg_preflight_stats(settings: Settings, svg_hash: str, cache_dir: str = "tmp/templates") -> dict[str, Any] | None:
+    """What preflight did to this source, as recorded when it was converted (None when off)."""
+    if not getattr(settings, "SVG_PREFLIGHT", False):
+        return None
+    path = get_disk_cache(cache_dir, settings).lookup(f"{_conversion_name(settings, svg_hash)}.json")
+    if path is None:
+        return None
+    try:
+        stats = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return stats if isinstance(stats, dict) else None
+
+
+def _write_preflight_stats(cache: DiskCache, name: str, stats: dict[str, Any]) -> None:
+    path = cache.path(name)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    tmp.write_text(json.dumps(stats, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+    cache.commit(name)
 
 
 def _ensure_dir(path: Path) -> None:
@@ -58,19 +250,28 @@ def svg_to_pdf_cached_original_size(
     settings: Settings,
     svg_s3_key: str,
     cache_dir: str = "tmp/templates",
+    timings: StageTimer | None = None,
 ) -> tuple[str, str]:
     # Convert SVG -> PDF while preserving the SVG's own dimensions.
     # No resizing/normalization is applied before placement.
     # INVARIANT (LOCKED): Do not inject A4 width/height. Do not modify viewBox.
     # Physical sizing is enforced only at placement time (object_mm -> pt in pdf_writer.py).
-    svg_bytes = _read_svg_bytes(settings, svg_s3_key)
-    svg_hash = sha256_hex(svg_bytes)
-
-    out_dir = Path(cache_dir)
-    _ensure_dir(out_dir)
+    # SVG_PREFLIGHT only drops non-rendering content and rounds coordinates below the
+    # root; the root element (size, viewBox) is passed through as-is.
+    # timings, when given, gets "svg_fetch", "svg_preflight" and "svg_convert" seconds added.
+    timer = timings if timings is not None else StageTimer()
+    p = Path(svg_s3_key)
+    with timer.stage("svg_fetch"):
+        if p.exists() and p.is_file():
+            svg_bytes: bytes | None = p.read_bytes()
+            svg_hash = sha256_hex(svg_bytes)
+        else:
+            svg_hash, svg_bytes = _fetch_svg_source(settings, svg_s3_key, cache_dir)
 
-    cached_pdf_path = out_dir / f"{svg_hash}_{SVG_TO_PDF_VERSION}.pdf"
-    if cached_pdf_path.exists():
+    cache = get_disk_cache(cache_dir, settings)
+    pdf_name = f"{_conversion_name(settings, svg_hash)}.pdf"
+    cached_pdf_path = cache.lookup(pdf_name)
+    if cached_pdf_path is not None:
         try:
             with open(cached_pdf_path, "rb") as f:
                 head = f.read(5)
@@ -78,13 +279,27 @@ def svg_to_pdf_cached_original_size(
                 return svg_hash, str(cached_pdf_path)
         except OSError:
             pass
-        try:
-            cached_pdf_path.unlink(missing_ok=True)
-        except OSError:
-            pass
+        cache.discard(pdf_name)
+
+    with timer.stage("svg_fetch"):
+        if svg_bytes is None:
+            svg_bytes = _read_cached_source(cache, svg_hash)
+        if svg_bytes is None:
+            # Local source copy missing or damaged: download unconditionally.
+            svg_hash, svg_bytes = _fetch_svg_source(settings, svg_s3_key, cache_dir, use_index=False)
+            pdf_name = f"{_conversion_name(settings, svg_hash)}.pdf"
+
+    cached_pdf_path = cache.path(pdf_name)
+
+    preflight_stats: dict[str, Any] | None = None
+    if getattr(settings, "SVG_PREFLIGHT", False):
+        with timer.stage("svg_preflight"):
+            result = preflight_svg(svg_bytes, digits=int(getattr(settings, "SVG_PREFLIGHT_DIGITS", 0) or 0))
+        svg_bytes, preflight_stats = result.svg, result.stats
 
     # Vector paths are preserved. Any embedded raster <image> stays as-is (no extraction).
-    cairosvg.svg2pdf(bytestring=svg_bytes, write_to=str(cached_pdf_path))
+    with timer.stage("svg_convert"):
+        cairosvg.svg2pdf(bytestring=svg_bytes, write_to=str(cached_pdf_path))
 
     try:
         with open(cached_pdf_path, "rb") as f:
@@ -99,4 +314,7 @@ def svg_to_pdf_cached_original_size(
             pass
         raise RuntimeError("INVALID_SVG_TO_PDF_OUTPUT: expected PDF")
 
+    cache.commit(pdf_name)
+    if preflight_stats is not None:
+        _write_preflight_stats(cache, f"{_conversion_name(settings, svg_hash)}.json", preflight_stats)
     return svg_hash, str(cached_pdf_path)
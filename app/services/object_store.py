@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Protocol
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from app.config import Settings
+from app.services.multipart_upload import MultipartUpload
+
+
+class Upload(Protocol):
+    # Write-only object being created; complete() publishes it, abort() discards it.
+    def write(self, data: bytes) -> int: ...
+
+    def complete(self) -> dict[str, Any]: ...
+
+    def abort(self) -> None: ...
+
+
+class ObjectStore(Protocol):
+    backend: str
+
+    def get_bytes(self, key: str) -> bytes: ...
+
+    def get_if_changed(self, key: str, etag: str | None) -> tuple[bytes | None, str]:
+        # (None, etag) when the object still has `etag`, else (data, current etag).
+        ...
+
+    def put_bytes(self, key: str, data: bytes, *, content_type: str = "application/octet-stream") -> None: ...
+
+    def put_file(self, local_path: str, key: str, *, content_type: str = "application/octet-stream") -> None: ...
+
+    def open_upload(self, key: str, *, content_type: str, part_size: int, concurrency: int) -> Upload: ...
+
+
+class S3ObjectStore:
+    """One long-lived S3 client shared by every thread of the process.
+
+    boto3 clients (unlike sessions) are thread-safe; connections are pooled up to
+    S3_MAX_CONNECTIONS and kept alive between requests.
+    """
+
+    backend = "s3"
+
+    def __init__(self, settings: Settings) -> None:
+        session = boto3.session.Session(
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            region_name=settings.S3_REGION or None,
+        )
+        config = Config(
+            max_pool_connections=int(settings.S3_MAX_CONNECTIONS),
+            tcp_keepalive=bool(settings.S3_TCP_KEEPALIVE),
+        )
+        # For S3-compatible endpoints, boto3 expects endpoint_url.
+        self.client = session.client("s3", endpoint_url=settings.S3_ENDPOINT or None, config=config)
+        self.bucket = settings.S3_BUCKET
+
+    def get_bytes(self, key: str) -> bytes:
+        obj = self.client.get_object(Bucket=self.bucket, Key=key)
+        return obj["Body"].read()
+
+    def get_if_changed(self, key: str, etag: str | None) -> tuple[bytes | None, str]:
+        kwargs: dict[str, Any] = {"Bucket": self.bucket, "Key": key}
+        if etag:
+            kwargs["IfNoneMatch"] = etag
+        try:
+            obj = self.client.get_object(**kwargs)
+        except ClientError as e:
+            status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if etag and (status == 304 or e.response.get("Error", {}).get("Code") in {"304", "NotModified"}):
+                return None, etag
+            raise
+        return obj["Body"].read(), str(obj.get("ETag") or "")
+
+    def put_bytes(self, key: str, data: bytes, *, content_type: str = "application/octet-stream") -> None:
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=bytes(data), ContentType=content_type)
+
+    def put_file(self, local_path: str, key: str, *, content_type: str = "application/octet-stream") -> None:
+        self.client.upload_file(local_path, self.bucket, key, ExtraArgs={"ContentType": content_type})
+
+    def open_upload(self, key: str, *, content_type: str, part_size: int, concurrency: int) -> Upload:
+        return MultipartUpload(
+            client=self.client,
+            bucket=self.bucket,
+            key=key,
+            part_size=part_size,
+            concurrency=concurrency,
+            content_type=content_type,
+        )
+
+
+class _FileUpload:
+    # Written next to the target and renamed on complete(), so readers never see a
+    # partial object.
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".upload_", dir=str(path.parent))
+        self._f = os.fdopen(fd, "wb")
+        self._tmp = Path(tmp)
+        self._path = path
+
+    def write(self, data: bytes) -> int:
+        return self._f.write(data)
+
+    def complete(self) -> dict[str, Any]:
+        self._f.close()
+        os.replace(self._tmp, self._path)
+        return {"mode": "filesystem", "bytes": int(self._path.stat().st_size)}
+
+    def abort(self) -> None:
+        self._f.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class FilesystemObjectStore:
+    """Keys are files under OBJECT_STORE_ROOT; for single-box runs and benchmarks."""
+
+    backend = "filesystem"
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root).resolve()
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / str(key).lstrip("/")).resolve()
+        if path != self.root and self.root not in path.parents:
+            raise ValueError("INVALID_OBJECT_KEY")
+        return path
+
+    def get_bytes(self, key: str) -> bytes:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def get_if_changed(self, key: str, etag: str | None) -> tuple[bytes | None, str]:
+        path = self._path(key)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            raise KeyError(key)
+        current = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        if etag and etag == current:
+            return None, current
+        return path.read_bytes(), current
+
+    def put_bytes(self, key: str, data: bytes, *, content_type: str = "application/octet-stream") -> None:
+        upload = _FileUpload(self._path(key))
+        upload.write(bytes(data))
+        upload.complete()
+
+    def put_file(self, local_path: str, key: str, *, content_type: str = "application/octet-stream") -> None:
+        upload = _FileUpload(self._path(key))
+        with open(local_path, "rb") as f:
+            shutil.copyfileobj(f, upload)
+        upload.complete()
+
+    def open_upload(self, key: str, *, content_type: str, part_size: int, concurrency: int) -> Upload:
+        return _FileUpload(self._path(key))
+
+
+class _MemoryUpload:
+    def __init__(self, store: "MemoryObjectStore", key: str) -> None:
+        self._store = store
+        self._key = key
+        self._buf = io.BytesIO()
+
+    def write(self, data: bytes) -> int:
+        return self._buf.write(data)
+
+    def complete(self) -> dict[str, Any]:
+        data = self._buf.getvalue()
+        self._store.put_bytes(self._key, data)
+        return {"mode": "memory", "bytes": len(data)}
+
+    def abort(self) -> None:
+        self._buf = io.BytesIO()
+
+
+class MemoryObjectStore:
+    """Process-local dict of objects. Worker processes see their own copy only."""
+
+    backend = "memory"
+
+    def __init__(self) -> None:
+        # key -> (data, etag)
+        self._objects: dict[str, tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def get_bytes(self, key: str) -> bytes:
+        with self._lock:
+            return self._objects[key][0]
+
+    def get_if_changed(self, key: str, etag: str | None) -> tuple[bytes | None, str]:
+        with self._lock:
+            data, current = self._objects[key]
+        if etag and etag == current:
+            return None, current
+        return data, current
+
+    def put_bytes(self, key: str, data: bytes, *, content_type: str = "application/octet-stream") -> None:
+        data = bytes(data)
+        with self._lock:
+            self._objects[key] = (data, f'"{hashlib.md5(data).hexdigest()}"')
+
+    def put_file(self, local_path: str, key: str, *, content_type: str = "application/octet-stream") -> None:
+        self.put_bytes(key, Path(local_path).read_bytes(), content_type=content_type)
+
+    def open_upload(self, key: str, *, content_type: str, part_size: int, concurrency: int) -> Upload:
+        return _MemoryUpload(self, key)
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return sorted(self._objects)
+
+
+_STORES: dict[tuple[Any, ...], ObjectStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_object_store(settings: Settings) -> ObjectStore:
+    """Process-wide store for these settings, created on first use."""
+    backend = settings.OBJECT_STORE_BACKEND
+    # S3 stores are keyed by pid too: a pooled client must not be reused across a
+    # fork. Forked render workers do inherit the parent's memory store contents.
+    key = (
+        os.getpid() if backend == "s3" else 0,
+        backend,
+        settings.OBJECT_STORE_ROOT,
+        settings.S3_BUCKET,
+        settings.S3_REGION,
+        settings.S3_ENDPOINT,
+        settings.S3_ACCESS_KEY_ID,
+        settings.S3_SECRET_ACCESS_KEY,
+        settings.S3_MAX_CONNECTIONS,
+        settings.S3_TCP_KEEPALIVE,
+    )
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            if backend == "filesystem":
+                store = FilesystemObjectStore(settings.OBJECT_STORE_ROOT)
+            elif backend == "memory":
+                store = MemoryObjectStore()
+            else:
+                store = S3ObjectStore(settings)
+            _STORES[key] = store
+        return store
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import io
 from functools import lru_cache
 from pathlib import Path
 from typing import Iterable, List, Tuple
 
+from fontTools.pens.basePen import BasePen
 from fontTools.pens.qu2cuPen import Qu2CuPen
 from fontTools.pens.recordingPen import DecomposingRecordingPen, RecordingPen
 from fontTools.ttLib import TTFont
@@ -39,6 +41,11 @@ def _load_font(font_path: str) -> TTFont:
     return TTFont(font_path, recalcBBoxes=False, recalcTimestamp=False)
 
 
+@lru_cache(maxsize=8)
+def _load_font_data(font_data: bytes) -> TTFont:
+    return TTFont(io.BytesIO(font_data), recalcBBoxes=False, recalcTimestamp=False)
+
+
 def glyph_names_for_text(*, text: str, font_path: str | None = None) -> List[str]:
     fp = str(font_path or _default_font_path())
     font = _load_font(fp)
@@ -196,3 +203,80 @@ def outline_text_ops_pt_with_metrics(
     }
 
     return norm_ops, bbox, advances_pt
+
+
+class _CubicPen(BasePen):
+    # BasePen turns quadratic segments (including implied on-curve points) into exact
+    # cubics and decomposes components via the glyph set.
+    def __init__(self, glyph_set, scale: float) -> None:
+        super().__init__(glyph_set)
+        self.scale = float(scale)
+        self.ops: List[Op] = []
+
+    def _pt(self, *pts) -> Tuple[float, ...]:
+        out: List[float] = []
+        for x, y in pts:
+            out.extend((float(x) * self.scale, float(y) * self.scale))
+        return tuple(out)
+
+    def _moveTo(self, pt) -> None:
+        self.ops.append(("moveTo", self._pt(pt)))
+
+    def _lineTo(self, pt) -> None:
+        self.ops.append(("lineTo", self._pt(pt)))
+
+    def _curveToOne(self, pt1, pt2, pt3) -> None:
+        self.ops.append(("curveTo", self._pt(pt1, pt2, pt3)))
+
+    def _closePath(self) -> None:
+        self.ops.append(("close", ()))
+
+
+def glyph_outline_pt(
+    *,
+    char: str,
+    font_size_pt: float,
+    font_path: str | None = None,
+    font_data: bytes | None = None,
+) -> tuple[List[Op], dict[str, float], float]:
+    # Outline of a single glyph relative to its own origin (baseline at y=0), in pt.
+    # Unlike outline_text_ops_pt_with_metrics, nothing is normalized to the bbox.
+    if font_data is not None:
+        font = _load_font_data(bytes(font_data))
+    else:
+        font = _load_font(str(font_path or _default_font_path()))
+
+    units_per_em = float(font["head"].unitsPerEm)
+    if units_per_em <= 0:
+        raise ValueError("INVALID_FONT_UNITS_PER_EM")
+    scale = float(font_size_pt) / units_per_em
+
+    cmap = font.getBestCmap() or {}
+    glyph_set = font.getGlyphSet()
+    glyph_name = str(cmap.get(ord(char)) or ".notdef")
+    if glyph_name not in glyph_set:
+        glyph_name = ".notdef"
+
+    try:
+        aw, _lsb = font["hmtx"].metrics.get(glyph_name, (0, 0))
+    except Exception:
+        aw = 0
+
+    pen = _CubicPen(glyph_set, scale)
+    glyph_set[glyph_name].draw(pen)
+    ops = pen.ops
+    xs = [p for op, pts in ops for p in pts[0::2]]
+    ys = [p for op, pts in ops for p in pts[1::2]]
+
+    if not xs:
+        bbox = {"min_x": 0.0, "min_y": 0.0, "max_x": 0.0, "max_y": 0.0, "w": 0.0, "h": 0.0}
+    else:
+        bbox = {
+            "min_x": min(xs),
+            "min_y": min(ys),
+            "max_x": max(xs),
+            "max_y": max(ys),
+            "w": max(xs) - min(xs),
+            "h": max(ys) - min(ys),
+        }
+    return ops, bbox, float(aw) * scale
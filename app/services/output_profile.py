@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class OutputProfile:
+    name: str
+    # Flate-compress page content streams, at this zlib level where the level is ours
+    # to choose (the direct writer; reportlab always uses its default level).
+    compress: bool
+    compress_level: int
+    # Decimals kept in the numbers of the per-serial operators; None keeps reportlab's
+    # formatting (7 significant digits).
+    decimals: int | None
+    # Write pages with the direct writer, so every page shares one /Resources object.
+    share_resources: bool
+    # Pack non-stream objects (page dicts) into compressed object streams (PDF 1.5).
+    object_streams: bool
+
+
+OUTPUT_PROFILES: dict[str, OutputProfile] = {
+    "fast": OutputProfile(
+        name="fast",
+        compress=False,
+        compress_level=0,
+        decimals=None,
+        share_resources=False,
+        object_streams=False,
+    ),
+    "balanced": OutputProfile(
+        name="balanced",
+        compress=True,
+        compress_level=zlib.Z_DEFAULT_COMPRESSION,
+        decimals=None,
+        share_resources=False,
+        object_streams=False,
+    ),
+    # 0.001 pt is 0.35 µm on paper.
+    "small": OutputProfile(
+        name="small",
+        compress=True,
+        compress_level=9,
+        decimals=3,
+        share_resources=True,
+        object_streams=True,
+    ),
+}
+
+
+def get_output_profile(name: str | None) -> OutputProfile:
+    profile = OUTPUT_PROFILES.get(str(name or "balanced").strip().lower())
+    if profile is None:
+        raise ValueError("INVALID_OUTPUT_PROFILE")
+    return profile
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pdfrw import PdfArray, PdfDict, PdfReader
+from pdfrw.buildxobj import pagexobj
+
+
+@dataclass(frozen=True)
+class FormAsset:
+    # Parsed first page of a PDF as a reusable form XObject.
+    xobj: Any
+    w_pt: float
+    h_pt: float
+    nbytes: int
+    nodes: tuple[Any, ...]
+
+
+def _graph_nodes(root: Any) -> tuple[Any, ...]:
+    # Walking the graph resolves every indirect object, so the form is fully loaded
+    # and can be shared read-only between canvases afterwards.
+    out: list[Any] = []
+    seen: set[int] = set()
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if not isinstance(obj, (PdfDict, PdfArray)) or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        out.append(obj)
+        if isinstance(obj, PdfDict):
+            stack.extend(v for _k, v in obj.iteritems())
+        else:
+            stack.extend(obj)
+    return tuple(out)
+
+
+def load_form_asset(source: str | bytes) -> FormAsset:
+    if isinstance(source, (bytes, bytearray)):
+        reader = PdfReader(io.BytesIO(bytes(source)))
+        nbytes = len(source)
+    else:
+        reader = PdfReader(str(source))
+        nbytes = Path(source).stat().st_size
+
+    if not reader.pages:
+        raise ValueError("PDF has no pages")
+    page = reader.pages[0]
+    mb = page.MediaBox
+    if not mb or len(mb) != 4:
+        raise ValueError("PDF MediaBox missing")
+    w = float(mb[2]) - float(mb[0])
+    h = float(mb[3]) - float(mb[1])
+
+    xobj = pagexobj(page)
+    nodes = _graph_nodes(xobj)
+    # pdfrw.toreportlab records per-document conversions on each node; create the
+    # holders up front so concurrent canvases never race on their creation.
+    for node in nodes:
+        if getattr(node, "derived_rl_obj", None) is None:
+            if isinstance(node, PdfDict):
+                node.private.derived_rl_obj = {}
+            else:
+                node.derived_rl_obj = {}
+
+    return FormAsset(xobj=xobj, w_pt=w, h_pt=h, nbytes=int(nbytes), nodes=nodes)
+
+
+def release_canvas(asset: FormAsset, canvas: Any) -> None:
+    # Drop the reportlab objects makerl attached for this canvas, so a cached asset
+    # does not keep finished documents alive.
+    rldoc = getattr(canvas, "_doc", canvas)
+    for node in asset.nodes:
+        derived = getattr(node, "derived_rl_obj", None)
+        if derived:
+            derived.pop(rldoc, None)
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import hashlib
+import zlib
+from typing import Any, BinaryIO, Callable
+
+from pdfrw import PdfArray, PdfDict, PdfName, PdfObject, PdfReader
+from pdfrw.pdfwriter import user_fmt
+
+_CATALOG_REF = 1
+_PAGES_REF = 2
+
+# Objects per /ObjStm when object streams are on.
+_OBJECT_STREAM_SIZE = 128
+
+
+class PdfStreamWriter:
+    """Joins page-aligned chunk PDFs (or pages written one by one) into one PDF,
+    writing front to back.
+
+    Each appended chunk's objects are serialized immediately, so the output can be a
+    non-seekable sink (a multipart upload) that receives bytes while later chunks are
+    still rendering. The page tree, catalog and xref are written by close().
+
+    Objects are shared across chunks by content: a resource whose bytes and
+    references match one already written (the background form, overlay forms,
+    identical font subsets) is referenced instead of written again. Pages, page
+    trees and page content streams are never shared.
+
+    With object_streams, every object that is not a stream (page dicts, fonts'
+    descriptors, resources) is packed into compressed /ObjStm objects and the xref
+    is written as a compressed stream (PDF 1.5).
+    """
+
+    def __init__(self, out: BinaryIO, *, object_streams: bool = False) -> None:
+        self._out = out
+        self._offset = 0
+        # offsets[n - 1] is the byte offset of object n; 1 and 2 are written last.
+        self._offsets: list[int] = [0, 0]
+        self._kids: list[int] = []
+        self._object_streams = object_streams
+        # Object number -> (object stream number, index) for objects packed in one.
+        self._packed: dict[int, tuple[int, int]] = {}
+        self._pending: list[tuple[int, bytes]] = []
+        # Content key -> object number of everything written that can be shared.
+        self._shared: dict[bytes, int] = {}
+        self.shared_objects = 0
+        self.shared_bytes = 0
+        self._write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n" if object_streams else b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def pages(self) -> int:
+        return len(self._kids)
+
+    @property
+    def bytes_written(self) -> int:
+        return self._offset
+
+    def _write(self, data: bytes) -> None:
+        self._out.write(data)
+        self._offset += len(data)
+
+    def _reserve(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets)
+
+    def _write_object(self, num: int, body: str, *, stream: bool = False) -> None:
+        if self._object_streams and not stream:
+            self._pending.append((num, body.encode("latin-1")))
+            if len(self._pending) >= _OBJECT_STREAM_SIZE:
+                self._flush_object_stream()
+            return
+        self._offsets[num - 1] = self._offset
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (num, body.encode("latin-1")))
+
+    def _flush_object_stream(self) -> None:
+        if not self._pending:
+            return
+        num = self._reserve()
+        header: list[bytes] = []
+        bodies: list[bytes] = []
+        at = 0
+        for index, (obj_num, body) in enumerate(self._pending):
+            header.append(b"%d %d" % (obj_num, at))
+            bodies.append(body)
+            at += len(body) + 1
+            self._packed[obj_num] = (num, index)
+        head = b" ".join(header) + b"\n"
+        data = zlib.compress(head + b"\n".join(bodies), 9)
+        self._offsets[num - 1] = self._offset
+        self._write(
+            b"%d 0 obj\n<</Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d>>\nstream\n%s\nendstream\nendobj\n"
+            % (num, len(self._pending), len(head), len(data), data)
+        )
+        self._pending = []
+
+    def _copier(self, unshared: set[int] | None = None) -> tuple[Callable[[Any], str], Callable[[], None]]:
+        # (ref, flush): ref(obj) returns obj inline or as "n 0 R", numbering indirect
+        # objects on first sight; flush() writes every object numbered so far.
+        # unshared: ids of objects never looked up in or added to the shared objects.
+        numbers: dict[int, int] = {}
+        pending: list[tuple[int, Any]] = []
+        # Object numbers are keyed by id(), so everything referenced stays alive here.
+        alive: list[Any] = []
+        # id -> (content key, stream bytes below it); None when it cannot be shared.
+        keys: dict[int, tuple[bytes, int] | None] = {}
+        visiting: set[int] = set()
+        unshared = unshared or set()
+
+        def indirect(obj: Any) -> bool:
+            if isinstance(obj, PdfDict):
+                return bool(obj.indirect or obj.stream is not None)
+            return bool(getattr(obj, "indirect", False))
+
+        def content_key(obj: Any) -> tuple[bytes, int] | None:
+            # Hash of the object's bytes with its references replaced by their own
+            # keys, so equal resources from different chunks get equal keys.
+            if id(obj) in keys:
+                return keys[id(obj)]
+            if id(obj) in visiting or id(obj) in unshared:
+                return None
+            if isinstance(obj, PdfDict) and obj.Type in (PdfName.Page, PdfName.Pages):
+                keys[id(obj)] = None
+                return None
+            visiting.add(id(obj))
+            h = hashlib.sha256()
+            nbytes = feed(obj, h, top=True)
+            visiting.discard(id(obj))
+            keys[id(obj)] = None if nbytes is None else (h.digest(), nbytes)
+            return keys[id(obj)]
+
+        def feed(obj: Any, h: Any, top: bool = False) -> int | None:
+            if not top and indirect(obj):
+                key = content_key(obj)
+                if key is None:
+                    return None
+                h.update(b"R" + key[0])
+                return key[1]
+            nbytes = 0
+            if isinstance(obj, dict):
+                h.update(b"<<")
+                for k, v in (obj.iteritems() if isinstance(obj, PdfDict) else obj.items()):
+                    h.update(str(getattr(k, "encoded", None) or k).encode("latin-1") + b" ")
+                    n = feed(v, h)
+                    if n is None:
+                        return None
+                    nbytes += n
+                h.update(b">>")
+                if isinstance(obj, PdfDict) and obj.stream is not None:
+                    data = obj.stream.encode("latin-1")
+                    h.update(b"stream%d\n" % len(data) + data)
+                    nbytes += len(data)
+                return nbytes
+            if isinstance(obj, (PdfArray, list, tuple)):
+                h.update(b"[")
+                for x in obj:
+                    n = feed(x, h)
+                    if n is None:
+                        return None
+                    nbytes += n
+                h.update(b"]")
+                return nbytes
+            h.update(fmt(obj).encode("latin-1") + b" ")
+            return 0
+
+        def ref(obj: Any) -> str:
+            if not indirect(obj):
+                return fmt(obj)
+            num = numbers.get(id(obj))
+            if num is None:
+                key = content_key(obj)
+                num = self._shared.get(key[0]) if key is not None else None
+                if num is not None:
+                    self.shared_objects += 1
+                    self.shared_bytes += key[1]
+                else:
+                    num = self._reserve()
+                    pending.append((num, obj))
+                    if key is not None:
+                        self._shared[key[0]] = num
+                numbers[id(obj)] = num
+                alive.append(obj)
+            return "%d 0 R" % num
+
+        def fmt(obj: Any) -> str:
+            if isinstance(obj, PdfDict):
+                items = " ".join("%s %s" % (getattr(k, "encoded", None) or k, ref(v)) for k, v in obj.iteritems())
+                out = "<<%s>>" % items
+                if obj.stream is not None:
+                    out = "%s\nstream\n%s\nendstream" % (out, obj.stream)
+                return out
+            if isinstance(obj, (PdfArray, list, tuple)):
+                parts = [ref(x) for x in obj]
+                # Keep lines short for long arrays (widths tables, kids).
+                return "[%s]" % ("\n".join(parts) if len(parts) > 32 else " ".join(parts))
+            if isinstance(obj, dict):
+                return fmt(PdfDict(obj))
+            if hasattr(obj, "indirect"):
+                return str(getattr(obj, "encoded", None) or obj)
+            return user_fmt(obj)
+
+        def flush() -> None:
+            while pending:
+                num, obj = pending.pop()
+                self._write_object(num, fmt(obj), stream=isinstance(obj, PdfDict) and obj.stream is not None)
+
+        return ref, flush
+
+    def append(self, source: Any) -> int:
+        # source: anything PdfReader accepts (path or binary file object).
+        reader = PdfReader(source)
+        # Page content is different on every page: not worth hashing.
+        unshared: set[int] = set()
+        for page in reader.pages:
+            contents = page.Contents
+            unshared.update(id(c) for c in (contents if isinstance(contents, PdfArray) else [contents]) if c is not None)
+        ref, flush = self._copier(unshared)
+
+        parent = PdfObject("%d 0 R" % _PAGES_REF)
+        for page in reader.pages:
+            # Inherited attributes are copied onto the page; the chunk's own page tree
+            # and catalog are never written.
+            inherited = page.inheritable
+            new_page = PdfDict(page)
+            new_page.Resources = inherited.Resources
+            new_page.MediaBox = inherited.MediaBox
+            new_page.CropBox = inherited.CropBox
+            new_page.Rotate = inherited.Rotate
+            new_page.Parent = parent
+            new_page.indirect = True
+            self._kids.append(int(ref(new_page).split(" ", 1)[0]))
+            flush()
+
+        return len(reader.pages)
+
+    def add_object(self, obj: Any) -> str:
+        """Write a pdfrw object and everything it references; returns its reference."""
+        ref, flush = self._copier()
+        if isinstance(obj, PdfDict):
+            obj.indirect = True
+        r = ref(obj)
+        flush()
+        return r
+
+    def add_page(
+        self,
+        content: bytes,
+        *,
+        resources: str,
+        media_box: str,
+        compress: bool = True,
+        level: int = zlib.Z_DEFAULT_COMPRESSION,
+    ) -> None:
+        """Write a page whose content stream is `content` and whose /Resources is `resources`."""
+        stream_num = self._reserve()
+        page_num = self._reserve()
+        if compress:
+            content = zlib.compress(content, level)
+            head = b"<</Length %d /Filter /FlateDecode>>" % len(content)
+        else:
+            head = b"<</Length %d>>" % len(content)
+        self._offsets[stream_num - 1] = self._offset
+        self._write(b"%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n" % (stream_num, head, content))
+        self._write_object(
+            page_num,
+            "<</Type /Page /Parent %d 0 R /MediaBox %s /Resources %s /Contents %d 0 R>>"
+            % (_PAGES_REF, media_box, resources, stream_num),
+        )
+        self._kids.append(page_num)
+
+    def close(self) -> None:
+        kids = "\n".join("%d 0 R" % k for k in self._kids)
+        self._write_object(_PAGES_REF, "<</Type /Pages /Count %d /Kids [%s]>>" % (len(self._kids), kids))
+        self._write_object(_CATALOG_REF, "<</Type /Catalog /Pages %d 0 R>>" % _PAGES_REF)
+        if self._object_streams:
+            self._flush_object_stream()
+            self._close_xref_stream()
+            return
+
+        xref_at = self._offset
+        lines = [b"xref\n0 %d\n" % (len(self._offsets) + 1), b"0000000000 65535 f\r\n"]
+        lines.extend(b"%010d 00000 n\r\n" % off for off in self._offsets)
+        self._write(b"".join(lines))
+        self._write(
+            b"trailer\n<</Size %d /Root %d 0 R>>\nstartxref\n%d\n%%EOF\n" % (len(self._offsets) + 1, _CATALOG_REF, xref_at)
+        )
+
+    def _close_xref_stream(self) -> None:
+        num = self._reserve()
+        xref_at = self._offset
+        self._offsets[num - 1] = xref_at
+        rows = [b"\x00\x00\x00\x00\x00\xff\xff"]
+        for n, off in enumerate(self._offsets, start=1):
+            packed = self._packed.get(n)
+            if packed is None:
+                rows.append(b"\x01" + off.to_bytes(4, "big") + b"\x00\x00")
+            else:
+                rows.append(b"\x02" + packed[0].to_bytes(4, "big") + packed[1].to_bytes(2, "big"))
+        data = zlib.compress(b"".join(rows), 9)
+        size = len(self._offsets) + 1
+        self._write(
+            b"%d 0 obj\n<</Type /XRef /Size %d /W [1 4 2] /Root %d 0 R /Filter /FlateDecode /Length %d>>\nstream\n%s\nendstream\nendobj\n"
+            % (num, size, _CATALOG_REF, len(data), data)
+        )
+        self._write(b"startxref\n%d\n%%EOF\n" % xref_at)
@@ -3,39 +3,59 @@ from __future__ import annotations
 import base64
 import io
 import os
-import re
 import tempfile
-from reportlab.lib import colors
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, BinaryIO, Callable, Dict, Optional
 
-import boto3
 import logging
 from fontTools.ttLib import TTFont as FTFont
 from pdfrw import PdfReader
-from pdfrw.buildxobj import pagexobj
 from pdfrw.toreportlab import makerl
+from reportlab.lib import fonts as rl_fonts
+from reportlab.lib.rl_accel import fp_str
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont as RLTTFont
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.utils import ImageReader
 
 from app.config import Settings
+from app.services.layout import (
+    LayoutPlan,
+    Matrix,
+    SlotPlan,
+    compile_layout_plan,
+    is_outlined_mode,
+    is_svg_key_overlay,
+    total_pages,
+    validate_layout,
+)
+from app.services.disk_cache import get_disk_cache
 from app.services.normalize import svg_to_pdf_cached_original_size
+from app.services.object_store import get_object_store
+from app.services.output_profile import OutputProfile, get_output_profile
+from app.services.pdf_assets import FormAsset, load_form_asset, release_canvas
+from app.services.pdf_stream import PdfStreamWriter
+from app.services.raster import RasterImage, fitted_box_pt, prepare_raster
 from app.services.template import Template
+from app.services.text_runs import OutlinedSerialEmitter, SerialTextEmitter, compile_text_runs
 from app.services.font_registry import resolve_font_family
+from app.utils.hash import sha256_hex
+from app.utils.lru import LruCache
+from app.utils.metrics import StageTimer
 from app.utils.units import mm_to_pt
 
-A4_WIDTH_MM = 210.0
-A4_HEIGHT_MM = 297.0
-OBJECTS_PER_PAGE = 4
-
 DEBUG_DRAW_OBJECT_BOX = False
 
-BASELINE_CORRECTION_MM = 0.0
-
 logger = logging.getLogger(__name__)
 
+# Called as progress(pages_done, pages_total) while a job renders.
+ProgressCallback = Callable[[int, int], None]
+
 
 def _decode_data_url(data_url: str) -> tuple[bytes, str]:
     s = str(data_url or "")
@@ -53,214 +73,452 @@ def _decode_data_url(data_url: str) -> tuple[bytes, str]:
     return payload.encode("utf-8"), mime
 
 
-def _register_custom_fonts(custom_fonts: list[dict[str, Any]]) -> None:
-    registered = set([str(n) for n in pdfmetrics.getRegisteredFontNames()])
+@dataclass
+class _CustomFont:
+    name: str  # internal ReportLab font name, derived from the content hash
+    face_name: bytes
+    pins: int = 0
+
+
+class _CustomFontSet:
+    """Custom fonts registered with ReportLab, keyed by a hash of their data URL.
+
+    Uploads are registered under hash-derived names, so two requests using the same
+    family name for different files never share a font. The decoded (and, for WOFF/
+    WOFF2, converted) file is kept in tmp/templates/fonts, so a repeat upload is not
+    decoded again. Fonts in use by a render are pinned; beyond max_entries the least
+    recently used unpinned fonts are unregistered.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._fonts: "OrderedDict[str, _CustomFont]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def acquire(self, settings: Settings, font: dict[str, Any], stats: dict[str, int]) -> str:
+        family = str(font.get("family") or "").strip()
+        data_url = str(font.get("data_url") or "").strip()
+        font_hash = sha256_hex(data_url.encode("utf-8"))
+        with self._lock:
+            entry = self._pin(font_hash)
+            if entry is not None:
+                self.hits += 1
+                stats["process_hits"] += 1
+                return entry.name
+
+        # Decoding, WOFF conversion, the disk cache and parsing the TTF run unlocked,
+        # so a new upload does not hold up renders using fonts already registered.
+        rl_font, from_disk = self._load(settings, font_hash, family, data_url, font)
+
+        with self._lock:
+            if from_disk:
+                self.disk_hits += 1
+                stats["disk_hits"] += 1
+            else:
+                self.misses += 1
+                stats["misses"] += 1
+            # Another request may have registered the same upload meanwhile.
+            entry = self._pin(font_hash)
+            if entry is None:
+                try:
+                    pdfmetrics.registerFont(rl_font)
+                except Exception as e:
+                    raise ValueError(f"CUSTOM_FONT_REGISTER_FAILED: {family}") from e
+                entry = _CustomFont(name=rl_font.fontName, face_name=rl_font.face.name, pins=1)
+                self._fonts[font_hash] = entry
+                self._evict()
+                logger.info("CUSTOM_FONT_REGISTERED", extra={"family": family, "font_name": entry.name})
+            return entry.name
+
+    def _pin(self, font_hash: str) -> _CustomFont | None:
+        # Caller holds the lock.
+        entry = self._fonts.get(font_hash)
+        if entry is not None:
+            self._fonts.move_to_end(font_hash)
+            entry.pins += 1
+        return entry
+
+    def release(self, names: list[str]) -> None:
+        with self._lock:
+            for entry in self._fonts.values():
+                if entry.name in names:
+                    entry.pins = max(0, entry.pins - names.count(entry.name))
+            self._evict()
+
+    def _load(
+        self, settings: Settings, font_hash: str, family: str, data_url: str, font: dict[str, Any]
+    ) -> tuple[RLTTFont, bool]:
+        # Returns the parsed, not yet registered font and whether the disk cache had it.
+        cache = get_disk_cache("tmp/templates", settings)
+        # Whatever the upload's flavor, the cached file is plain sfnt data.
+        file_name = f"{font_hash}.ttf"
+        font_path = cache.lookup(file_name, "fonts")
+        from_disk = font_path is not None
+        if font_path is None:
+            raw_bytes, _mime_from_url = _decode_data_url(data_url)
+            hint_mime = str(font.get("mime") or "").strip().lower()
+            font_path = cache.path(file_name, "fonts")
+            tmp_path = font_path.with_name(f".{font_path.name}.{os.getpid()}.{threading.get_ident()}")
+            try:
+                # ReportLab embeds TrueType/OpenType via TTFont. For WOFF/WOFF2, convert via fontTools.
+                if raw_bytes[:4] in {b"wOFF", b"wOF2"} or "woff" in hint_mime:
+                    try:
+                        ft = FTFont(io.BytesIO(raw_bytes), recalcBBoxes=False, recalcTimestamp=False)
+                        ft.flavor = None
+                        ft.save(str(tmp_path))
+                    except Exception as e:
+                        raise ValueError(f"CUSTOM_FONT_UNSUPPORTED_FORMAT: {family}") from e
+                else:
+                    tmp_path.write_bytes(raw_bytes)
+                os.replace(tmp_path, font_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+            cache.commit(file_name, "fonts")
+
+        name = f"PE-{font_hash[:16]}"
+        try:
+            rl_font = RLTTFont(name, str(font_path))
+            # ReportLab shares one face per PostScript name across all registered fonts;
+            # a unique face name keeps different files with the same name apart.
+            rl_font.face.name = bytes(rl_font.face.name) + b"-" + font_hash[:8].encode("ascii")
+        except Exception as e:
+            cache.discard(file_name, "fonts")
+            raise ValueError(f"CUSTOM_FONT_REGISTER_FAILED: {family}") from e
+        return rl_font, from_disk
+
+    def _evict(self) -> None:
+        while len(self._fonts) > self.max_entries:
+            victim = next((h for h, e in self._fonts.items() if e.pins == 0), None)
+            if victim is None:
+                return
+            entry = self._fonts.pop(victim)
+            _unregister_font(entry.name, entry.face_name)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._fonts),
+                "max_entries": int(self.max_entries),
+                "pinned": sum(1 for e in self._fonts.values() if e.pins),
+                "hits": int(self.hits),
+                "disk_hits": int(self.disk_hits),
+                "misses": int(self.misses),
+                "evictions": int(self.evictions),
+            }
+
+
+def _unregister_font(name: str, face_name: bytes) -> None:
+    # ReportLab has no public unregister; these are the entries registerFont adds.
+    pdfmetrics._fonts.pop(name, None)
+    pdfmetrics._dynFaceNames.pop(face_name, None)
+    key = name.lower()
+    for bold in (0, 1):
+        for italic in (0, 1):
+            rl_fonts._tt2ps_map.pop((key, bold, italic), None)
+    rl_fonts._ps2tt_map.pop(key, None)
+
+
+_CUSTOM_FONTS: _CustomFontSet | None = None
+_CUSTOM_FONTS_LOCK = threading.Lock()
+
+
+def _custom_fonts(settings: Settings) -> _CustomFontSet:
+    global _CUSTOM_FONTS
+    with _CUSTOM_FONTS_LOCK:
+        if _CUSTOM_FONTS is None:
+            _CUSTOM_FONTS = _CustomFontSet(max_entries=int(getattr(settings, "CUSTOM_FONT_CACHE_ENTRIES", 32) or 32))
+        return _CUSTOM_FONTS
+
+
+def _register_custom_fonts(
+    settings: Settings, custom_fonts: list[dict[str, Any]], stats: dict[str, int]
+) -> dict[str, str]:
+    # Returns requested family -> internal font name; each font stays pinned until
+    # released with _custom_fonts(settings).release().
+    aliases: dict[str, str] = {}
     for f in custom_fonts or []:
         family = str(f.get("family") or "").strip()
         data_url = str(f.get("data_url") or "").strip()
-        if not family or not data_url:
-            continue
-        if family in registered:
+        if not family or not data_url or family in aliases:
             continue
+        try:
+            aliases[family] = _custom_fonts(settings).acquire(settings, f, stats)
+        except BaseException:
+            _custom_fonts(settings).release(list(aliases.values()))
+            raise
+    return aliases
+
+
+@dataclass(frozen=True)
+class _OverlayAsset:
+    # Content-only part of an overlay, shared across slots, pages and jobs.
+    kind: str  # "form" | "image"
+    form: FormAsset | None = None
+    image: RasterImage | None = None
+
+    @property
+    def nbytes(self) -> int:
+        if self.form is not None:
+            return self.form.nbytes
+        return len(self.image.data) if self.image is not None else 0
+
+
+@dataclass(frozen=True)
+class _OverlayDraw:
+    # Per-canvas, ready-to-draw reference to an overlay asset.
+    form_name: str
+    content_scale: tuple[float, float] | None = None
+
+
+_OVERLAY_CACHE: LruCache[_OverlayAsset] | None = None
+_OVERLAY_CACHE_LOCK = threading.Lock()
+
+
+def _overlay_cache(settings: Settings) -> LruCache[_OverlayAsset]:
+    global _OVERLAY_CACHE
+    with _OVERLAY_CACHE_LOCK:
+        if _OVERLAY_CACHE is None:
+            _OVERLAY_CACHE = LruCache(
+                max_entries=int(getattr(settings, "OVERLAY_CACHE_ENTRIES", 64) or 64),
+                sizeof=lambda a: a.nbytes,
+            )
+        return _OVERLAY_CACHE
+
+
+def _load_data_url_overlay(
+    settings: Settings, data_url: str, effective_mime: str, box_pt: tuple[float, float]
+) -> _OverlayAsset:
+    raw_bytes, _mime_from_url = _decode_data_url(data_url)
+    if "svg" not in effective_mime:
+        image = prepare_raster(
+            raw_bytes,
+            box_pt=box_pt,
+            dpi=int(getattr(settings, "OVERLAY_IMAGE_DPI", 300)),
+            jpeg_quality=int(getattr(settings, "OVERLAY_JPEG_QUALITY", 90)),
+        )
+        return _OverlayAsset(kind="image", image=image)
 
-        raw_bytes, _mime_from_url = _decode_data_url(data_url)
-        hint_mime = str(f.get("mime") or "").strip().lower()
-        ext = "ttf"
-        if "opentype" in hint_mime or hint_mime.endswith("/otf"):
-            ext = "otf"
-        elif "woff2" in hint_mime:
-            ext = "woff2"
-        elif "woff" in hint_mime:
-            ext = "woff"
-
-        with tempfile.TemporaryDirectory(prefix="pe_fonts_") as td:
-            src_path = Path(td) / f"src.{ext}"
-            src_path.write_bytes(raw_bytes)
-
-            # ReportLab embeds TrueType/OpenType via TTFont. For WOFF/WOFF2, try to convert via fontTools.
-            font_path: Path
-            if ext in {"ttf", "otf"}:
-                font_path = src_path
-            else:
-                try:
-                    ft = FTFont(str(src_path), recalcBBoxes=False, recalcTimestamp=False)
-                    out_path = Path(td) / "converted.ttf"
-                    ft.flavor = None
-                    ft.save(str(out_path))
-                    font_path = out_path
-                except Exception as e:
-                    raise ValueError(f"CUSTOM_FONT_UNSUPPORTED_FORMAT: {family}") from e
+    try:
+        import cairosvg
+    except Exception as e:
+        raise ValueError("SVG_OVERLAY_REQUIRES_CAIROSVG") from e
 
-            try:
-                pdfmetrics.registerFont(RLTTFont(family, str(font_path)))
-                registered.add(family)
-                logger.info("CUSTOM_FONT_REGISTERED", extra={"family": family})
-            except Exception as e:
-                raise ValueError(f"CUSTOM_FONT_REGISTER_FAILED: {family}") from e
+    pdf_bytes = cairosvg.svg2pdf(bytestring=raw_bytes)
+    if not pdf_bytes or not bytes(pdf_bytes).startswith(b"%PDF-"):
+        raise ValueError("INVALID_OVERLAY_SVG")
+    form = load_form_asset(bytes(pdf_bytes))
+    if form.w_pt <= 0 or form.h_pt <= 0:
+        raise ValueError("INVALID_OVERLAY_SVG")
+    return _OverlayAsset(kind="form", form=form)
 
 
-def _draw_overlay(
+def _resolve_overlay_asset(
     *,
-    canvas: Canvas,
     settings: Settings,
     overlay: dict[str, Any],
-    object_x_pt: float,
-    object_y_pt: float,
-    object_h_pt: float,
-) -> None:
-    data_url = str(overlay.get("data_url") or "").strip()
-    overlay_type = str(overlay.get("type") or "").strip().lower()
-    svg_s3_key = str(overlay.get("svg_s3_key") or "").strip()
-    if overlay_type == "svg" and svg_s3_key:
-        x_mm = float(overlay.get("x_mm"))
-        y_mm = float(overlay.get("y_mm"))
-        scale = float(overlay.get("scale"))
-        rot = float(overlay.get("rotation_deg") or 0.0)
-        if scale <= 0:
-            return
-
+    job_assets: dict[str, _OverlayAsset],
+    stats: dict[str, int],
+) -> _OverlayAsset | None:
+    # Lookup order: this job's assets, then the process-wide LRU (keyed by content hash).
+    if is_svg_key_overlay(overlay):
+        if float(overlay.get("scale")) <= 0:
+            return None
+        svg_s3_key = str(overlay.get("svg_s3_key") or "").strip()
         _hash, overlay_pdf_path = svg_to_pdf_cached_original_size(settings=settings, svg_s3_key=svg_s3_key)
-        ov_w_pt, ov_h_pt = _pdf_page_size_pt(str(overlay_pdf_path))
-        if ov_w_pt <= 0 or ov_h_pt <= 0:
-            raise ValueError("INVALID_OVERLAY_SVG")
-
-        # Anchor is the *untransformed* intrinsic box top-left in object_mm space (same as editor).
-        # To draw the PDF form in ReportLab (bottom-left origin), we convert that to bottom-left.
-        x_pt = float(object_x_pt) + mm_to_pt(float(x_mm))
-        y_top_pt = float(object_y_pt) + (float(object_h_pt) - mm_to_pt(float(y_mm)))
-        y_bottom_pt = float(y_top_pt) - float(ov_h_pt)
-
-        cx = float(ov_w_pt) / 2.0
-        cy = float(ov_h_pt) / 2.0
-
-        ov_pdf = PdfReader(str(overlay_pdf_path))
-        ov_xobj = pagexobj(ov_pdf.pages[0])
-
-        canvas.saveState()
-        # Match the frontend CSS transform model:
-        # - element layout box is intrinsic size at (x_mm, y_mm)
-        # - then rotate+scale about center
-        canvas.translate(float(x_pt), float(y_bottom_pt))
-        canvas.translate(float(cx), float(cy))
-        if rot:
-            canvas.rotate(rot)
-        canvas.scale(float(scale), float(scale))
-        canvas.translate(-float(cx), -float(cy))
-        canvas.doForm(makerl(canvas, ov_xobj))
-        canvas.restoreState()
-        return
-
-    if not data_url:
-        return
-
-    mime = str(overlay.get("mime") or "").strip().lower()
-    x_mm = float(overlay.get("x_mm"))
-    y_mm = float(overlay.get("y_mm"))
-    w_mm = float(overlay.get("w_mm"))
-    h_mm = float(overlay.get("h_mm"))
-    rot = float(overlay.get("rotation_deg") or 0.0)
-
-    # Overlays are ABSOLUTE in object_mm space (top-left origin), and must not inherit
-    # any SVG/background scaling. We only offset by the object's page position.
-    w_pt = mm_to_pt(w_mm)
-    h_pt = mm_to_pt(h_mm)
-    x_pt = float(object_x_pt) + mm_to_pt(x_mm)
-    y_bottom_pt = float(object_y_pt) + (float(object_h_pt) - mm_to_pt(y_mm) - float(h_pt))
-
-    raw_bytes, mime_from_url = _decode_data_url(data_url)
-    effective_mime = mime or (mime_from_url or "")
+        key = f"svgpdf:{Path(overlay_pdf_path).name}"
 
-    canvas.saveState()
-    # Rotate around top-left to match preview transformOrigin: 'top left'
-    canvas.translate(float(x_pt), float(y_bottom_pt) + float(h_pt))
-    if rot:
-        canvas.rotate(rot)
-    canvas.translate(0.0, -float(h_pt))
-
-    if "svg" in effective_mime:
-        try:
-            import cairosvg
-        except Exception as e:
-            raise ValueError("SVG_OVERLAY_REQUIRES_CAIROSVG") from e
-
-        with tempfile.TemporaryDirectory(prefix="pe_overlay_") as td:
-            svg_path = Path(td) / "overlay.svg"
-            pdf_path = Path(td) / "overlay.pdf"
-            svg_path.write_bytes(raw_bytes)
-            cairosvg.svg2pdf(bytestring=raw_bytes, write_to=str(pdf_path))
-            ov_w_pt, ov_h_pt = _pdf_page_size_pt(str(pdf_path))
-            if ov_w_pt <= 0 or ov_h_pt <= 0:
+        def _load() -> _OverlayAsset:
+            form = load_form_asset(str(overlay_pdf_path))
+            if form.w_pt <= 0 or form.h_pt <= 0:
                 raise ValueError("INVALID_OVERLAY_SVG")
-            scale_x = float(w_pt) / float(ov_w_pt)
-            scale_y = float(h_pt) / float(ov_h_pt)
-            ov_pdf = PdfReader(str(pdf_path))
-            ov_xobj = pagexobj(ov_pdf.pages[0])
-            canvas.scale(scale_x, scale_y)
-            canvas.doForm(makerl(canvas, ov_xobj))
+            return _OverlayAsset(kind="form", form=form)
+
+    else:
+        data_url = str(overlay.get("data_url") or "").strip()
+        if not data_url:
+            return None
+        header = data_url.partition(",")[0]
+        mime_from_url = header[5:].split(";")[0] if header.startswith("data:") else ""
+        effective_mime = str(overlay.get("mime") or "").strip().lower() or mime_from_url
+        key = "data:" + sha256_hex(f"{effective_mime}\n{data_url}".encode("utf-8"))
+        box_pt = (mm_to_pt(float(overlay.get("w_mm"))), mm_to_pt(float(overlay.get("h_mm"))))
+        if "svg" not in effective_mime:
+            # Rasters are resampled for their placed size, so that is part of the key.
+            key += ":%s@%d" % (fp_str(*box_pt), int(getattr(settings, "OVERLAY_IMAGE_DPI", 300)))
+
+        def _load() -> _OverlayAsset:
+            return _load_data_url_overlay(settings, data_url, effective_mime, box_pt)
+
+    asset = job_assets.get(key)
+    if asset is not None:
+        stats["job_hits"] += 1
+        return asset
+
+    cache = _overlay_cache(settings)
+    asset = cache.get(key)
+    if asset is None:
+        stats["misses"] += 1
+        asset = _load()
+        cache.put(key, asset)
     else:
-        img = ImageReader(io.BytesIO(raw_bytes))
-        canvas.drawImage(img, 0.0, 0.0, width=float(w_pt), height=float(h_pt), mask='auto', preserveAspectRatio=True)
+        stats["process_hits"] += 1
+    job_assets[key] = asset
+    return asset
+
+
+def _overlay_size_pt(overlay: dict[str, Any], asset: _OverlayAsset | None) -> tuple[float, float] | None:
+    # Intrinsic drawing box of an overlay, as expected by layout.overlay_local_matrix.
+    if asset is None:
+        return None
+    if is_svg_key_overlay(overlay):
+        assert asset.form is not None
+        return asset.form.w_pt, asset.form.h_pt
+    return mm_to_pt(float(overlay.get("w_mm"))), mm_to_pt(float(overlay.get("h_mm")))
+
+
+def _prepare_overlay_draw(
+    *, canvas: Canvas, overlay: dict[str, Any], asset: _OverlayAsset, image_forms: dict[tuple[int, str], str]
+) -> _OverlayDraw:
+    if asset.kind == "form":
+        assert asset.form is not None
+        name = makerl(canvas, asset.form.xobj)
+        if is_svg_key_overlay(overlay):
+            return _OverlayDraw(form_name=name)
+        # Data-URL SVG is stretched into its w_mm/h_mm box.
+        w_pt = mm_to_pt(float(overlay.get("w_mm")))
+        h_pt = mm_to_pt(float(overlay.get("h_mm")))
+        return _OverlayDraw(form_name=name, content_scale=(w_pt / asset.form.w_pt, h_pt / asset.form.h_pt))
+
+    # Raster overlays are wrapped in a form once per document and referenced from every
+    # slot; overlays repeating the same image at the same size share one form.
+    assert asset.image is not None
+    w_pt = mm_to_pt(float(overlay.get("w_mm")))
+    h_pt = mm_to_pt(float(overlay.get("h_mm")))
+    form_key = (id(asset), fp_str(w_pt, h_pt))
+    name = image_forms.get(form_key)
+    if name is None:
+        name = f"ov_img_{len(image_forms)}"
+        # BBox is padded so its clip never coincides with (and re-antialiases) the image edge.
+        canvas.beginForm(name, -1.0, -1.0, w_pt + 1.0, h_pt + 1.0)
+        img = ImageReader(io.BytesIO(asset.image.data))
+        # Placed from the source size: a downsampled copy fills the box like the original.
+        x, y, dw, dh = fitted_box_pt(asset.image.source_px, (w_pt, h_pt))
+        canvas.drawImage(img, x, y, width=dw, height=dh, mask='auto')
+        canvas.endForm()
+        image_forms[form_key] = name
+    return _OverlayDraw(form_name=name)
+
+
+def _draw_overlay(*, canvas: Canvas, draw: _OverlayDraw, matrix: Matrix) -> None:
+    # `matrix` maps the overlay's drawing box into page space (see layout.overlay_local_matrix).
+    canvas.saveState()
+    canvas.transform(*matrix)
+    if draw.content_scale is not None:
+        canvas.scale(*draw.content_scale)
+    canvas.doForm(draw.form_name)
+    canvas.restoreState()
+
+
+def _draw_slot_static(
+    *, canvas: Canvas, plan: LayoutPlan, slot: SlotPlan, bg_form: str, overlay_draws: list[_OverlayDraw | None]
+) -> None:
+    # Everything in a slot except its serial.
+    geometry = plan.geometry
 
+    # Background is clipped to slot/object bounds.
+    canvas.saveState()
+    clip = canvas.beginPath()
+    clip.rect(*slot.clip_rect_pt)
+    canvas.clipPath(clip, stroke=0, fill=0)
+    if DEBUG_DRAW_OBJECT_BOX:
+        ox, oy = slot.object_origin_pt
+        canvas.setLineWidth(0.5)
+        canvas.rect(ox, oy, geometry.object_w_pt, geometry.object_h_pt, stroke=1, fill=0)
+    canvas.transform(*plan.background_matrices[slot.index])
+    canvas.doForm(bg_form)
     canvas.restoreState()
 
+    # Draw overlays on top of the object (preview parity). These are independent of series.
+    for ov_draw, ov_matrix in zip(overlay_draws, plan.overlay_matrices[slot.index]):
+        if ov_draw is None or ov_matrix is None:
+            continue
+        _draw_overlay(canvas=canvas, draw=ov_draw, matrix=ov_matrix)
+
 
 def _ensure_dir(path: Path) -> None:
     if not path.exists():
         path.mkdir(parents=True, exist_ok=True)
 
 
-def _parse_series_start(start: str) -> tuple[str, int, int]:
-    # NOTE: Spaces inside series prefix are valid and must be preserved
-    series_start = str(start)
-    match = re.search(r"(\d+)$", series_start)
-    if not match:
-        raise ValueError("Series must end with a numeric part")
-    number_part = match.group(1)
-    prefix_part = series_start[: match.start()]
-    return prefix_part, int(number_part), len(number_part)
+_BACKGROUND_CACHE: LruCache[FormAsset] | None = None
+_BACKGROUND_CACHE_LOCK = threading.Lock()
 
 
-def _series_value(prefix: str, base: int, width: int, i: int) -> str:
-    n = base + i
-    return f"{prefix}{str(n).zfill(width)}"
+def _background_cache(settings: Settings) -> LruCache[FormAsset]:
+    global _BACKGROUND_CACHE
+    with _BACKGROUND_CACHE_LOCK:
+        if _BACKGROUND_CACHE is None:
+            _BACKGROUND_CACHE = LruCache(
+                max_entries=int(getattr(settings, "BACKGROUND_CACHE_ENTRIES", 16) or 16),
+                max_bytes=int(getattr(settings, "BACKGROUND_CACHE_MB", 256) or 0) * 1024 * 1024,
+                sizeof=lambda a: a.nbytes,
+            )
+        return _BACKGROUND_CACHE
 
 
-def _page_size_pt() -> tuple[float, float]:
-    return mm_to_pt(A4_WIDTH_MM), mm_to_pt(A4_HEIGHT_MM)
-
-
-def _pdf_page_size_pt(pdf_path: str) -> tuple[float, float]:
+def _load_background(settings: Settings, pdf_path: str, stats: dict[str, int]) -> FormAsset:
+    # Parsed background page + form XObject, shared by every job in this process.
+    # Keyed by path, size and mtime so a re-converted file is never served stale.
     p = Path(pdf_path)
-    if not p.exists() or not p.is_file():
+    try:
+        st = p.stat()
+    except OSError:
         raise RuntimeError("INVALID_BACKGROUND_PDF: file not found")
+    if not p.is_file():
+        raise RuntimeError("INVALID_BACKGROUND_PDF: file not found")
+    key = (str(p.resolve()), int(st.st_size), int(st.st_mtime_ns))
+
+    cache = _background_cache(settings)
+    asset = cache.get(key)
+    if asset is not None:
+        stats["hits"] += 1
+        return asset
+
+    stats["misses"] += 1
     with open(p, "rb") as f:
         if f.read(5) != b"%PDF-":
             raise RuntimeError("INVALID_BACKGROUND_PDF: expected %PDF- header")
-    pdf = PdfReader(pdf_path)
-    if not pdf.pages:
-        raise ValueError("background PDF has no pages")
-    mb = pdf.pages[0].MediaBox
-    if not mb or len(mb) != 4:
-        raise ValueError("PDF MediaBox missing")
-    w = float(mb[2]) - float(mb[0])
-    h = float(mb[3]) - float(mb[1])
-    return w, h
+    asset = load_form_asset(str(p))
+    cache.put(key, asset)
+    return asset
 
 
-def _object_size_pt(object_mm: Dict[str, Any], slot_w_pt: float, slot_h_pt: float) -> tuple[float, float]:
-    # Slot is the primary layout unit. User input defines an internal object box inside the slot.
-    # object_mm.w/h define the physical print size of the object.
-    w_mm = object_mm.get("w")
-    h_mm = object_mm.get("h")
+def render_cache_stats(settings: Settings) -> Dict[str, Dict[str, Any]]:
+    """This process's in-memory render caches (worker processes keep their own)."""
+    return {
+        "background": _background_cache(settings).stats(),
+        "overlay": _overlay_cache(settings).stats(),
+        "custom_font": _custom_fonts(settings).stats(),
+    }
 
-    if w_mm is None or h_mm is None:
-        raise ValueError("object_mm.w and object_mm.h are required")
 
-    w_pt = mm_to_pt(float(w_mm))
-    h_pt = mm_to_pt(float(h_mm))
-    if w_pt <= 0 or h_pt <= 0:
-        raise ValueError("object_mm.w and object_mm.h must be > 0")
-    return w_pt, h_pt
+def preload_background(settings: Settings, pdf_path: str) -> None:
+    """Parse a background PDF into the process cache ahead of the renders that use it."""
+    _load_background(settings, pdf_path, {"hits": 0, "misses": 0})
+
+
+def _total_pages(template: Template) -> int:
+    return total_pages(
+        object_mm=template.object_box_mm or {},
+        series=template.series_config,
+        render_mode=str(getattr(template, "render_mode", "") or "").strip() or "legacy",
+        imposition=template.imposition,
+    )
 
 
 def write_final_pdf(
@@ -269,20 +527,317 @@ def write_final_pdf(
     settings: Settings,
     job_id: str,
     output_path: str,
+    progress: Optional[ProgressCallback] = None,
+    page_start: int = 0,
+    page_stop: Optional[int] = None,
+) -> tuple[int, str, Dict[str, Any]]:
+    # page_start/page_stop select a page range of the job (one output volume).
+    if page_stop is None:
+        page_stop = _total_pages(template)
+    total_pages = page_stop - page_start
+    if progress is not None:
+        progress(0, total_pages)
+
+    # Large jobs are split into page-aligned chunks rendered by worker processes.
+    workers = int(getattr(settings, "RENDER_WORKERS", 1) or 1)
+    chunk_pages = int(getattr(settings, "RENDER_CHUNK_PAGES", 0) or 0)
+    if workers > 1 and chunk_pages > 0 and total_pages > chunk_pages:
+        return _write_final_pdf_parallel(
+            template=template,
+            settings=settings,
+            job_id=job_id,
+            output_path=output_path,
+            page_start=page_start,
+            page_stop=page_stop,
+            workers=workers,
+            chunk_pages=chunk_pages,
+            progress=progress,
+        )
+
+    return _write_pdf_pages(
+        template=template,
+        settings=settings,
+        job_id=job_id,
+        output_path=output_path,
+        page_start=page_start,
+        page_stop=page_stop,
+        progress=progress,
+    )
+
+
+def _render_chunk(
+    template: Template,
+    settings: Settings,
+    job_id: str,
+    chunk_path: str,
+    page_start: int,
+    page_stop: int,
+) -> tuple[str, int, Dict[str, Any], float]:
+    # Process-pool entrypoint: must stay a module-level function so it can be pickled.
+    t0 = time.perf_counter()
+    _pages, out_path, metrics = _write_pdf_pages(
+        template=template,
+        settings=settings,
+        job_id=job_id,
+        output_path=chunk_path,
+        page_start=page_start,
+        page_stop=page_stop,
+    )
+    return out_path, page_stop - page_start, metrics, time.perf_counter() - t0
+
+
+def _write_chunked(
+    *,
+    template: Template,
+    settings: Settings,
+    job_id: str,
+    out: BinaryIO,
+    scratch_dir: Path,
+    page_start: int,
+    page_stop: int,
+    workers: int,
+    chunk_pages: int,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    # Resolve the background once so workers never fetch/convert the SVG themselves.
+    background_pdf_path = template.background_pdf_path
+    if str(background_pdf_path).lower().endswith(".svg"):
+        _svg_hash, background_pdf_path = svg_to_pdf_cached_original_size(settings=settings, svg_s3_key=background_pdf_path)
+    chunk_template = replace(template, background_pdf_path=str(background_pdf_path))
+
+    total_pages = page_stop - page_start
+    ranges = [(start, min(start + chunk_pages, page_stop)) for start in range(page_start, max(page_stop, page_start + 1), chunk_pages)]
+    workers = max(1, min(workers, len(ranges)))
+    chunk_timings: list[Dict[str, Any]] = []
+    engine_metrics: Dict[str, Any] = {}
+    timer = StageTimer()
+
+    _ensure_dir(scratch_dir)
+    with tempfile.TemporaryDirectory(prefix="pe_chunks_", dir=str(scratch_dir)) as td:
+        args = [
+            (chunk_template, settings, job_id, str(Path(td) / f"chunk_{i:05d}.pdf"), start, stop)
+            for i, (start, stop) in enumerate(ranges)
+        ]
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            futures = [pool.submit(_render_chunk, *a) for a in args] if pool is not None else None
+            writer = PdfStreamWriter(out, object_streams=get_output_profile(settings.OUTPUT_PROFILE).object_streams)
+            pages_done = 0
+            # Chunks are appended in page order as soon as each one is ready, so the
+            # output is being written while later chunks still render.
+            for i in range(len(ranges)):
+                chunk_path, pages, metrics, seconds = futures[i].result() if futures is not None else _render_chunk(*args[i])
+                if i == 0:
+                    engine_metrics.update(metrics)
+                # Chunk stage seconds add up across workers (busy time, not wall time).
+                timer.merge(metrics.get("timings"))
+                with timer.stage("join"):
+                    writer.append(chunk_path)
+                Path(chunk_path).unlink(missing_ok=True)
+                chunk_timings.append(
+                    {
+                        "chunk": i,
+                        "first_page": int(ranges[i][0]),
+                        "pages": int(pages),
+                        "seconds": round(float(seconds), 4),
+                    }
+                )
+                pages_done += pages
+                if progress is not None:
+                    progress(pages_done, total_pages)
+            with timer.stage("join"):
+                writer.close()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    engine_metrics["render_parallel"] = {
+        "workers": int(workers),
+        "chunk_pages": int(chunk_pages),
+        "chunks": chunk_timings,
+        "join_seconds": round(float(timer.seconds.get("join", 0.0)), 4),
+        "bytes": int(writer.bytes_written),
+        # Resources repeated by later chunks and referenced instead of written again.
+        "shared_objects": int(writer.shared_objects),
+        "shared_bytes": int(writer.shared_bytes),
+    }
+    engine_metrics["timings"] = timer.as_dict()
+
+    logger.info(
+        "PARALLEL_RENDER_DONE",
+        extra={"job_id": job_id, "pages": int(total_pages), "chunks": len(ranges), "workers": int(workers)},
+    )
+    return engine_metrics
+
+
+def _write_final_pdf_parallel(
+    *,
+    template: Template,
+    settings: Settings,
+    job_id: str,
+    output_path: str,
+    page_start: int,
+    page_stop: int,
+    workers: int,
+    chunk_pages: int,
+    progress: Optional[ProgressCallback] = None,
+) -> tuple[int, str, Dict[str, Any]]:
+    out_path = Path(output_path)
+    _ensure_dir(out_path.parent)
+    with open(out_path, "wb") as out:
+        engine_metrics = _write_chunked(
+            template=template,
+            settings=settings,
+            job_id=job_id,
+            out=out,
+            scratch_dir=out_path.parent,
+            page_start=page_start,
+            page_stop=page_stop,
+            workers=workers,
+            chunk_pages=chunk_pages,
+            progress=progress,
+        )
+    return page_stop - page_start, str(out_path), engine_metrics
+
+
+def stream_final_pdf(
+    *,
+    template: Template,
+    settings: Settings,
+    job_id: str,
+    out: BinaryIO,
+    scratch_dir: str = "tmp",
+    progress: Optional[ProgressCallback] = None,
+    page_start: int = 0,
+    page_stop: Optional[int] = None,
+) -> tuple[int, Dict[str, Any]]:
+    """Render into a write-only sink (e.g. a MultipartUpload), front to back.
+
+    Always renders in RENDER_CHUNK_PAGES chunks, in-process when RENDER_WORKERS is 1,
+    so finished pages leave the process while later ones are drawn and local disk
+    only ever holds the chunks not yet written.
+    """
+    if page_stop is None:
+        page_stop = _total_pages(template)
+    total_pages = page_stop - page_start
+    if progress is not None:
+        progress(0, total_pages)
+    engine_metrics = _write_chunked(
+        template=template,
+        settings=settings,
+        job_id=job_id,
+        out=out,
+        scratch_dir=Path(scratch_dir),
+        page_start=page_start,
+        page_stop=page_stop,
+        workers=int(getattr(settings, "RENDER_WORKERS", 1) or 1),
+        chunk_pages=max(1, int(getattr(settings, "RENDER_CHUNK_PAGES", 0) or 0) or 250),
+        progress=progress,
+    )
+    return total_pages, engine_metrics
+
+
+def _debug_print_plan(*, job_id: str, template: Template, plan: LayoutPlan) -> None:
+    obj_cfg = template.object_box_mm or {}
+    for slot in plan.slots:
+        print(
+            "PE_DEBUG object_size",
+            {
+                "job_id": job_id,
+                "slot_index": int(slot.index),
+                "object_w_mm": obj_cfg.get("w"),
+                "object_h_mm": obj_cfg.get("h"),
+                "object_w_pt": float(plan.geometry.object_w_pt),
+                "object_h_pt": float(plan.geometry.object_h_pt),
+            },
+        )
+        print(
+            "PE_DEBUG scale",
+            {
+                "job_id": job_id,
+                "slot_index": int(slot.index),
+                "scale_x": float(plan.scale_x),
+                "scale_y": float(plan.scale_y),
+                "scale_equal": bool(plan.scale_x == plan.scale_y),
+            },
+        )
+        print("SERIES_PREVIEW_MM", {"x_mm": float(plan.series.x_mm), "y_mm": float(plan.series.y_mm)})
+        print("SERIES_OUTPUT_PT", {"x_pt": float(slot.series_origin_pt[0]), "y_pt": float(slot.series_origin_pt[1])})
+
+
+def _write_pdf_pages(
+    *,
+    template: Template,
+    settings: Settings,
+    job_id: str,
+    output_path: str,
+    page_start: int,
+    page_stop: int,
+    progress: Optional[ProgressCallback] = None,
 ) -> tuple[int, str, Dict[str, Any]]:
     mode = str(getattr(template, "render_mode", "") or "").strip() or "legacy"
 
-    series_cfg = template.series_config
-    count = int(series_cfg.get("count"))
-    if count <= 0:
-        raise ValueError("series.count must be > 0")
+    # Placement config is validated before any font, S3 or cairosvg work.
+    validate_layout(
+        object_mm=template.object_box_mm or {},
+        series=template.series_config,
+        render_mode=mode,
+        imposition=template.imposition,
+    )
 
     # Register session-scoped custom fonts before resolving requested font_family.
-    _register_custom_fonts(list(getattr(template, "custom_fonts", []) or []))
+    # They stay pinned until the PDF is saved.
+    timer = StageTimer()
+    font_stats = {"process_hits": 0, "disk_hits": 0, "misses": 0}
+    with timer.stage("fonts"):
+        custom_fonts = _register_custom_fonts(settings, list(getattr(template, "custom_fonts", []) or []), font_stats)
+    try:
+        pages, path, engine_metrics = _render_pages(
+            template=template,
+            settings=settings,
+            job_id=job_id,
+            output_path=output_path,
+            page_start=page_start,
+            page_stop=page_stop,
+            progress=progress,
+            custom_fonts=custom_fonts,
+            timer=timer,
+        )
+    finally:
+        _custom_fonts(settings).release(list(custom_fonts.values()))
+
+    engine_metrics["custom_fonts"] = {
+        "fonts": len(custom_fonts),
+        **font_stats,
+        "process": _custom_fonts(settings).stats(),
+    }
+    engine_metrics["timings"] = timer.as_dict()
+    return pages, path, engine_metrics
+
+
+def _render_pages(
+    *,
+    template: Template,
+    settings: Settings,
+    job_id: str,
+    output_path: str,
+    page_start: int,
+    page_stop: int,
+    progress: Optional[ProgressCallback],
+    custom_fonts: dict[str, str],
+    timer: StageTimer,
+) -> tuple[int, str, Dict[str, Any]]:
+    mode = str(getattr(template, "render_mode", "") or "").strip() or "legacy"
+    object_box_cfg = template.object_box_mm or {}
+    series_cfg = template.series_config
 
     requested_font_family = str(series_cfg.get("font_family") or "").strip()
-    resolved_font_family, font_source, embedded = resolve_font_family(requested_font_family)
-    if requested_font_family and requested_font_family != resolved_font_family:
+    if requested_font_family in custom_fonts:
+        resolved_font_family, font_source, embedded = custom_fonts[requested_font_family], "custom", True
+    else:
+        with timer.stage("fonts"):
+            resolved_font_family, font_source, embedded = resolve_font_family(requested_font_family, settings)
+    if requested_font_family and requested_font_family != resolved_font_family and font_source != "custom":
         logger.warning(
             "FONT_FAMILY_FALLBACK",
             extra={
@@ -303,48 +858,22 @@ def write_final_pdf(
         },
     )
 
-    font_size_mm = float(series_cfg.get("font_size_mm"))
-    if font_size_mm <= 0:
-        raise ValueError("series.font_size_mm must be > 0")
-
-    per_letter_sizes_mm_raw = series_cfg.get("per_letter_font_size_mm")
-    per_letter_sizes_mm: list[float] | None = None
-    if per_letter_sizes_mm_raw is not None:
-        if not isinstance(per_letter_sizes_mm_raw, list):
-            raise ValueError("series.per_letter_font_size_mm must be a list of numbers")
-        per_letter_sizes_mm = []
-        for v in per_letter_sizes_mm_raw:
-            try:
-                n = float(v)
-            except (TypeError, ValueError):
-                continue
-            if n > 0:
-                per_letter_sizes_mm.append(n)
-
-    prefix, base, width = _parse_series_start(series_cfg.get("start"))
-
     out_path = Path(output_path)
     _ensure_dir(out_path.parent)
 
-    deterministic_4up = False
-
-    # A4 is the absolute authority.
-    page_w_pt, page_h_pt = _page_size_pt()
-
     background_pdf_path = template.background_pdf_path
     if str(background_pdf_path).lower().endswith(".svg"):
-        _svg_hash, background_pdf_path = svg_to_pdf_cached_original_size(settings=settings, svg_s3_key=background_pdf_path)
-    p = Path(background_pdf_path)
-    if not p.exists() or not p.is_file():
-        raise RuntimeError("INVALID_BACKGROUND_PDF: file not found")
-    with open(p, "rb") as f:
-        if f.read(5) != b"%PDF-":
-            raise RuntimeError("INVALID_BACKGROUND_PDF: expected %PDF- header")
+        _svg_hash, background_pdf_path = svg_to_pdf_cached_original_size(
+            settings=settings, svg_s3_key=background_pdf_path, timings=timer
+        )
+    background_stats = {"hits": 0, "misses": 0}
+    with timer.stage("background"):
+        background = _load_background(settings, str(background_pdf_path), background_stats)
 
-    # Load normalized SVG-PDF once (vector). We use its MediaBox as source size.
+    # Normalized SVG-PDF (vector), parsed once per process. We use its MediaBox as source size.
     # IMPORTANT: MediaBox is used ONLY to compute a deterministic transform to reach the
     # user-specified physical size (object_mm -> pt). It must never override object_mm.
-    svg_w_pt, svg_h_pt = _pdf_page_size_pt(background_pdf_path)
+    svg_w_pt, svg_h_pt = background.w_pt, background.h_pt
     if os.getenv("PRINT_ENGINE_DEBUG_SERIES") == "1":
         print(
             "PE_DEBUG svg_media_box_pt",
@@ -354,262 +883,260 @@ def write_final_pdf(
                 "svg_h_pt": float(svg_h_pt),
             },
         )
-    svg_pdf = PdfReader(background_pdf_path)
-    svg_xobj = pagexobj(svg_pdf.pages[0])
-
-    canvas = Canvas(str(out_path), pagesize=(page_w_pt, page_h_pt))
-    font_size_pt = mm_to_pt(font_size_mm)
-    logger.info("FONT_RENDER", {"font_size_mm": float(font_size_mm), "font_size_pt": float(font_size_pt), "has_per_letter": bool(per_letter_sizes_mm)})
-
-    slot_w_pt = page_w_pt
-
-    mode = str(getattr(template, "render_mode", "") or "").strip() or "legacy"
-
-    object_box_cfg = template.object_box_mm or {}
-    cut_margin_mm_raw = object_box_cfg.get("cut_margin_mm")
-    try:
-        cut_margin_mm = float(cut_margin_mm_raw) if cut_margin_mm_raw is not None else 0.0
-    except (TypeError, ValueError):
-        cut_margin_mm = 0.0
-    if cut_margin_mm < 0:
-        cut_margin_mm = 0.0
-    cut_margin_pt = mm_to_pt(cut_margin_mm)
-
-    if mode == "exact_mm":
-        slot_h_pt = (page_h_pt - ((OBJECTS_PER_PAGE - 1) * cut_margin_pt)) / OBJECTS_PER_PAGE
-    else:
-        slot_h_pt = page_h_pt / OBJECTS_PER_PAGE
-    slot_h_mm = slot_h_pt / mm_to_pt(1.0)
 
-    total_pages = (count + (OBJECTS_PER_PAGE - 1)) // OBJECTS_PER_PAGE
-    serial_index = 0
+    # Overlays are resolved once per job into shared assets (see _resolve_overlay_asset).
+    overlays = list(getattr(template, "overlays", []) or [])
+    overlay_stats = {"job_hits": 0, "process_hits": 0, "misses": 0}
+    job_assets: dict[str, _OverlayAsset] = {}
+    with timer.stage("overlays"):
+        overlay_assets = [
+            _resolve_overlay_asset(settings=settings, overlay=ov, job_assets=job_assets, stats=overlay_stats)
+            for ov in overlays
+        ]
+
+    # Everything except the serial text is identical on every page: compile it once.
+    with timer.stage("layout"):
+        plan = compile_layout_plan(
+            object_mm=object_box_cfg,
+            series=series_cfg,
+            render_mode=mode,
+            imposition=template.imposition,
+            svg_w_pt=svg_w_pt,
+            svg_h_pt=svg_h_pt,
+            overlays=overlays,
+            overlay_sizes_pt=[_overlay_size_pt(ov, asset) for ov, asset in zip(overlays, overlay_assets)],
+        )
+    if plan.debug:
+        _debug_print_plan(job_id=job_id, template=template, plan=plan)
+
+    geometry = plan.geometry
+    style = plan.series
+    font_family = str(resolved_font_family)
+
+    profile = get_output_profile(getattr(settings, "OUTPUT_PROFILE", None))
+    # The direct backend only uses the canvas for shared resources (see _write_pages_direct).
+    direct = profile.share_resources or str(getattr(settings, "RENDER_BACKEND", "canvas") or "canvas") == "direct"
+    prototype = io.BytesIO() if direct else None
+    canvas = Canvas(
+        prototype if direct else str(out_path),
+        pagesize=(geometry.page_w_pt, geometry.page_h_pt),
+        pageCompression=int(profile.compress),
+    )
+    logger.info("FONT_RENDER", {"font_size_mm": float(style.font_size_mm), "font_size_pt": float(style.font_size_pt), "has_per_letter": bool(style.per_letter_sizes_pt)})
+
+    # Place the SVG-derived PDF page as a form (vector placement).
+    # We explicitly do NOT use any raster/image drawing APIs.
+    bg_form = makerl(canvas, background.xobj)
+    text_plan = compile_text_runs(style, font_family, profile.decimals)
+    outlined = is_outlined_mode(mode)
+    text = OutlinedSerialEmitter(canvas, text_plan, settings) if outlined else SerialTextEmitter(canvas, text_plan)
+    image_forms: dict[tuple[int, str], str] = {}
+    overlay_draws = [
+        None if asset is None else _prepare_overlay_draw(canvas=canvas, overlay=ov, asset=asset, image_forms=image_forms)
+        for ov, asset in zip(overlays, overlay_assets)
+    ]
+
+    first_slot = plan.slots[0]
     engine_metrics: Dict[str, Any] = {
         "svg_media_box_pt": {"w": float(svg_w_pt), "h": float(svg_h_pt)},
+        "object_mm": dict(template.object_box_mm or {}),
+        "object_pt": {"w": float(geometry.object_w_pt), "h": float(geometry.object_h_pt)},
+        "object_origin_pt": {"x": float(first_slot.object_origin_pt[0]), "y": float(first_slot.object_origin_pt[1])},
+        "scale": {"x": float(plan.scale_x), "y": float(plan.scale_y)},
+        "series_anchor_space": (style.anchor_space or None),
+        "series_svg_pt": {"x": float(mm_to_pt(style.x_mm)), "y": float(svg_h_pt - mm_to_pt(style.y_mm))},
+        "series_pdf_pt": {"x": float(first_slot.series_origin_pt[0]), "y": float(first_slot.series_origin_pt[1])},
+    }
+    if geometry.imposition is not None:
+        engine_metrics["imposition"] = geometry.imposition.metrics()
+
+    count = style.count
+    serial_index = page_start * geometry.objects_per_page
+    engine_metrics["series_text"] = {
+        "uniform_size": text.uniform_size,
+        "char_spacing_pt": float(style.letter_spacing_pt),
+        "first_serial_width_pt": float(text.width_pt(style.value(serial_index))),
+        "outlined": bool(outlined),
     }
 
-    for _page in range(total_pages):
-        for slot_index in range(OBJECTS_PER_PAGE):
-            if mode == "exact_mm":
-                # Slot origin in user mm (measured from page top-left)
-                slot_x_mm = 0.0
-                slot_y_mm = float(slot_index) * float(slot_h_mm + cut_margin_mm)
-
-                # Slot origin in reportlab pt (bottom-left)
-                slot_x_pt = mm_to_pt(slot_x_mm)
-                slot_y_top_pt = mm_to_pt(slot_y_mm)
-                slot_y_pt = page_h_pt - slot_y_top_pt - slot_h_pt
-            else:
-                # Legacy: slot origin in reportlab pt (bottom-left)
-                slot_x_pt = 0.0
-                slot_y_pt = page_h_pt - ((slot_index + 1) * slot_h_pt)
-                slot_y_top_pt = page_h_pt - slot_y_pt - slot_h_pt
-
-            # Leave remaining slots blank when count < 4 or not divisible by 4.
-            if serial_index >= count:
-                continue
-
-            # Object physical size is defined ONLY by object_mm.w/h.
-            object_w_pt, object_h_pt = _object_size_pt(template.object_box_mm, slot_w_pt=slot_w_pt, slot_h_pt=slot_h_pt)
-            if os.getenv("PRINT_ENGINE_DEBUG_SERIES") == "1":
-                obj_cfg = template.object_box_mm or {}
-                print(
-                    "PE_DEBUG object_size",
-                    {
-                        "job_id": job_id,
-                        "slot_index": int(slot_index),
-                        "object_w_mm": obj_cfg.get("w"),
-                        "object_h_mm": obj_cfg.get("h"),
-                        "object_w_pt": float(object_w_pt),
-                        "object_h_pt": float(object_h_pt),
-                    },
-                )
-            if mode != "exact_mm":
-                if object_w_pt > slot_w_pt or object_h_pt > slot_h_pt:
-                    raise ValueError("Object size exceeds slot size")
-
-            if mode == "exact_mm":
-                x_mm = object_box_cfg.get("x_mm")
-                if x_mm is None:
-                    x_mm = object_box_cfg.get("x")
-                x_offset_pt = mm_to_pt(float(x_mm)) if x_mm is not None else 0.0
-
-                # x_mm = 0 is absolute, alignment must not interfere
-                # Keep non-zero behavior identical.
-                if x_mm is not None and float(x_mm) == 0.0:
-                    alignment = str((object_box_cfg.get("alignment") or "center")).strip().lower()
-                    if alignment == "right":
-                        page_left_pt = 0.0
-                        object_x_pt = (page_left_pt + float(page_w_pt)) - float(object_w_pt)
-                    else:
-                        page_left_pt = 0.0
-                        object_x_pt = page_left_pt
-                else:
-                    alignment = str((object_box_cfg.get("alignment") or "center")).strip().lower()
-                    if alignment == "left":
-                        base_x = slot_x_pt
-                    elif alignment == "right":
-                        base_x = slot_x_pt + slot_w_pt - object_w_pt
-                    else:
-                        base_x = slot_x_pt + (slot_w_pt - object_w_pt) / 2
-                    object_x_pt = base_x + x_offset_pt
-
-                y_mm = object_box_cfg.get("y_mm")
-                if y_mm is None:
-                    y_mm = object_box_cfg.get("y")
-                y_offset_pt = mm_to_pt(float(y_mm)) if y_mm is not None else 0.0
-                object_y_pt = (page_h_pt - slot_y_top_pt) - object_h_pt - y_offset_pt
-            else:
-                # Legacy: center object inside slot.
-                object_x_pt = slot_x_pt + (slot_w_pt - object_w_pt) / 2
-                object_y_pt = slot_y_pt + (slot_h_pt - object_h_pt) / 2
-
-            # Place the SVG-derived PDF page as a form (vector placement).
-            # We explicitly do NOT use any raster/image drawing APIs.
-            form_name = f"bg_{template.template_id}"
-            if not canvas.getAvailableFonts():
-                # no-op; reportlab requires font machinery initialized
-                pass
-
-            if svg_w_pt <= 0 or svg_h_pt <= 0:
-                raise ValueError("SVG-PDF MediaBox must be > 0")
-            scale_x = object_w_pt / svg_w_pt
-            scale_y = object_h_pt / svg_h_pt
-
-            if os.getenv("PRINT_ENGINE_DEBUG_SERIES") == "1":
-                print(
-                    "PE_DEBUG scale",
-                    {
-                        "job_id": job_id,
-                        "slot_index": int(slot_index),
-                        "scale_x": float(scale_x),
-                        "scale_y": float(scale_y),
-                        "scale_equal": bool(scale_x == scale_y),
-                    },
-                )
-
-            # Print engine rule:
-            # User-provided mm dimensions are authoritative.
-            # SVG content may stretch or distort to guarantee physical size accuracy.
+    # Static sheet content as one form per number of filled slots: a full sheet, and
+    # a variant for a partial last page.
+    use_sheet_form = direct or bool(getattr(settings, "RENDER_SHEET_FORM", True))
+    sheet_forms: dict[int, str] = {}
+
+    def sheet_form(filled: int) -> str:
+        name = sheet_forms.get(filled)
+        if name is None:
+            name = f"pe_sheet_{filled}"
+            canvas.beginForm(name, 0.0, 0.0, geometry.page_w_pt, geometry.page_h_pt)
+            for slot in plan.slots[:filled]:
+                _draw_slot_static(canvas=canvas, plan=plan, slot=slot, bg_form=bg_form, overlay_draws=overlay_draws)
+            canvas.endForm()
+            sheet_forms[filled] = name
+        return name
 
-            # Background is clipped to slot/object bounds.
-            canvas.saveState()
-            if mode == "exact_mm":
-                p_slot = canvas.beginPath()
-                p_slot.rect(slot_x_pt, slot_y_pt, slot_w_pt, slot_h_pt)
-                canvas.clipPath(p_slot, stroke=0, fill=0)
-            else:
-                p = canvas.beginPath()
-                p.rect(object_x_pt, object_y_pt, object_w_pt, object_h_pt)
-                canvas.clipPath(p, stroke=0, fill=0)
-            if DEBUG_DRAW_OBJECT_BOX:
-                canvas.setLineWidth(0.5)
-                canvas.rect(object_x_pt, object_y_pt, object_w_pt, object_h_pt, stroke=1, fill=0)
-
-            if mode == "exact_mm":
-                rotation_deg_raw = object_box_cfg.get("rotation_deg")
-                try:
-                    rotation_deg = float(rotation_deg_raw) if rotation_deg_raw is not None else 0.0
-                except (TypeError, ValueError):
-                    rotation_deg = 0.0
-                canvas.translate(object_x_pt + (object_w_pt / 2.0), object_y_pt + (object_h_pt / 2.0))
-                canvas.rotate(rotation_deg)
-                canvas.scale(scale_x, scale_y)
-                canvas.translate(-svg_w_pt / 2.0, -svg_h_pt / 2.0)
-            else:
-                canvas.translate(object_x_pt, object_y_pt)
-                canvas.scale(scale_x, scale_y)
-
-            canvas.doForm(makerl(canvas, svg_xobj))
-            canvas.restoreState()
-
-            # Draw overlays on top of the object (preview parity). These are independent of series.
-            for ov in list(getattr(template, "overlays", []) or []):
-                _draw_overlay(
-                    canvas=canvas,
-                    settings=settings,
-                    overlay=ov,
-                    object_x_pt=float(object_x_pt),
-                    object_y_pt=float(object_y_pt),
-                    object_h_pt=float(object_h_pt),
-                )
-
-            anchor_space = str(series_cfg.get("anchor_space") or "").strip().lower()
-            x_mm_series = series_cfg.get("x_mm")
-            y_mm_series = series_cfg.get("y_mm")
-            if anchor_space != "object_mm" or x_mm_series is None or y_mm_series is None:
-                raise ValueError("series placement invalid: requires anchor_space=object_mm and x_mm/y_mm")
-
-            # MM-perfect placement in object coordinates (top-left origin from editor).
-            # pdf_x_pt = object_x_pt + mm_to_pt(x_mm)
-            # pdf_y_pt = object_y_pt + mm_to_pt(object_h_mm - y_mm)
-            pdf_x_pt = float(object_x_pt) + mm_to_pt(float(x_mm_series))
-            pdf_y_pt = float(object_y_pt) + (float(object_h_pt) - mm_to_pt(float(y_mm_series) + float(BASELINE_CORRECTION_MM)))
-
-            series_rotation_deg = float(series_cfg.get("rotation_deg") or 0.0)
-            letter_spacing_mm = float(series_cfg.get("letter_spacing_mm") or 0.0)
-            series_color_raw = str(series_cfg.get("color") or "#000000").strip()
-            try:
-                fill_color = colors.HexColor(series_color_raw) if series_color_raw.startswith("#") else colors.toColor(series_color_raw)
-            except Exception:
-                fill_color = colors.black
-
-            serial = _series_value(prefix, base, width, serial_index)
-            serial_index += 1
-
-            if os.getenv("PRINT_ENGINE_DEBUG_SERIES") == "1":
-                print("SERIES_PREVIEW_MM", {"x_mm": float(x_mm_series), "y_mm": float(y_mm_series)})
-                print("SERIES_OUTPUT_PT", {"x_pt": float(pdf_x_pt), "y_pt": float(pdf_y_pt)})
-                print("SERIES_STRING", {"text": str(serial)})
-                print("FONT_SIZE_MM", {"font_size_mm": float(font_size_mm)})
-
-            # Draw series as a clean PDF overlay: no clip, no scale, baseline anchored.
-            canvas.saveState()
-            canvas.translate(float(pdf_x_pt), float(pdf_y_pt))
-            if float(series_rotation_deg) != 0.0:
-                canvas.rotate(float(series_rotation_deg))
-
-            text_obj = canvas.beginText()
-            text_obj.setTextOrigin(0.0, 0.0)
-            text_obj.setFont(str(resolved_font_family), float(font_size_pt))
-            text_obj.setFillColor(fill_color)
-
-            advance_pt = mm_to_pt(float(letter_spacing_mm))
-            for i, ch in enumerate(str(serial)):
-                size_mm = float(per_letter_sizes_mm[i]) if per_letter_sizes_mm and i < len(per_letter_sizes_mm) else float(font_size_mm)
-                size_pt = mm_to_pt(size_mm)
-                text_obj.setFont(str(resolved_font_family), float(size_pt))
-                text_obj.textOut(ch)
-                if advance_pt:
-                    text_obj.moveCursor(float(advance_pt), 0.0)
-
-            canvas.drawText(text_obj)
-            canvas.restoreState()
-
-            if serial_index == 1:
-                engine_metrics.update(
-                    {
-                        "object_mm": dict(template.object_box_mm or {}),
-                        "object_pt": {"w": float(object_w_pt), "h": float(object_h_pt)},
-                        "object_origin_pt": {"x": float(object_x_pt), "y": float(object_y_pt)},
-                        "scale": {"x": float(scale_x), "y": float(scale_y)},
-                        "series_anchor_space": (anchor_space or None),
-                        "series_svg_pt": {"x": float(mm_to_pt(float(x_mm_series))), "y": float(svg_h_pt - mm_to_pt(float(y_mm_series)))},
-                        "series_pdf_pt": {"x": float(pdf_x_pt), "y": float(pdf_y_pt)},
-                    }
-                )
+    try:
+        if prototype is not None:
+            _write_pages_direct(
+                canvas=canvas,
+                prototype=prototype,
+                plan=plan,
+                text=text,
+                sheet_form=sheet_form,
+                out_path=out_path,
+                page_start=page_start,
+                page_stop=page_stop,
+                serial_index=serial_index,
+                profile=profile,
+                progress=progress,
+                timer=timer,
+            )
+        else:
+            t_draw = time.perf_counter()
+            for _page in range(page_start, page_stop):
+                if use_sheet_form:
+                    canvas.doForm(sheet_form(min(len(plan.slots), count - serial_index)))
+                for slot in plan.slots:
+                    # Leave remaining slots blank when count is not a multiple of the slots per page.
+                    if serial_index >= count:
+                        break
+
+                    if not use_sheet_form:
+                        _draw_slot_static(canvas=canvas, plan=plan, slot=slot, bg_form=bg_form, overlay_draws=overlay_draws)
+
+                    serial = style.value(serial_index)
+                    serial_index += 1
+
+                    if plan.debug:
+                        print("SERIES_STRING", {"text": str(serial)})
+                        print("FONT_SIZE_MM", {"font_size_mm": float(style.font_size_mm)})
+
+                    # Draw series as a clean PDF overlay: no clip, no scale, baseline anchored.
+                    text.emit(serial, slot.series_matrix)
+
+                canvas.showPage()
+                if progress is not None:
+                    progress(_page + 1 - page_start, page_stop - page_start)
+            timer.add("draw", time.perf_counter() - t_draw)
+
+            with timer.stage("save"):
+                canvas.save()
+    finally:
+        release_canvas(background, canvas)
+        for asset in job_assets.values():
+            if asset.form is not None:
+                release_canvas(asset.form, canvas)
+
+    if outlined:
+        engine_metrics["series_text"]["glyph_forms"] = int(text.glyph_forms)
+        # False when the font's own outlines were not found and Liberation Sans stood in.
+        engine_metrics["series_text"]["outline_face_exact"] = bool(text.exact_face)
+    engine_metrics["sheet_form"] = {"enabled": use_sheet_form, "variants": len(sheet_forms)}
+    engine_metrics["backend"] = "direct" if direct else "canvas"
+    engine_metrics["output_profile"] = profile.name
+
+    engine_metrics["background_cache"] = {
+        **background_stats,
+        "process": _background_cache(settings).stats(),
+    }
+    rasters = [a.image for a in job_assets.values() if a.image is not None]
+    engine_metrics["overlay_cache"] = {
+        "overlays": len(overlays),
+        **overlay_stats,
+        "images": {
+            "unique": len(rasters),
+            "image_forms": len(image_forms),
+            "source_bytes": sum(r.source_nbytes for r in rasters),
+            "embedded_bytes": sum(len(r.data) for r in rasters),
+            "resampled": sum(1 for r in rasters if r.px != r.source_px),
+        },
+        "process": _overlay_cache(settings).stats(),
+    }
 
-        canvas.showPage()
+    return page_stop - page_start, str(out_path), engine_metrics
 
-    canvas.save()
 
-    return total_pages, str(out_path), engine_metrics
+def _write_pages_direct(
+    *,
+    canvas: Canvas,
+    prototype: io.BytesIO,
+    plan: LayoutPlan,
+    text: SerialTextEmitter | OutlinedSerialEmitter,
+    sheet_form: Callable[[int], str],
+    out_path: Path,
+    page_start: int,
+    page_stop: int,
+    serial_index: int,
+    profile: OutputProfile,
+    progress: Optional[ProgressCallback],
+    timer: StageTimer,
+) -> None:
+    """Writes pages without going through the canvas once per page.
+
+    reportlab still builds everything shared: fonts (every glyph a serial can use is
+    put in the subset up front), glyph forms and sheet forms, all on one throwaway
+    page whose /Resources every written page references. A page content stream is
+    then the sheet form Do plus, per slot, a precomputed byte template around the
+    serial text; each page is written to out_path as soon as it is built.
+    """
+    style = plan.series
+    slots = plan.slots
+    per_page = len(slots)
+    count = style.count
+
+    last_index = serial_index + (page_stop - page_start - 1) * per_page
+    sheet_do: dict[int, str] = {}
+    for filled in sorted({min(per_page, count - serial_index), min(per_page, count - last_index)}):
+        name = sheet_form(filled)
+        canvas.doForm(name)
+        sheet_do[filled] = "/%s Do" % canvas._doc.getXObjectName(name)
+
+    # Serials are the prefix and a number; their length never shrinks.
+    chars = "".join(sorted(set(style.prefix) | set("0123456789" + ("-" if style.base < 0 else ""))))
+    longest = len(style.value(count - 1))
+    for ch in chars:
+        text.ops(ch * longest)
+    templates = [text.literal_template(chars, slot.series_matrix) for slot in slots]
+
+    canvas.showPage()
+    with timer.stage("save"):
+        canvas.save()
+        prototype.seek(0)
+        resources_obj = PdfReader(prototype).pages[0].inheritable.Resources
+
+    geometry = plan.geometry
+    media_box = "[%s]" % fp_str(0, 0, geometry.page_w_pt, geometry.page_h_pt)
+    t_draw = time.perf_counter()
+    with open(out_path, "wb") as f:
+        writer = PdfStreamWriter(f, object_streams=profile.object_streams)
+        resources = writer.add_object(resources_obj)
+        for page in range(page_start, page_stop):
+            filled = min(per_page, count - serial_index)
+            parts = [sheet_do[filled]]
+            for slot_index in range(filled):
+                serial = style.value(serial_index + slot_index)
+                if plan.debug:
+                    print("SERIES_STRING", {"text": str(serial)})
+                template = templates[slot_index]
+                if template is not None:
+                    head, tail, table = template
+                    parts.append(head + serial.translate(table) + tail)
+                else:
+                    parts.append(text.literal(serial, slots[slot_index].series_matrix))
+            serial_index += filled
+            writer.add_page(
+                "\n".join(parts).encode("latin-1"),
+                resources=resources,
+                media_box=media_box,
+                compress=profile.compress,
+                level=profile.compress_level,
+            )
+            if progress is not None:
+                progress(page + 1 - page_start, page_stop - page_start)
+        timer.add("draw", time.perf_counter() - t_draw)
+        with timer.stage("save"):
+            writer.close()
 
 
 def upload_pdf_to_s3(*, settings: Settings, local_path: str, s3_key: str) -> None:
-    session = boto3.session.Session(
-        aws_access_key_id=settings.S3_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
-        region_name=settings.S3_REGION or None,
-    )
-    client = session.client("s3", endpoint_url=settings.S3_ENDPOINT or None)
-    client.upload_file(local_path, settings.S3_BUCKET, s3_key, ExtraArgs={"ContentType": "application/pdf"})
+    get_object_store(settings).put_file(local_path, s3_key, content_type="application/pdf")
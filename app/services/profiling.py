@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from app.config import Settings
+from app.services.object_store import get_object_store
+
+# cProfile and tracemalloc are process-wide: one profiled render at a time.
+_PROFILE_LOCK = threading.Lock()
+
+_CPU_REPORT_LINES = 60
+_ALLOC_REPORT_LINES = 40
+_TOP_ALLOCATIONS = 5
+
+
+class RenderProfile:
+    """Deterministic CPU profile and allocation snapshot of one render.
+
+    Only the calling thread is profiled; the caller renders profiled jobs with a
+    single worker so the page loop runs on that thread.
+    """
+
+    def __init__(self) -> None:
+        self._cpu = cProfile.Profile()
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._peak_bytes = 0
+        self._t0 = 0.0
+        self.seconds = 0.0
+
+    def start(self) -> None:
+        self._t0 = time.perf_counter()
+        tracemalloc.start(16)
+        self._cpu.enable()
+
+    def stop(self) -> None:
+        self._cpu.disable()
+        self.seconds = time.perf_counter() - self._t0
+        self._snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"))
+        )
+        _current, self._peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    def _cpu_report(self) -> str:
+        out = io.StringIO()
+        stats = pstats.Stats(self._cpu, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_CPU_REPORT_LINES)
+        return out.getvalue()
+
+    def _allocations(self) -> list[tracemalloc.Statistic]:
+        assert self._snapshot is not None
+        return self._snapshot.statistics("lineno")
+
+    def save(self, *, settings: Settings, prefix: str) -> dict[str, Any]:
+        """Uploads cpu.prof (pstats), cpu.txt and alloc.txt under `prefix`; returns their keys."""
+        store = get_object_store(settings)
+        keys = {
+            "cpu_s3_key": f"{prefix}/cpu.prof",
+            "cpu_report_s3_key": f"{prefix}/cpu.txt",
+            "alloc_report_s3_key": f"{prefix}/alloc.txt",
+        }
+        with tempfile.TemporaryDirectory(prefix="pe_profile_") as td:
+            path = Path(td) / "cpu.prof"
+            self._cpu.dump_stats(str(path))
+            store.put_file(str(path), keys["cpu_s3_key"])
+        store.put_bytes(keys["cpu_report_s3_key"], self._cpu_report().encode("utf-8"), content_type="text/plain")
+
+        allocations = self._allocations()
+        lines = [f"peak traced: {self._peak_bytes} bytes", ""]
+        lines += [str(stat) for stat in allocations[:_ALLOC_REPORT_LINES]]
+        store.put_bytes(keys["alloc_report_s3_key"], ("\n".join(lines) + "\n").encode("utf-8"), content_type="text/plain")
+
+        return {
+            **keys,
+            "seconds": round(float(self.seconds), 4),
+            "peak_traced_bytes": int(self._peak_bytes),
+            "top_allocations": [
+                {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "bytes": int(stat.size), "count": int(stat.count)}
+                for stat in allocations[:_TOP_ALLOCATIONS]
+            ],
+        }
+
+
+@contextmanager
+def profile_render(enabled: bool) -> Iterator[RenderProfile | None]:
+    """Profiles the block when enabled; yields None (and costs nothing) otherwise."""
+    if not enabled:
+        yield None
+        return
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        raise ValueError("PROFILER_BUSY")
+    try:
+        profile = RenderProfile()
+        profile.start()
+        try:
+            yield profile
+        finally:
+            profile.stop()
+    finally:
+        _PROFILE_LOCK.release()
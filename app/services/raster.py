@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+
+from PIL import Image
+
+# Above this many distinct colours an image is treated as a photo (JPEG); at or
+# below it (logos, line art, flat fills) as graphics (lossless Flate).
+_GRAPHIC_MAX_COLORS = 4096
+
+
+@dataclass(frozen=True)
+class RasterImage:
+    # Print-ready encoding of one overlay image for one placed size.
+    data: bytes
+    encoding: str  # "jpeg" | "png"
+    px: tuple[int, int]
+    source_px: tuple[int, int]
+    source_nbytes: int
+
+
+def fitted_box_pt(source_px: tuple[int, int], box_pt: tuple[float, float]) -> tuple[float, float, float, float]:
+    """(x, y, w, h) of `source_px` fitted into `box_pt`, aspect kept and centred.
+
+    Taken from the source size, so a downsampled copy is drawn exactly where the
+    original would have been.
+    """
+    iw, ih = source_px
+    w_pt, h_pt = box_pt
+    fit = min(w_pt / iw, h_pt / ih)
+    dw, dh = iw * fit, ih * fit
+    return (w_pt - dw) / 2.0, (h_pt - dh) / 2.0, dw, dh
+
+
+def target_px(source_px: tuple[int, int], box_pt: tuple[float, float], dpi: int) -> tuple[int, int]:
+    """Pixels needed to print `source_px` fitted into `box_pt` (aspect kept) at `dpi`."""
+    iw, ih = source_px
+    w_pt, h_pt = box_pt
+    # One scale for both axes, so the copy keeps the source's aspect ratio.
+    scale = min(w_pt / iw, h_pt / ih) / 72.0 * dpi
+    return max(1, round(iw * scale)), max(1, round(ih * scale))
+
+
+def is_photographic(img: Image.Image) -> bool:
+    # Many distinct colours: JPEG will be much smaller than Flate at no visible cost.
+    return img.getcolors(_GRAPHIC_MAX_COLORS) is None
+
+
+def _has_transparency(img: Image.Image) -> bool:
+    if img.mode in {"RGBA", "LA", "PA"}:
+        return img.getchannel("A").getextrema()[0] < 255
+    return img.mode == "P" and "transparency" in img.info
+
+
+def prepare_raster(raw: bytes, *, box_pt: tuple[float, float], dpi: int, jpeg_quality: int) -> RasterImage:
+    """Downsample an overlay image to `dpi` at its placed size and pick its encoding.
+
+    Images already at or below the target resolution keep their bytes when they are
+    JPEG or PNG. Otherwise photos are re-encoded as JPEG and graphics or anything
+    with transparency as PNG (embedded with Flate).
+    """
+    try:
+        img = Image.open(io.BytesIO(raw))
+        img.load()
+    except Exception as e:
+        raise ValueError("INVALID_OVERLAY_IMAGE") from e
+
+    source_px = (int(img.width), int(img.height))
+    want = target_px(source_px, box_pt, dpi) if dpi > 0 else source_px
+    downsample = want[0] < source_px[0] and want[1] < source_px[1]
+    if not downsample and img.format in {"JPEG", "PNG"}:
+        encoding = "jpeg" if img.format == "JPEG" else "png"
+        return RasterImage(data=bytes(raw), encoding=encoding, px=source_px, source_px=source_px, source_nbytes=len(raw))
+
+    alpha = _has_transparency(img)
+    if img.mode not in {"RGB", "RGBA", "L", "LA"}:
+        img = img.convert("RGBA" if alpha else "RGB")
+    elif not alpha and img.mode in {"RGBA", "LA"}:
+        img = img.convert(img.mode[:-1])
+    if downsample:
+        img = img.resize(want, Image.Resampling.LANCZOS)
+
+    photo = not alpha and is_photographic(img)
+    out = io.BytesIO()
+    if photo:
+        img.save(out, format="JPEG", quality=int(jpeg_quality), optimize=True)
+    else:
+        img.save(out, format="PNG")
+    return RasterImage(
+        data=out.getvalue(),
+        encoding="jpeg" if photo else "png",
+        px=(int(img.width), int(img.height)),
+        source_px=source_px,
+        source_nbytes=len(raw),
+    )
@@ -1,8 +1,69 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
 from pathlib import Path
+from typing import Any, Iterator
+
 from app.config import Settings
-from app.services.normalize import svg_to_pdf_cached_original_size
-from app.services.pdf_writer import upload_pdf_to_s3, write_final_pdf
-from app.services.template import compute_template_id, load_or_create_template
+from app.services.background_images import optimize_background_pdf
+from app.services.layout import Volume, plan_volumes, validate_layout
+from app.services.normalize import svg_preflight_stats, svg_source_cache_stats, svg_to_pdf_cached_original_size
+from app.services.object_store import get_object_store
+from app.services.output_profile import get_output_profile
+from app.services.pdf_writer import ProgressCallback, preload_background, stream_final_pdf, upload_pdf_to_s3, write_final_pdf
+from app.services.profiling import profile_render
+from app.services.template import Template, compute_template_id, load_or_create_template
+from app.utils.metrics import MetricsRegistry, StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Scraped from GET /metrics; render workers are separate processes and report their
+# stage seconds through engine_metrics["timings"], so only this process records.
+METRICS = MetricsRegistry("print_engine")
+METRICS.histogram(
+    "stage_seconds",
+    "Seconds spent per render stage, per job.",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+METRICS.histogram("job_pages", "Pages per rendered job.", (1, 10, 100, 1000, 5000, 10000, 25000, 50000, 100000))
+METRICS.histogram("job_bytes", "Output bytes per rendered job.", (1e5, 1e6, 1e7, 5e7, 1e8, 5e8, 1e9, 5e9))
+METRICS.counter("jobs_total", "Render jobs finished, by status.")
+METRICS.gauge("jobs_in_flight", "Render jobs currently running in this process.")
+METRICS.set("jobs_in_flight", 0)
+
+
+@contextmanager
+def _tracked_job() -> Iterator[StageTimer]:
+    # Counts the job as in flight, and as FAILED if the block raises.
+    METRICS.inc("jobs_in_flight")
+    try:
+        yield StageTimer()
+    except BaseException:
+        METRICS.inc("jobs_total", labels={"status": "FAILED"})
+        raise
+    finally:
+        METRICS.inc("jobs_in_flight", -1)
+
+
+def _observe_job(timer: StageTimer, pages: int, nbytes: int) -> None:
+    for stage, seconds in timer.seconds.items():
+        METRICS.observe("stage_seconds", seconds, labels={"stage": stage})
+    METRICS.observe("job_pages", pages)
+    METRICS.observe("job_bytes", nbytes)
+    METRICS.inc("jobs_total", labels={"status": "DONE"})
+
+
+def resolve_render_mode(render_mode: str | None) -> str:
+    raw_mode = str(render_mode or '').strip()
+    if raw_mode in {"preview", "print_authoritative"}:
+        return "exact_mm"
+    if raw_mode in {"deterministic_outlined", "deterministic_outlined_4up"}:
+        # exact_mm placement, serials drawn as outlines (see layout.OUTLINED_RENDER_MODES).
+        return "deterministic_outlined"
+    return raw_mode or 'exact_mm'
 
 
 def render_job(
@@ -15,52 +76,377 @@ def render_job(
     custom_fonts: list[dict] | None = None,
     overlays: list[dict] | None = None,
     render_mode: str | None = None,
+    imposition: dict | None = None,
+    max_pages_per_file: int | None = None,
+    output_profile: str | None = None,
+    profile: bool = False,
+    progress: ProgressCallback | None = None,
+    source: tuple[str, str] | None = None,
 ) -> dict:
+    # source: (svg_hash, background_pdf_path) already resolved by the caller (batches).
     object_mm = object_mm or {}
-    raw_mode = str(render_mode or '').strip()
-    if raw_mode in {"preview", "print_authoritative"}:
-        mode = "exact_mm"
-    elif raw_mode in {"deterministic_outlined", "deterministic_outlined_4up"}:
-        mode = "exact_mm"
-    else:
-        mode = raw_mode or 'exact_mm'
-    svg_hash, background_pdf_path = svg_to_pdf_cached_original_size(
-        settings=settings,
-        svg_s3_key=svg_s3_key,
-    )
+    mode = resolve_render_mode(render_mode)
 
-    template_id = compute_template_id(
-        svg_hash=svg_hash,
-        object_mm=object_mm,
-        series=series,
-        custom_fonts=custom_fonts,
-        overlays=overlays,
-        render_mode=mode,
-    )
-    template = load_or_create_template(
-        template_id=template_id,
-        background_pdf_path=background_pdf_path,
-        object_mm=object_mm,
-        series=series,
-        custom_fonts=custom_fonts,
-        overlays=overlays,
-        render_mode=mode,
-    )
+    # Reject invalid placement before any S3 fetch or SVG conversion.
+    validate_layout(object_mm=object_mm, series=series, render_mode=mode, imposition=imposition)
+    volumes = None
+    if max_pages_per_file is not None:
+        volumes = plan_volumes(
+            object_mm=object_mm,
+            series=series,
+            render_mode=mode,
+            max_pages=max_pages_per_file,
+            imposition=imposition,
+        )
+    if output_profile is not None:
+        # Workers and chunk processes read the profile from settings.
+        settings = replace(settings, OUTPUT_PROFILE=get_output_profile(output_profile).name)
+
+    if profile:
+        # cProfile only sees this thread: keep the page loop in this process.
+        settings = replace(settings, RENDER_WORKERS=1)
+
+    t0 = time.perf_counter()
+    with profile_render(profile) as profiler, _tracked_job() as timer:
+        if source is not None:
+            svg_hash, background_pdf_path = source
+        else:
+            svg_hash, background_pdf_path = svg_to_pdf_cached_original_size(
+                settings=settings,
+                svg_s3_key=svg_s3_key,
+                timings=timer,
+            )
+        with timer.stage("background_images"):
+            background_images = optimize_background_pdf(
+                settings=settings, pdf_path=background_pdf_path, object_mm=object_mm
+            )
+        background_pdf_path = background_images.pdf_path
 
-    tmp_dir = Path("tmp")
-    if not tmp_dir.exists():
-        tmp_dir.mkdir(parents=True, exist_ok=True)
+        template_id = compute_template_id(
+            svg_hash=svg_hash,
+            object_mm=object_mm,
+            series=series,
+            custom_fonts=custom_fonts,
+            overlays=overlays,
+            render_mode=mode,
+            imposition=imposition,
+        )
+        with timer.stage("template"):
+            template = load_or_create_template(
+                settings=settings,
+                template_id=template_id,
+                background_pdf_path=background_pdf_path,
+                object_mm=object_mm,
+                series=series,
+                custom_fonts=custom_fonts,
+                overlays=overlays,
+                render_mode=mode,
+                imposition=imposition,
+            )
 
-    final_local_path = str(tmp_dir / f"final_{job_id}.pdf")
-    pages, _, engine_metrics = write_final_pdf(template=template, settings=settings, job_id=job_id, output_path=final_local_path)
+        tmp_dir = Path("tmp")
+        if not tmp_dir.exists():
+            tmp_dir.mkdir(parents=True, exist_ok=True)
 
-    pdf_s3_key = f"documents/final/{job_id}.pdf"
-    upload_pdf_to_s3(settings=settings, local_path=final_local_path, s3_key=pdf_s3_key)
+        manifest_s3_key = None
+        if volumes is None:
+            pdf_s3_key = f"documents/final/{job_id}.pdf"
+            pages, engine_metrics, nbytes = _write_output(
+                settings=settings,
+                template=template,
+                job_id=job_id,
+                pdf_s3_key=pdf_s3_key,
+                local_path=tmp_dir / f"final_{job_id}.pdf",
+                progress=progress,
+            )
+        else:
+            pdf_s3_key, manifest_s3_key, pages, engine_metrics = _write_volumes(
+                settings=settings,
+                template=template,
+                template_id=template_id,
+                job_id=job_id,
+                volumes=volumes,
+                max_pages_per_file=int(max_pages_per_file),
+                tmp_dir=tmp_dir,
+                progress=progress,
+            )
+            nbytes = int(engine_metrics["volumes"]["bytes"])
+
+        engine_metrics["svg_source_cache"] = svg_source_cache_stats()
+        engine_metrics["background_images"] = background_images.metrics()
+        preflight = svg_preflight_stats(settings, svg_hash)
+        if preflight is not None:
+            engine_metrics["svg_preflight"] = preflight
+        timer.merge(engine_metrics.get("timings"))
+        timer.add("total", time.perf_counter() - t0)
+        engine_metrics["timings"] = timer.as_dict()
+        _observe_job(timer, int(pages), int(nbytes))
+        logger.info("RENDER_TIMINGS", extra={"job_id": job_id, "pages": int(pages), "timings": engine_metrics["timings"]})
+
+    if profiler is not None:
+        engine_metrics["profile"] = profiler.save(settings=settings, prefix=f"documents/final/{job_id}/profile")
 
     return {
         "status": "DONE",
         "pdf_s3_key": pdf_s3_key,
+        "manifest_s3_key": manifest_s3_key,
         "pages": pages,
         "template_id": template_id,
         "engine_metrics": engine_metrics,
     }
+
+
+def _write_output(
+    *,
+    settings: Settings,
+    template: Template,
+    job_id: str,
+    pdf_s3_key: str,
+    local_path: Path,
+    progress: ProgressCallback | None,
+    page_start: int = 0,
+    page_stop: int | None = None,
+) -> tuple[int, dict, int]:
+    # Renders pages [page_start, page_stop) to pdf_s3_key; returns (pages, engine_metrics, bytes).
+    if settings.RENDER_OUTPUT_MODE == "stream":
+        # Pages go to the store in parts while later pages are still rendering; no full local copy.
+        upload = get_object_store(settings).open_upload(
+            pdf_s3_key,
+            content_type="application/pdf",
+            part_size=settings.S3_PART_SIZE_MB * 1024 * 1024,
+            concurrency=settings.S3_UPLOAD_CONCURRENCY,
+        )
+        try:
+            pages, engine_metrics = stream_final_pdf(
+                template=template,
+                settings=settings,
+                job_id=job_id,
+                out=upload,
+                scratch_dir=str(local_path.parent),
+                progress=progress,
+                page_start=page_start,
+                page_stop=page_stop,
+            )
+            # Parts went out while rendering; this is only the wait for the last ones.
+            t_upload = time.perf_counter()
+            engine_metrics["upload"] = upload.complete()
+            _add_timing(engine_metrics, "upload", time.perf_counter() - t_upload)
+        except BaseException:
+            upload.abort()
+            raise
+        return pages, engine_metrics, int(engine_metrics["upload"].get("bytes") or 0)
+
+    try:
+        pages, _, engine_metrics = write_final_pdf(
+            template=template,
+            settings=settings,
+            job_id=job_id,
+            output_path=str(local_path),
+            progress=progress,
+            page_start=page_start,
+            page_stop=page_stop,
+        )
+        nbytes = local_path.stat().st_size
+        t_upload = time.perf_counter()
+        upload_pdf_to_s3(settings=settings, local_path=str(local_path), s3_key=pdf_s3_key)
+        _add_timing(engine_metrics, "upload", time.perf_counter() - t_upload)
+    finally:
+        # The uploaded object is the only copy we keep.
+        local_path.unlink(missing_ok=True)
+    return pages, engine_metrics, nbytes
+
+
+def _add_timing(engine_metrics: dict, stage: str, seconds: float) -> None:
+    timings = engine_metrics.setdefault("timings", {})
+    timings[stage] = round(float(timings.get(stage, 0.0) + seconds), 4)
+
+
+def _offset_progress(progress: ProgressCallback | None, offset: int, total: int) -> ProgressCallback | None:
+    # Reports a part's progress as progress through the whole job.
+    if progress is None:
+        return None
+    return lambda done, _pages: progress(offset + done, total)
+
+
+def _write_volumes(
+    *,
+    settings: Settings,
+    template: Template,
+    template_id: str,
+    job_id: str,
+    volumes: list[Volume],
+    max_pages_per_file: int,
+    tmp_dir: Path,
+    progress: ProgressCallback | None,
+) -> tuple[str, str, int, dict]:
+    """Renders a job as documents/final/{job_id}/part-NNNN.pdf plus manifest.json.
+
+    Each part is uploaded as soon as it is rendered. Returns (first part key,
+    manifest key, pages, engine metrics of the first part with a "volumes" summary).
+    """
+    prefix = f"documents/final/{job_id}"
+    total = volumes[-1].page_stop
+    parts: list[dict[str, Any]] = []
+    engine_metrics: dict[str, Any] = {}
+    t0 = time.perf_counter()
+    for volume in volumes:
+        key = f"{prefix}/part-{volume.part:04d}.pdf"
+        t = time.perf_counter()
+        pages, metrics, nbytes = _write_output(
+            settings=settings,
+            template=template,
+            job_id=job_id,
+            pdf_s3_key=key,
+            local_path=tmp_dir / f"final_{job_id}_part-{volume.part:04d}.pdf",
+            progress=_offset_progress(progress, volume.page_start, total),
+            page_start=volume.page_start,
+            page_stop=volume.page_stop,
+        )
+        if not engine_metrics:
+            engine_metrics = metrics
+        else:
+            for stage, seconds in (metrics.get("timings") or {}).items():
+                _add_timing(engine_metrics, stage, seconds)
+        parts.append(
+            {
+                "part": volume.part,
+                "key": key,
+                "pages": int(pages),
+                "first_page": volume.page_start + 1,
+                "last_page": volume.page_stop,
+                "serials": volume.serial_stop - volume.serial_start,
+                "first_serial": volume.first_serial,
+                "last_serial": volume.last_serial,
+                "bytes": int(nbytes),
+                "seconds": round(float(time.perf_counter() - t), 4),
+            }
+        )
+        logger.info("VOLUME_DONE", extra={"job_id": job_id, "part": volume.part, "pages": int(pages)})
+
+    manifest = {
+        "job_id": job_id,
+        "template_id": template_id,
+        "pages": int(total),
+        "serials": volumes[-1].serial_stop,
+        "parts": parts,
+    }
+    manifest_key = f"{prefix}/manifest.json"
+    get_object_store(settings).put_bytes(
+        manifest_key, json.dumps(manifest, indent=2).encode("utf-8"), content_type="application/json"
+    )
+    engine_metrics["volumes"] = {
+        "parts": len(parts),
+        "max_pages_per_file": max_pages_per_file,
+        "bytes": sum(p["bytes"] for p in parts),
+        "seconds": round(float(time.perf_counter() - t0), 4),
+    }
+    return parts[0]["key"], manifest_key, int(total), engine_metrics
+
+
+def _error_detail(e: Exception) -> str:
+    # ValueErrors carry the same codes /render returns as 400 details.
+    return str(e) if isinstance(e, ValueError) else f"{type(e).__name__}: {e}"
+
+
+def render_batch(*, settings: Settings, jobs: list[dict[str, Any]]) -> dict:
+    """Render many jobs with shared inputs resolved once.
+
+    Each distinct source SVG is fetched, converted and parsed once before any job
+    renders; fonts and overlays are shared through the process caches. Jobs then run
+    on RENDER_BATCH_CONCURRENCY threads. A failing job is reported in its own result
+    and never fails the batch.
+    """
+    if not jobs:
+        raise ValueError("EMPTY_BATCH")
+    if len(jobs) > settings.RENDER_BATCH_MAX_JOBS:
+        raise ValueError("BATCH_TOO_LARGE")
+    job_ids = [str(j["job_id"]) for j in jobs]
+    if len(set(job_ids)) != len(job_ids):
+        raise ValueError("DUPLICATE_JOB_ID")
+
+    t0 = time.perf_counter()
+    errors: dict[int, str] = {}
+    for i, job in enumerate(jobs):
+        try:
+            validate_layout(
+                object_mm=job.get("object_mm") or {},
+                series=job["series"],
+                render_mode=resolve_render_mode(job.get("render_mode")),
+                imposition=job.get("imposition"),
+            )
+        except ValueError as e:
+            errors[i] = str(e)
+
+    sources: dict[str, tuple[str, str] | Exception] = {}
+    for i, job in enumerate(jobs):
+        key = str(job["svg_s3_key"])
+        if i in errors or key in sources:
+            continue
+        try:
+            sources[key] = svg_to_pdf_cached_original_size(settings=settings, svg_s3_key=key)
+            preload_background(settings, sources[key][1])
+        except Exception as e:
+            logger.exception("BATCH_SOURCE_FAILED", extra={"svg_s3_key": key})
+            sources[key] = e
+    t_prepared = time.perf_counter()
+
+    runnable: list[int] = []
+    for i, job in enumerate(jobs):
+        if i in errors:
+            continue
+        source = sources[str(job["svg_s3_key"])]
+        if isinstance(source, Exception):
+            errors[i] = _error_detail(source)
+        else:
+            runnable.append(i)
+
+    results: dict[int, dict[str, Any]] = {}
+    job_seconds: dict[int, float] = {}
+
+    def run(i: int) -> dict[str, Any]:
+        t = time.perf_counter()
+        try:
+            return render_job(settings=settings, source=sources[str(jobs[i]["svg_s3_key"])], **jobs[i])
+        finally:
+            job_seconds[i] = time.perf_counter() - t
+
+    concurrency = max(1, min(int(settings.RENDER_BATCH_CONCURRENCY), len(runnable) or 1))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="render-batch") as pool:
+        futures = {i: pool.submit(run, i) for i in runnable}
+        for i, future in futures.items():
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                if not isinstance(e, ValueError):
+                    logger.exception("BATCH_JOB_FAILED", extra={"job_id": job_ids[i]})
+                errors[i] = _error_detail(e)
+    t_done = time.perf_counter()
+
+    items: list[dict[str, Any]] = []
+    for i, job_id in enumerate(job_ids):
+        if i in results:
+            items.append({"job_id": job_id, "status": "DONE", "result": results[i], "error": None})
+        else:
+            items.append({"job_id": job_id, "status": "FAILED", "result": None, "error": errors.get(i)})
+
+    pages = sum(int(r.get("pages") or 0) for r in results.values())
+    render_seconds = t_done - t_prepared
+    status = "DONE" if not errors else ("FAILED" if not results else "PARTIAL")
+    return {
+        "status": status,
+        "results": items,
+        "engine_metrics": {
+            "jobs": len(jobs),
+            "succeeded": len(results),
+            "failed": len(errors),
+            "pages": int(pages),
+            "shared_sources": len(sources),
+            "concurrency": int(concurrency),
+            "prepare_seconds": round(float(t_prepared - t0), 4),
+            "render_seconds": round(float(render_seconds), 4),
+            "job_seconds_sum": round(float(sum(job_seconds.values())), 4),
+            "job_seconds_max": round(float(max(job_seconds.values(), default=0.0)), 4),
+            "seconds": round(float(t_done - t0), 4),
+            "pages_per_second": round(float(pages / render_seconds), 2) if render_seconds > 0 else 0.0,
+        },
+    }
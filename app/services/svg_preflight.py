@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import math
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Any
+
+# Bump when the simplification changes, so conversions of older output are not reused.
+SVG_PREFLIGHT_VERSION = "pre_v1"
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+
+# Editor bookkeeping (Inkscape, Sketch, Affinity, Illustrator) and RDF metadata.
+_EDITOR_NS = (
+    "http://www.inkscape.org/namespaces/inkscape",
+    "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
+    "http://www.bohemiancoding.com/sketch/ns",
+    "http://www.serif.com/",
+    "http://ns.adobe.com/",
+    "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "http://creativecommons.org/ns#",
+    "http://purl.org/dc/elements/1.1/",
+)
+_NON_RENDERING = {"metadata", "title", "desc"}
+# Take effect without being referenced, even inside <defs>.
+_ALWAYS_APPLIED = {"style", "script", "font-face"}
+# Content drawn only where it is referenced, in that reference's coordinate system.
+_REFERENCED_CONTAINERS = {"defs", "symbol", "pattern", "marker", "clipPath", "mask", "linearGradient", "radialGradient", "filter"}
+_COORD_ATTRS = {
+    "x", "y", "width", "height", "cx", "cy", "r", "rx", "ry", "fx", "fy",
+    "x1", "y1", "x2", "y2", "dx", "dy", "points", "stroke-width",
+}
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?")
+_ID_REF = re.compile(r"url\(\s*['\"]?#([^'\")\s]+)")
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_PATH_TOKEN = re.compile(r"[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?")
+_PATH_PARAMS = {"m": 2, "l": 2, "h": 1, "v": 1, "c": 6, "s": 4, "q": 4, "t": 2, "a": 7, "z": 0}
+
+
+@dataclass
+class PreflightResult:
+    svg: bytes
+    stats: dict[str, Any] = field(default_factory=dict)
+
+
+def _local(tag: Any) -> str:
+    return tag.rpartition("}")[2] if isinstance(tag, str) else ""
+
+
+def _ns(name: str) -> str:
+    return name[1:].partition("}")[0] if name.startswith("{") else ""
+
+
+def _is_editor(name: str) -> bool:
+    ns = _ns(name)
+    return bool(ns) and ns.startswith(_EDITOR_NS)
+
+
+def _hidden(el: ET.Element) -> bool:
+    if el.get("display", "").strip() == "none":
+        return True
+    style = el.get("style", "").replace(" ", "")
+    return "display:none" in style
+
+
+def _href(el: ET.Element) -> str:
+    return el.get(f"{{{XLINK_NS}}}href") or el.get("href") or ""
+
+
+def _references(root: ET.Element) -> set[str]:
+    refs: set[str] = set()
+    for el in root.iter():
+        href = _href(el)
+        if href.startswith("#"):
+            refs.add(href[1:])
+        for value in el.attrib.values():
+            refs.update(_ID_REF.findall(value))
+        if _local(el.tag) == "style" and el.text:
+            refs.update(_ID_REF.findall(el.text))
+    return refs
+
+
+def _ids(el: ET.Element) -> set[str]:
+    return {e.get("id") for e in el.iter() if e.get("id")}  # type: ignore[misc]
+
+
+def _format(value: float, decimals: int) -> str:
+    text = f"{round(value, decimals):.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text in {"-0", ""} else text
+
+
+def _round_number(token: str, decimals: int) -> str:
+    mantissa = token.lower().partition("e")[0]
+    fraction = mantissa.partition(".")[2]
+    if "e" not in token.lower() and len(fraction) <= decimals:
+        return token
+    return _format(float(token), decimals)
+
+
+def _round_list(value: str, decimals: int) -> str:
+    return _NUMBER.sub(lambda m: _round_number(m.group(0), decimals), value)
+
+
+def _path_segments(d: str) -> int:
+    segments = 0
+    cmd = ""
+    args = 0
+    for token in _PATH_TOKEN.findall(d):
+        if token.isalpha():
+            cmd = token.lower()
+            args = 0
+            if cmd == "z":
+                segments += 1
+            continue
+        n = _PATH_PARAMS.get(cmd, 0)
+        if not n:
+            continue
+        args += 1
+        if args % n == 0 and not (cmd == "m" and args == n):
+            segments += 1
+    return segments
+
+
+def _round_path(d: str, decimals: int) -> str:
+    # Re-tokenized so arc flags written without separators ("a1 1 0 011 1") survive.
+    out: list[str] = []
+    i = 0
+    cmd = ""
+    arg = 0
+    n = len(d)
+    while i < n:
+        ch = d[i]
+        if ch.isspace() or ch == ",":
+            i += 1
+            continue
+        if ch.isalpha() and ch not in "eE":
+            cmd = ch.lower()
+            arg = 0
+            out.append(ch)
+            i += 1
+            continue
+        if cmd == "a" and arg % 7 in (3, 4) and ch in "01":
+            out.append(ch)
+            arg += 1
+            i += 1
+            continue
+        m = _NUMBER.match(d, i)
+        if m is None:
+            # Not path syntax we understand: leave the whole attribute alone.
+            return d
+        out.append(_round_number(m.group(0), decimals))
+        arg += 1
+        i = m.end()
+    # Separators only where the next token could otherwise run into the previous one.
+    text = ""
+    for token in out:
+        if text and not token[0].isalpha() and not text[-1].isalpha() and token[0] != "-":
+            text += " "
+        elif text and token[0] == "-" and text[-1] in "eE":
+            text += " "
+        text += token
+    return text
+
+
+def _matrix(transform: str) -> tuple[float, float, float, float] | None:
+    # Linear part (a, b, c, d) of a transform list; translations do not scale.
+    a, b, c, d = 1.0, 0.0, 0.0, 1.0
+    for name, raw in _TRANSFORM.findall(transform):
+        v = [float(x) for x in _NUMBER.findall(raw)]
+        if name == "matrix" and len(v) == 6:
+            m = (v[0], v[1], v[2], v[3])
+        elif name == "scale" and v:
+            m = (v[0], 0.0, 0.0, v[1] if len(v) > 1 else v[0])
+        elif name == "rotate" and v:
+            r = math.radians(v[0])
+            m = (math.cos(r), math.sin(r), -math.sin(r), math.cos(r))
+        elif name == "skewX" and v:
+            m = (1.0, 0.0, math.tan(math.radians(v[0])), 1.0)
+        elif name == "skewY" and v:
+            m = (1.0, math.tan(math.radians(v[0])), 0.0, 1.0)
+        elif name == "translate":
+            continue
+        else:
+            return None
+        a, b, c, d = a * m[0] + c * m[1], b * m[0] + d * m[1], a * m[2] + c * m[3], b * m[2] + d * m[3]
+    return a, b, c, d
+
+
+def _max_stretch(m: tuple[float, float, float, float]) -> float:
+    # Largest singular value: how much a unit length can grow under m.
+    a, b, c, d = m
+    t = a * a + b * b + c * c + d * d
+    det = a * d - b * c
+    return math.sqrt(max(0.0, (t + math.sqrt(max(0.0, t * t - 4.0 * det * det))) / 2.0))
+
+
+def _extent(root: ET.Element) -> float | None:
+    view_box = [float(x) for x in _NUMBER.findall(root.get("viewBox", ""))]
+    if len(view_box) == 4 and view_box[2] > 0 and view_box[3] > 0:
+        return max(view_box[2], view_box[3])
+    sizes = [_NUMBER.match(root.get(k, "").strip()) for k in ("width", "height")]
+    if all(sizes):
+        return max(float(s.group(0)) for s in sizes if s is not None) or None
+    return None
+
+
+def _simplify_numbers(root: ET.Element, tolerance: float) -> int:
+    """Rounds coordinates so no point moves more than `tolerance` root user units.
+
+    Each element's tolerance is divided by how much its ancestors' transforms
+    stretch it. Referenced content (defs, patterns, symbols, ...) and nested <svg>
+    viewports are drawn in other coordinate systems and are left as they are.
+    """
+    rounded = 0
+
+    def visit(el: ET.Element, stretch: float) -> None:
+        nonlocal rounded
+        name = _local(el.tag)
+        if name in _REFERENCED_CONTAINERS or (name == "svg" and el is not root) or "transform" in el.get("style", ""):
+            return
+        transform = el.get("transform")
+        if transform:
+            m = _matrix(transform)
+            if m is None:
+                return
+            stretch *= _max_stretch(m)
+        if stretch <= 0:
+            return
+        decimals = max(0, min(12, math.ceil(-math.log10(tolerance / stretch))))
+        if el is not root:
+            for key, value in list(el.attrib.items()):
+                if key == "d" and name == "path":
+                    new = _round_path(value, decimals)
+                elif key in _COORD_ATTRS:
+                    new = _round_list(value, decimals)
+                else:
+                    continue
+                if new != value:
+                    el.set(key, new)
+                    rounded += 1
+        for child in el:
+            visit(child, stretch)
+
+    visit(root, 1.0)
+    return rounded
+
+
+def _stats(root: ET.Element) -> dict[str, int]:
+    nodes = 0
+    segments = 0
+    image_bytes = 0
+    for el in root.iter():
+        nodes += 1
+        name = _local(el.tag)
+        if name == "path":
+            segments += _path_segments(el.get("d", ""))
+        elif name == "image":
+            href = _href(el)
+            if href.startswith("data:"):
+                payload = href.partition(",")[2]
+                image_bytes += len(payload) * 3 // 4 if ";base64" in href.partition(",")[0] else len(payload)
+    return {"nodes": nodes, "path_segments": segments, "image_bytes": image_bytes}
+
+
+def preflight_svg(svg: bytes, *, digits: int) -> PreflightResult:
+    """Parse an SVG once, drop what cannot render and round coordinates.
+
+    Removed: comments, editor namespaces (elements and attributes), <metadata>,
+    <title> and <desc>, hidden (display:none) elements nobody references, and
+    <defs> children nobody references. Coordinates are rounded to `digits`
+    significant digits of the viewBox extent (see _simplify_numbers). The root
+    element's size and viewBox are never touched. Input that does not get smaller,
+    or does not parse, is returned unchanged (the parse error goes in stats).
+    """
+    try:
+        root = ET.fromstring(svg)
+    except ET.ParseError as e:
+        return PreflightResult(svg=svg, stats={"error": f"ParseError: {e}"})
+    if _local(root.tag) != "svg":
+        return PreflightResult(svg=svg, stats={"error": "NOT_SVG"})
+
+    before = _stats(root)
+    removed = {"non_rendering": 0, "hidden": 0, "unused_defs": 0}
+
+    def strip(parent: ET.Element) -> None:
+        for child in list(parent):
+            if not isinstance(child.tag, str):
+                parent.remove(child)
+            elif _is_editor(child.tag) or _local(child.tag) in _NON_RENDERING:
+                parent.remove(child)
+                removed["non_rendering"] += 1
+            else:
+                for key in [k for k in child.attrib if _is_editor(k)]:
+                    del child.attrib[key]
+                strip(child)
+
+    for key in [k for k in root.attrib if _is_editor(k)]:
+        del root.attrib[key]
+    strip(root)
+
+    # Referenced content can itself reference more: repeat until nothing changes.
+    while True:
+        refs = _references(root)
+        dropped = 0
+        for parent in list(root.iter()):
+            in_defs = _local(parent.tag) == "defs"
+            for child in list(parent):
+                if _ids(child) & refs or _local(child.tag) in _ALWAYS_APPLIED:
+                    continue
+                if in_defs:
+                    removed["unused_defs"] += 1
+                elif _hidden(child) and _local(parent.tag) not in _REFERENCED_CONTAINERS:
+                    removed["hidden"] += 1
+                else:
+                    continue
+                parent.remove(child)
+                dropped += 1
+        if not dropped:
+            break
+
+    rounded = 0
+    extent = _extent(root)
+    if extent is not None and digits > 0:
+        rounded = _simplify_numbers(root, extent * 10.0 ** (-digits))
+
+    ET.register_namespace("", SVG_NS)
+    ET.register_namespace("xlink", XLINK_NS)
+    out = ET.tostring(root, encoding="utf-8", xml_declaration=False)
+    after = _stats(root)
+    if len(out) >= len(svg):
+        # Nothing worth dropping (re-serializing can even grow it): keep the source.
+        out, after, rounded = svg, before, 0
+        removed = dict.fromkeys(removed, 0)
+    return PreflightResult(
+        svg=out,
+        stats={
+            "bytes_before": len(svg),
+            "bytes": len(out),
+            "nodes_before": before["nodes"],
+            "nodes": after["nodes"],
+            "path_segments": after["path_segments"],
+            "image_bytes": after["image_bytes"],
+            "removed": removed,
+            "numbers_rounded": rounded,
+        },
+    )
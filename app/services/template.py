@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
-from pathlib import Path
 from typing import Any, Dict
 
+from app.config import Settings
+from app.services.disk_cache import get_disk_cache
 from app.utils.hash import sha256_hex
 
 
@@ -17,11 +18,7 @@ class Template:
     custom_fonts: list[Dict[str, Any]]
     overlays: list[Dict[str, Any]]
     render_mode: str
-
-
-def _ensure_dir(path: Path) -> None:
-    if not path.exists():
-        path.mkdir(parents=True, exist_ok=True)
+    imposition: Dict[str, Any] | None = None
 
 
 def compute_template_id(
@@ -32,6 +29,7 @@ def compute_template_id(
     custom_fonts: list[Dict[str, Any]] | None,
     overlays: list[Dict[str, Any]] | None,
     render_mode: str,
+    imposition: Dict[str, Any] | None = None,
 ) -> str:
     payload = {
         "svg_hash": svg_hash,
@@ -41,12 +39,16 @@ def compute_template_id(
         "overlays": overlays or [],
         "render_mode": render_mode,
     }
+    if imposition is not None:
+        # Only present when set, so ids of templates without one are unchanged.
+        payload["imposition"] = imposition
     raw = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
     return sha256_hex(raw)
 
 
 def load_or_create_template(
     *,
+    settings: Settings,
     template_id: str,
     background_pdf_path: str,
     object_mm: Dict[str, Any],
@@ -54,22 +56,25 @@ def load_or_create_template(
     custom_fonts: list[Dict[str, Any]] | None,
     overlays: list[Dict[str, Any]] | None,
     render_mode: str,
+    imposition: Dict[str, Any] | None = None,
     cache_dir: str = "tmp/templates",
 ) -> Template:
-    out_dir = Path(cache_dir)
-    _ensure_dir(out_dir)
-
-    meta_path = out_dir / f"{template_id}.json"
-    if meta_path.exists():
+    cache = get_disk_cache(cache_dir, settings)
+    meta_name = f"{template_id}.json"
+    meta_path = cache.lookup(meta_name)
+    if meta_path is not None:
         meta = json.loads(meta_path.read_text(encoding="utf-8"))
         return Template(
             template_id=meta["template_id"],
-            background_pdf_path=meta["background_pdf_path"],
+            # The converted PDF may have moved (sharding, eviction and re-conversion);
+            # its content is pinned by the svg hash inside template_id.
+            background_pdf_path=background_pdf_path,
             object_box_mm=meta["object_box_mm"],
             series_config=meta["series_config"],
             custom_fonts=meta.get("custom_fonts") or [],
             overlays=meta.get("overlays") or [],
             render_mode=meta.get("render_mode") or "legacy",
+            imposition=meta.get("imposition"),
         )
 
     meta = {
@@ -80,8 +85,10 @@ def load_or_create_template(
         "custom_fonts": custom_fonts or [],
         "overlays": overlays or [],
         "render_mode": render_mode,
+        "imposition": imposition,
     }
-    meta_path.write_text(json.dumps(meta, sort_keys=True, separators=(",", ":")), encoding="utf-8")
+    cache.path(meta_name).write_text(json.dumps(meta, sort_keys=True, separators=(",", ":")), encoding="utf-8")
+    cache.commit(meta_name)
 
     return Template(
         template_id=template_id,
@@ -91,4 +98,5 @@ def load_or_create_template(
         custom_fonts=custom_fonts or [],
         overlays=overlays or [],
         render_mode=render_mode,
+        imposition=imposition,
     )
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from reportlab.lib.colors import CMYKColor, Color
+from reportlab.lib.rl_accel import fp_str, unicode2T1
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen.canvas import FILL_NON_ZERO
+
+from app.config import Settings
+from app.services.font_registry import find_font_file
+from app.services.layout import Matrix, SeriesStyle
+from app.services.outlined_text import glyph_outline_pt
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class TextRunPlan:
+    # Per-job analysis of how serials are set: decided once, applied to every serial.
+    font_family: str
+    uniform_size_pt: float | None
+    per_letter_sizes_pt: tuple[float, ...]
+    default_size_pt: float
+    char_spacing_pt: float
+    fill_op: str
+    # Decimals kept in emitted coordinates and sizes; None = reportlab's fp_str.
+    decimals: int | None = None
+
+    def num(self, *values: float) -> str:
+        if self.decimals is None:
+            return fp_str(*values)
+        return fp_str(*(round(v, self.decimals) for v in values))
+
+    def size_at(self, i: int) -> float:
+        if self.uniform_size_pt is not None:
+            return self.uniform_size_pt
+        sizes = self.per_letter_sizes_pt
+        return sizes[i] if i < len(sizes) else self.default_size_pt
+
+
+def _fill_color_op(color: Any) -> str:
+    if isinstance(color, CMYKColor):
+        d = color.density
+        return "%s k" % fp_str(d * color.cyan, d * color.magenta, d * color.yellow, d * color.black)
+    if isinstance(color, Color):
+        return "%s rg" % fp_str(color.red, color.green, color.blue)
+    return "0 0 0 rg"
+
+
+def compile_text_runs(style: SeriesStyle, font_family: str, decimals: int | None = None) -> TextRunPlan:
+    sizes = tuple(style.per_letter_sizes_pt or ())
+    # Serials are fixed-width for a whole job, so per-letter sizes that are all equal
+    # (or absent) collapse to a single Tf.
+    uniform: float | None = style.font_size_pt
+    if sizes:
+        longest = len(style.prefix) + max(style.width, len(str(style.base + style.count - 1)))
+        first = sizes[0]
+        if all((sizes[i] if i < len(sizes) else style.font_size_pt) == first for i in range(longest)):
+            uniform = first
+        else:
+            uniform = None
+
+    return TextRunPlan(
+        font_family=str(font_family),
+        uniform_size_pt=uniform,
+        per_letter_sizes_pt=sizes,
+        default_size_pt=float(style.font_size_pt),
+        char_spacing_pt=float(style.letter_spacing_pt),
+        fill_op=_fill_color_op(style.fill_color),
+        decimals=decimals,
+    )
+
+
+class _SerialEmitter(ABC):
+    # Shared bookkeeping for the text and outlined serial writers.
+
+    def __init__(self, canvas: Any, plan: TextRunPlan) -> None:
+        self._canvas = canvas
+        self._doc = canvas._doc
+        self._plan = plan
+        self._widths: dict[tuple[str, float], float] = {}
+        self._prefixes: dict[Matrix, str] = {}
+
+    @property
+    def uniform_size(self) -> bool:
+        return self._plan.uniform_size_pt is not None
+
+    def _width(self, ch: str, size: float) -> float:
+        w = self._widths.get((ch, size))
+        if w is None:
+            w = pdfmetrics.stringWidth(ch, self._plan.font_family, size)
+            self._widths[(ch, size)] = w
+        return w
+
+    def width_pt(self, text: str) -> float:
+        # Advance of `text` as set by emit(), including letter spacing.
+        plan = self._plan
+        return sum(self._width(ch, plan.size_at(i)) + plan.char_spacing_pt for i, ch in enumerate(text))
+
+    def _prefix(self, matrix: Matrix) -> str:
+        prefix = self._prefixes.get(matrix)
+        if prefix is None:
+            prefix = "q %s cm" % self._plan.num(*matrix)
+            self._prefixes[matrix] = prefix
+        return prefix
+
+    @abstractmethod
+    def ops(self, text: str) -> str:
+        # Content-stream operators that set `text` at the current origin.
+        ...
+
+    def literal_template(self, chars: str, matrix: Matrix) -> tuple[str, str, dict[int, str]] | None:
+        # (head, tail, table) with literal(t, matrix) == head + t.translate(table) + tail
+        # for every t made of `chars`, or None when serials do not set as one run.
+        return None
+
+    def literal(self, text: str, matrix: Matrix) -> str:
+        # Equivalent to saveState/transform/<draw>/restoreState, as one literal.
+        return "%s %s Q" % (self._prefix(matrix), self.ops(text))
+
+    def emit(self, text: str, matrix: Matrix) -> None:
+        self._canvas.addLiteral(self.literal(text, matrix))
+
+
+class SerialTextEmitter(_SerialEmitter):
+    """Writes serial text straight into a canvas content stream as grouped runs.
+
+    Glyph encodings (font subset + escaped bytes) and widths are cached per canvas,
+    so after the first few serials a run costs a handful of dict lookups.
+    """
+
+    def __init__(self, canvas: Any, plan: TextRunPlan) -> None:
+        super().__init__(canvas, plan)
+        self._font = pdfmetrics.getFont(plan.font_family)
+        self._glyphs: dict[str, tuple[str, str]] = {}
+        self._tf: dict[tuple[str, float], str] = {}
+        head = ["BT", plan.fill_op]
+        if plan.char_spacing_pt:
+            head.append("%s Tc" % plan.num(plan.char_spacing_pt))
+        self._head = " ".join(head)
+
+    def _glyph(self, ch: str) -> tuple[str, str]:
+        hit = self._glyphs.get(ch)
+        if hit is not None:
+            return hit
+
+        font = self._font
+        escape = self._canvas._escape
+        if font._dynamicFont:
+            # TrueType: subset assignment is per document and stable once made.
+            ((subset, raw),) = font.splitString(ch, self._doc)
+            hit = (font.getSubsetInternalName(subset, self._doc), escape(raw))
+        else:
+            pieces = unicode2T1(ch, [font] + list(font.substitutionFonts))
+            f, raw = pieces[0]
+            hit = (self._doc.getInternalFontName(f.fontName), escape(raw))
+        self._glyphs[ch] = hit
+        return hit
+
+    def ops(self, text: str) -> str:
+        plan = self._plan
+        out = [self._head]
+        run: list[str] = []
+        current: tuple[str, float] | None = None
+        for i, ch in enumerate(text):
+            font_name, esc = self._glyph(ch)
+            key = (font_name, plan.size_at(i))
+            if key != current:
+                if run:
+                    out.append("(%s) Tj" % "".join(run))
+                    run = []
+                tf = self._tf.get(key)
+                if tf is None:
+                    tf = self._tf[key] = "%s %s Tf" % (font_name, plan.num(key[1]))
+                out.append(tf)
+                current = key
+            run.append(esc)
+        if run:
+            out.append("(%s) Tj" % "".join(run))
+        out.append("ET")
+        return " ".join(out)
+
+    def literal_template(self, chars: str, matrix: Matrix) -> tuple[str, str, dict[int, str]] | None:
+        size = self._plan.uniform_size_pt
+        glyphs = {ch: self._glyph(ch) for ch in chars}
+        font_names = {font_name for font_name, _esc in glyphs.values()}
+        if size is None or len(font_names) != 1:
+            return None
+        (font_name,) = font_names
+        head = "%s %s %s %s Tf (" % (self._prefix(matrix), self._head, font_name, self._plan.num(size))
+        return head, ") Tj ET Q", {ord(ch): esc for ch, (_font_name, esc) in glyphs.items()}
+
+
+# PDF core fonts have no outlines of their own: they are outlined from the
+# metric-compatible Liberation face, so shapes match the advances taken from the
+# core font metrics. Symbol and ZapfDingbats have no such face.
+_CORE_OUTLINE_FACES = {
+    "Helvetica": "LiberationSans-Regular.ttf",
+    "Helvetica-Bold": "LiberationSans-Bold.ttf",
+    "Helvetica-Oblique": "LiberationSans-Italic.ttf",
+    "Helvetica-BoldOblique": "LiberationSans-BoldItalic.ttf",
+    "Times-Roman": "LiberationSerif-Regular.ttf",
+    "Times-Bold": "LiberationSerif-Bold.ttf",
+    "Times-Italic": "LiberationSerif-Italic.ttf",
+    "Times-BoldItalic": "LiberationSerif-BoldItalic.ttf",
+    "Courier": "LiberationMono-Regular.ttf",
+    "Courier-Bold": "LiberationMono-Bold.ttf",
+    "Courier-Oblique": "LiberationMono-Italic.ttf",
+    "Courier-BoldOblique": "LiberationMono-BoldItalic.ttf",
+}
+
+_FONTS_DIR = Path(__file__).resolve().parents[2] / "assets" / "fonts"
+
+
+def _outline_source(font_family: str, settings: Settings) -> tuple[str | None, bytes | None, bool]:
+    # (path, data, exact): outlines come from the same TrueType data the text path
+    # would embed. When no matching face is available, path and data are None and
+    # glyphs fall back to the bundled Liberation Sans (exact is False).
+    font = pdfmetrics.getFont(font_family)
+    if not font._dynamicFont:
+        filename = _CORE_OUTLINE_FACES.get(font_family)
+        path: str | None = None
+        if filename is not None:
+            bundled = _FONTS_DIR / filename
+            # Bundled faces first, then installed ones (e.g. a fonts-liberation package).
+            path = str(bundled) if bundled.is_file() else find_font_file(filename, settings)
+        if path is not None:
+            return path, None, True
+        logger.warning("OUTLINED_FONT_FALLBACK", extra={"font_family": font_family, "face": filename})
+        return None, None, False
+    face = font.face
+    filename = str(getattr(face, "filename", "") or "")
+    if filename and Path(filename).is_file():
+        return filename, None, True
+    data = getattr(face, "_ttf_data", None)
+    if data:
+        return None, bytes(data), True
+    logger.warning("OUTLINED_FONT_FALLBACK", extra={"font_family": font_family, "face": None})
+    return None, None, False
+
+
+class OutlinedSerialEmitter(_SerialEmitter):
+    """Writes serials as vector outlines with no font embedding.
+
+    Each distinct glyph at each size becomes one form XObject per document; a serial
+    is a sequence of translations and form references using the text path advances.
+    """
+
+    def __init__(self, canvas: Any, plan: TextRunPlan, settings: Settings) -> None:
+        super().__init__(canvas, plan)
+        self._font_path, self._font_data, self.exact_face = _outline_source(plan.font_family, settings)
+        self._forms: dict[tuple[str, float], str | None] = {}
+        self._form_names: list[str] = []
+        self._page_forms: list[str] | None = None
+        self._page_registered = 0
+
+    @property
+    def glyph_forms(self) -> int:
+        return len(self._form_names)
+
+    def _glyph_form(self, ch: str, size: float) -> str | None:
+        key = (ch, size)
+        if key in self._forms:
+            return self._forms[key]
+
+        ops, bbox, _advance = glyph_outline_pt(char=ch, font_size_pt=size, font_path=self._font_path, font_data=self._font_data)
+        do_op: str | None = None
+        if ops:
+            canvas = self._canvas
+            name = f"sg_{len(self._form_names)}"
+            canvas.beginForm(name, bbox["min_x"] - 1.0, bbox["min_y"] - 1.0, bbox["max_x"] + 1.0, bbox["max_y"] + 1.0)
+            path = canvas.beginPath()
+            for op, pts in ops:
+                if op == "moveTo":
+                    path.moveTo(*pts)
+                elif op == "lineTo":
+                    path.lineTo(*pts)
+                elif op == "curveTo":
+                    path.curveTo(*pts)
+                else:
+                    path.close()
+            # No color inside the form: glyphs inherit the serial fill color.
+            canvas.drawPath(path, stroke=0, fill=1, fillMode=FILL_NON_ZERO)
+            canvas.endForm()
+            self._form_names.append(name)
+            do_op = "/%s Do" % self._doc.getXObjectName(name)
+        self._forms[key] = do_op
+        return do_op
+
+    def _register_page_forms(self) -> None:
+        # Literal Do operators bypass canvas.doForm, so list the glyph forms in the
+        # current page's XObject resources ourselves.
+        forms = self._canvas._formsinuse
+        if forms is not self._page_forms:
+            self._page_forms = forms
+            self._page_registered = 0
+        if self._page_registered < len(self._form_names):
+            forms.extend(self._form_names[self._page_registered:])
+            self._page_registered = len(self._form_names)
+
+    def ops(self, text: str) -> str:
+        plan = self._plan
+        placements = [self._glyph_form(ch, plan.size_at(i)) for i, ch in enumerate(text)]
+        self._register_page_forms()
+
+        out = [plan.fill_op]
+        x = 0.0
+        placed_x = 0.0
+        for i, ch in enumerate(text):
+            do_op = placements[i]
+            if do_op is not None:
+                dx = x - placed_x
+                if dx:
+                    out.append("1 0 0 1 %s 0 cm" % plan.num(dx))
+                    placed_x = x
+                out.append(do_op)
+            x += self._width(ch, plan.size_at(i)) + plan.char_spacing_pt
+        return " ".join(out)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Iterator, Mapping
+
+# Label values as a sorted tuple of (name, value), so they can key a dict.
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: Mapping[str, Any] | None) -> Labels:
+    return tuple(sorted((str(k), str(v)) for k, v in (labels or {}).items()))
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra is not None else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _k, v in pairs)
+    return "{%s}" % ",".join('%s="%s"' % (k, v) for (k, _v), v in zip(pairs, escaped))
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class StageTimer:
+    """Wall-clock seconds per named stage; a stage entered twice adds up."""
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + float(seconds)
+
+    def merge(self, timings: Mapping[str, float] | None) -> None:
+        for name, seconds in (timings or {}).items():
+            self.add(name, seconds)
+
+    def as_dict(self) -> dict[str, float]:
+        return {name: round(float(s), 4) for name, s in self.seconds.items()}
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and histograms in the Prometheus text format.
+
+    Metrics are declared once with their type, help and (for histograms) buckets;
+    label sets are created on first use.
+    """
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # name -> (type, help, buckets)
+        self._meta: dict[str, tuple[str, str, tuple[float, ...]]] = {}
+        self._values: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, _Histogram]] = {}
+
+    def counter(self, name: str, help: str) -> None:
+        self._declare(name, "counter", help)
+
+    def gauge(self, name: str, help: str) -> None:
+        self._declare(name, "gauge", help)
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...]) -> None:
+        self._declare(name, "histogram", help, tuple(sorted(buckets)))
+
+    def _declare(self, name: str, kind: str, help: str, buckets: tuple[float, ...] = ()) -> None:
+        with self._lock:
+            self._meta[name] = (kind, help, buckets)
+            self._values.setdefault(name, {})
+            self._histograms.setdefault(name, {})
+
+    def inc(self, name: str, amount: float = 1.0, labels: Mapping[str, Any] | None = None) -> None:
+        key = _labels(labels)
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0.0) + float(amount)
+
+    def set(self, name: str, value: float, labels: Mapping[str, Any] | None = None) -> None:
+        with self._lock:
+            self._values[name][_labels(labels)] = float(value)
+
+    def observe(self, name: str, value: float, labels: Mapping[str, Any] | None = None) -> None:
+        key = _labels(labels)
+        with self._lock:
+            histograms = self._histograms[name]
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = _Histogram(self._meta[name][2])
+            histogram.observe(float(value))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            for name, (kind, help, buckets) in self._meta.items():
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full} {help}")
+                lines.append(f"# TYPE {full} {kind}")
+                if kind != "histogram":
+                    for labels, value in sorted(self._values[name].items()):
+                        lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = ("le", _format_value(bound))
+                        lines.append(f"{full}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{full}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{full}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,103 @@
+"""Per-page cost of write_final_pdf.
+
+Usage:
+    python -m bench.layout_plan [--count 4000] [--repeat 3]
+
+Renders a synthetic background (no S3, no cairosvg) and prints the per-page
+cost of the page/slot loop, plus the one-off cost of compiling the layout plan.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from reportlab.pdfgen.canvas import Canvas
+
+from app.config import Settings, load_settings
+from app.services.layout import compile_layout_plan
+from app.services.pdf_writer import write_final_pdf
+from app.services.template import Template
+
+OBJECT_MM = {"w": 146.0, "h": 66.0, "x_mm": 5.0, "y_mm": 2.0, "alignment": "left", "cut_margin_mm": 2.0, "rotation_deg": 0.0}
+
+
+def _series(count: int) -> dict:
+    return {
+        "start": "A000001",
+        "count": count,
+        "anchor_space": "object_mm",
+        "font_family": "Helvetica",
+        "font_size_mm": 4.0,
+        "x_mm": 10.0,
+        "y_mm": 20.0,
+        "letter_spacing_mm": 0.5,
+        "rotation_deg": 0.0,
+        "color": "#c00000",
+    }
+
+
+def _settings() -> Settings:
+    # Defaults for every optional setting; nothing here talks to S3.
+    for key, value in {
+        "INTERNAL_API_KEY": "bench",
+        "S3_BUCKET": "bench",
+        "S3_REGION": "bench",
+        "S3_ACCESS_KEY_ID": "bench",
+        "S3_SECRET_ACCESS_KEY": "bench",
+        "RENDER_WORKERS": "1",
+    }.items():
+        os.environ.setdefault(key, value)
+    return load_settings()
+
+
+def _background_pdf(path: Path) -> str:
+    c = Canvas(str(path), pagesize=(414.0, 187.0))
+    c.setFillColorRGB(0.85, 0.9, 0.95)
+    c.rect(0, 0, 414.0, 187.0, fill=1, stroke=0)
+    c.showPage()
+    c.save()
+    return str(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="pe_bench_") as td:
+        template = Template(
+            template_id="bench",
+            background_pdf_path=_background_pdf(Path(td) / "bg.pdf"),
+            object_box_mm=dict(OBJECT_MM),
+            series_config=_series(args.count),
+            custom_fonts=[],
+            overlays=[],
+            render_mode="exact_mm",
+        )
+
+        best = float("inf")
+        pages = 0
+        for _ in range(max(1, args.repeat)):
+            t0 = time.perf_counter()
+            pages, _path, _metrics = write_final_pdf(
+                template=template,
+                settings=_settings(),
+                job_id="bench",
+                output_path=str(Path(td) / "out.pdf"),
+            )
+            best = min(best, time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            compile_layout_plan(object_mm=OBJECT_MM, series=_series(args.count), render_mode="exact_mm", svg_w_pt=414.0, svg_h_pt=187.0)
+        plan_us = (time.perf_counter() - t0) * 1000.0
+
+    print(f"pages={pages} total_s={best:.3f} per_page_ms={best * 1000.0 / pages:.3f} plan_compile_us={plan_us:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""End-to-end cost of render_job on the checked-in fixtures.
+
+Usage:
+    python -m bench.render_pipeline [--suite quick|full|profiles] [--profiles fast,balanced,small]
+                                    [--only small/] [--repeat 3] [--table]
+                                    [--out results.json] [--baseline bench/render_pipeline_baseline.json]
+                                    [--threshold 0.15] [--update-baseline | --no-baseline | --require-baseline]
+
+Each scenario runs in its own process, in its own scratch directory, against a
+filesystem object store holding the fixtures from tmp/ (no S3). The SVG is
+converted once (cold, timed as `convert_ms`), then render_job runs `--repeat`
+times on the converted source and the best run is kept, with its per-stage timings.
+Every scenario runs once per output profile in --profiles. `--suite profiles` is
+every fixture at 20001 serials; with --table the results are also printed as a
+Markdown table (render time, upload time, output size).
+
+Prints one line per scenario and writes every result as JSON. With a baseline,
+a scenario regresses when its render time, peak RSS or output size grows by
+more than --threshold, or fails where the baseline run did not; the exit status
+is 1 if any scenario regressed. Without a baseline file the run only measures
+(as with --no-baseline) and says so; --require-baseline makes that an error
+(exit status 2) for CI once a baseline is recorded with --update-baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any
+
+from app.services.output_profile import OUTPUT_PROFILES
+
+REPO = Path(__file__).resolve().parent.parent
+FIXTURES = ("small", "large", "raster", "500-rupee-note")
+FONT_PATH = REPO / "assets" / "fonts" / "LiberationSans-Regular.ttf"
+DEFAULT_BASELINE = REPO / "bench" / "render_pipeline_baseline.json"
+
+OBJECT_MM = {"w": 146.0, "h": 66.0, "x_mm": 5.0, "y_mm": 2.0, "alignment": "left", "cut_margin_mm": 2.0, "rotation_deg": 0.0}
+
+# Overlays cycle through these, so more overlays also means more distinct assets.
+_OVERLAY_FIXTURES = ("small", "large", "raster")
+
+# Compared against the baseline; all three are "lower is better".
+_GATED = ("render_ms", "peak_rss_mb", "output_bytes")
+
+
+@dataclass(frozen=True)
+class Scenario:
+    fixture: str
+    count: int
+    overlays: int = 0
+    custom_font: bool = False
+    per_letter: bool = False
+    profile: str = "balanced"
+
+    @property
+    def name(self) -> str:
+        return "%s/n=%d/overlays=%d/font=%s/per_letter=%d/profile=%s" % (
+            self.fixture,
+            self.count,
+            self.overlays,
+            "custom" if self.custom_font else "builtin",
+            int(self.per_letter),
+            self.profile,
+        )
+
+
+def _suite(name: str, profiles: list[str]) -> list[Scenario]:
+    return [replace(scenario, profile=profile) for scenario in _scenarios(name) for profile in profiles]
+
+
+def _scenarios(name: str) -> list[Scenario]:
+    if name == "profiles":
+        return [Scenario(fixture, 20001) for fixture in FIXTURES]
+    if name == "quick":
+        counts: tuple[int, ...] = (4, 1000)
+    else:
+        counts = (4, 1000, 10000, 100000)
+    scenarios = [Scenario(fixture, count) for fixture in FIXTURES for count in counts]
+    # Features are varied on the cheapest fixture so their cost is not hidden by the SVG.
+    for count in counts[1:]:
+        scenarios += [
+            Scenario("small", count, overlays=1),
+            Scenario("small", count, overlays=8),
+            Scenario("small", count, custom_font=True),
+            Scenario("small", count, per_letter=True),
+        ]
+    return scenarios
+
+
+def _settings_env(root: Path) -> dict[str, str]:
+    return {
+        "INTERNAL_API_KEY": "bench",
+        "S3_BUCKET": "bench",
+        "S3_REGION": "bench",
+        "S3_ACCESS_KEY_ID": "bench",
+        "S3_SECRET_ACCESS_KEY": "bench",
+        "OBJECT_STORE_BACKEND": "filesystem",
+        "OBJECT_STORE_ROOT": str(root / "objects"),
+    }
+
+
+def _request(scenario: Scenario) -> dict[str, Any]:
+    series: dict[str, Any] = {
+        "start": "A000001",
+        "count": scenario.count,
+        "anchor_space": "object_mm",
+        "font_family": "Helvetica",
+        "font_size_mm": 4.0,
+        "x_mm": 10.0,
+        "y_mm": 20.0,
+        "letter_spacing_mm": 0.5,
+        "rotation_deg": 0.0,
+        "color": "#c00000",
+    }
+    custom_fonts = None
+    if scenario.custom_font:
+        data = base64.b64encode(FONT_PATH.read_bytes()).decode("ascii")
+        custom_fonts = [{"family": "BenchSans", "data_url": f"data:font/ttf;base64,{data}", "mime": "font/ttf"}]
+        series["font_family"] = "BenchSans"
+    if scenario.per_letter:
+        series["per_letter_font_size_mm"] = [4.0, 3.0, 3.0, 3.5, 3.5, 4.0, 4.0]
+    overlays = [
+        {"type": "svg", "svg_s3_key": f"fixtures/{_OVERLAY_FIXTURES[i % len(_OVERLAY_FIXTURES)]}.svg", "x_mm": 100.0 + 4.0 * i, "y_mm": 5.0 + 6.0 * i, "scale": 0.1}
+        for i in range(scenario.overlays)
+    ]
+    return {
+        "svg_s3_key": f"fixtures/{scenario.fixture}.svg",
+        "object_mm": dict(OBJECT_MM),
+        "series": series,
+        "custom_fonts": custom_fonts,
+        "overlays": overlays or None,
+        "render_mode": "exact_mm",
+        "output_profile": scenario.profile,
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS; children covers render worker processes.
+    scale = 1.0 / (1024.0 * 1024.0) if sys.platform == "darwin" else 1.0 / 1024.0
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) * scale, 1)
+
+
+def _run_scenario(scenario: Scenario, repeat: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="pe_bench_") as td:
+        root = Path(td)
+        os.chdir(root)
+        for key, value in _settings_env(root).items():
+            os.environ[key] = value
+        fixtures = root / "objects" / "fixtures"
+        fixtures.mkdir(parents=True)
+        for fixture in FIXTURES:
+            shutil.copyfile(REPO / "tmp" / f"{fixture}.svg", fixtures / f"{fixture}.svg")
+
+        from app.config import load_settings
+        from app.services.normalize import svg_to_pdf_cached_original_size
+        from app.services.render import render_job
+
+        settings = load_settings()
+        request = _request(scenario)
+
+        t0 = time.perf_counter()
+        source = svg_to_pdf_cached_original_size(settings=settings, svg_s3_key=request["svg_s3_key"])
+        convert_ms = (time.perf_counter() - t0) * 1000.0
+
+        best = float("inf")
+        result: dict[str, Any] = {}
+        stages: dict[str, float] = {}
+        for i in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            result = render_job(settings=settings, job_id=f"bench{i}", source=source, **request)
+            elapsed = (time.perf_counter() - t0) * 1000.0
+            if elapsed < best:
+                best = elapsed
+                stages = {k: round(v * 1000.0, 2) for k, v in (result["engine_metrics"].get("timings") or {}).items()}
+
+        output = root / "objects" / str(result["pdf_s3_key"])
+        pages = int(result["pages"])
+        return {
+            "scenario": scenario.name,
+            "pages": pages,
+            "convert_ms": round(convert_ms, 2),
+            "render_ms": round(best, 2),
+            "pages_per_s": round(pages * 1000.0 / best, 1) if best > 0 else 0.0,
+            "peak_rss_mb": _peak_rss_mb(),
+            "output_bytes": int(output.stat().st_size),
+            "upload_ms": stages.get("upload", 0.0),
+            # render_job's engine_metrics["timings"] of the best run, in ms.
+            "stages_ms": stages,
+        }
+
+
+def _child(scenario: Scenario, repeat: int, queue: Any) -> None:
+    try:
+        queue.put(_run_scenario(scenario, repeat))
+    except Exception as e:
+        queue.put({"scenario": scenario.name, "error": f"{type(e).__name__}: {e}"})
+
+
+def _measure(scenario: Scenario, repeat: int) -> dict[str, Any]:
+    # A fresh process per scenario: cold process-wide caches and a peak RSS of its own.
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(scenario, repeat, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def _compare(results: list[dict[str, Any]], baseline: dict[str, Any], threshold: float) -> list[str]:
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = previous.get(r["scenario"])
+        if old is None or "error" in old:
+            continue
+        if "error" in r:
+            regressions.append("%s: failed: %s" % (r["scenario"], r["error"]))
+            continue
+        for key in _GATED:
+            if old[key] and r[key] > old[key] * (1.0 + threshold):
+                regressions.append("%s: %s %s -> %s (+%.0f%%)" % (r["scenario"], key, old[key], r[key], (r[key] / old[key] - 1.0) * 100.0))
+    return regressions
+
+
+def _table(results: list[dict[str, Any]]) -> str:
+    lines = ["| fixture | serials | profile | render (s) | upload (s) | output (MB) |", "|---|---|---|---|---|---|"]
+    for r in results:
+        fixture, count = r["scenario"].split("/")[:2]
+        profile = r["scenario"].rsplit("profile=", 1)[-1]
+        if "error" in r:
+            lines.append("| %s | %s | %s | failed | | |" % (fixture, count[2:], profile))
+            continue
+        lines.append(
+            "| %s | %s | %s | %.2f | %.2f | %.2f |"
+            % (fixture, count[2:], profile, r["render_ms"] / 1000.0, r["upload_ms"] / 1000.0, r["output_bytes"] / 1e6)
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suite", choices=("quick", "full", "profiles"), default="quick")
+    parser.add_argument("--profiles", default="balanced", help="comma-separated output profiles to run each scenario with")
+    parser.add_argument("--table", action="store_true", help="also print the results as a Markdown table")
+    parser.add_argument("--only", default="", help="run scenarios whose name starts with this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--threshold", type=float, default=0.15)
+    gate = parser.add_mutually_exclusive_group()
+    gate.add_argument("--update-baseline", action="store_true")
+    gate.add_argument("--no-baseline", action="store_true", help="measure only, without the regression gate")
+    gate.add_argument("--require-baseline", action="store_true", help="fail (exit 2) when the baseline file is missing")
+    args = parser.parse_args()
+
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    unknown = [p for p in profiles if p not in OUTPUT_PROFILES]
+    if unknown or not profiles:
+        parser.error("--profiles: expected some of %s" % ", ".join(OUTPUT_PROFILES))
+
+    results = []
+    for scenario in _suite(args.suite, profiles):
+        if not scenario.name.startswith(args.only):
+            continue
+        r = _measure(scenario, args.repeat)
+        results.append(r)
+        if "error" in r:
+            print(f"{r['scenario']} error={r['error']}")
+        else:
+            print(
+                f"{r['scenario']} pages={r['pages']} convert_ms={r['convert_ms']:.1f} render_ms={r['render_ms']:.1f} "
+                f"pages_per_s={r['pages_per_s']:.1f} upload_ms={r['upload_ms']:.1f} peak_rss_mb={r['peak_rss_mb']:.1f} "
+                f"output_bytes={r['output_bytes']}"
+            )
+
+    if args.table:
+        print(_table(results))
+
+    report = {"suite": args.suite, "profiles": profiles, "repeat": args.repeat, "python": sys.version.split()[0], "results": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.no_baseline:
+        return
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"baseline written: {baseline_path}")
+        return
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path}; not gated (record one with --update-baseline)")
+        if args.require_baseline:
+            sys.exit(2)
+        return
+
+    regressions = _compare(results, json.loads(baseline_path.read_text()), args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"no regressions over {args.threshold:.0%} against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import io
+import re
+
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen.canvas import Canvas
+
+from app.services.raster import fitted_box_pt, prepare_raster, target_px
+from app.utils.units import mm_to_pt
+
+
+def _png(size: tuple[int, int]) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _drawn_box_pt(raw: bytes, box_pt: tuple[float, float]) -> tuple[float, float, float, float]:
+    # Draw the prepared image the way pdf_writer does and read back its placement matrix.
+    image = prepare_raster(raw, box_pt=box_pt, dpi=300, jpeg_quality=90)
+    x, y, w, h = fitted_box_pt(image.source_px, box_pt)
+    buf = io.BytesIO()
+    canvas = Canvas(buf, pageCompression=0)
+    canvas.drawImage(ImageReader(io.BytesIO(image.data)), x, y, width=w, height=h, mask="auto")
+    canvas.save()
+    a, _b, _c, d, e, f = (float(v) for v in re.search(rb"q\s+(\S+) (\S+) (\S+) (\S+) (\S+) (\S+) cm\s+/\S+ Do", buf.getvalue()).groups())
+    return e, f, a, d
+
+
+def test_target_px_keeps_aspect_ratio() -> None:
+    box = (mm_to_pt(20), mm_to_pt(10))
+    assert target_px((800, 400), box, 300) == (236, 118)
+    w, h = target_px((6000, 1000), box, 300)
+    assert abs(w / h - 6.0) < 0.1
+
+
+def test_downsampled_overlay_fills_its_box() -> None:
+    w_pt, h_pt = mm_to_pt(20), mm_to_pt(10)
+    x, y, w, h = _drawn_box_pt(_png((800, 400)), (w_pt, h_pt))
+    assert abs(w - w_pt) < 1e-3 and abs(h - h_pt) < 1e-3
+    assert abs(x) < 1e-3 and abs(y) < 1e-3
+
+
+def test_wide_logo_is_centred_at_full_width() -> None:
+    w_pt, h_pt = mm_to_pt(20), mm_to_pt(10)
+    x, y, w, h = _drawn_box_pt(_png((6000, 1000)), (w_pt, h_pt))
+    assert abs(w - w_pt) < 1e-3
+    assert abs(h - w_pt / 6.0) < 1e-3
+    assert abs(y - (h_pt - h) / 2.0) < 1e-3